@@ -0,0 +1,73 @@
+"""Timing and allocation helpers shared by the benchmarks."""
+from __future__ import annotations
+
+import gc
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+
+
+@dataclass
+class Result:
+    name: str
+    runs: int
+    mean_us: float
+    p95_us: float
+    alloc_bytes: float
+
+    def row(self) -> str:
+        return (
+            f"{self.name:<44} {self.runs:>8} {self.mean_us:>10.2f} "
+            f"{self.p95_us:>10.2f} {self.alloc_bytes:>12.1f}"
+        )
+
+
+HEADER = f"{'benchmark':<44} {'runs':>8} {'mean µs':>10} {'p95 µs':>10} {'peak B/op':>12}"
+
+
+def measure(name: str, func: Callable[[], object], runs: int) -> Result:
+    """Time func per call and measure the bytes it allocates per call."""
+    for _ in range(min(runs, 100)):
+        func()
+
+    samples = []
+    gc.disable()
+    try:
+        for _ in range(runs):
+            start = time.perf_counter_ns()
+            func()
+            samples.append(time.perf_counter_ns() - start)
+    finally:
+        gc.enable()
+
+    return Result(
+        name=name,
+        runs=runs,
+        mean_us=statistics.fmean(samples) / 1000,
+        p95_us=percentile(samples, 95) / 1000,
+        alloc_bytes=allocated_per_call(func, min(runs, 1000)),
+    )
+
+
+def allocated_per_call(func: Callable[[], object], runs: int) -> float:
+    """Average peak of memory allocated while func runs, in bytes."""
+    tracemalloc.start()
+    try:
+        total = 0
+        for _ in range(runs):
+            current, _peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            _current, peak = tracemalloc.get_traced_memory()
+            total += peak - current
+    finally:
+        tracemalloc.stop()
+    return total / runs
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
@@ -0,0 +1,317 @@
+"""Benchmark of the coordinator update path.
+
+Drives UteTariffCoordinator._async_update_data with a synthetic meter at
+several cadences over one simulated hour, then the batched event path
+(_handle_state_change and _handle_flush) and snapshot building with the
+tariff comparison shadows and the price schedule. Runs against a real
+HomeAssistant core in a temporary config directory and a Store replacement
+that counts writes. Needs Home Assistant installed. Run from the
+repository root:
+
+    python -m benchmarks.bench_coordinator
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from types import MappingProxyType, SimpleNamespace
+from typing import Any
+from unittest.mock import patch
+
+from homeassistant.core import HomeAssistant, State
+from homeassistant.util import dt as dt_util
+
+from custom_components.ute_tariff.const import (
+    CONF_COMPARE_PUNTA_WINDOWS,
+    CONF_COMPARE_TARIFFS,
+    CONF_ENERGY_ENTITY_ID,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_STORE_FLUSH_INTERVAL,
+    CONF_TARIFF,
+    TARIFF_TRD,
+    TARIFF_TRS,
+    TARIFF_TRT,
+)
+from custom_components.ute_tariff.coordinator import UteTariffCoordinator
+from custom_components.ute_tariff.engine import UteTariffEngine
+
+from ._common import percentile
+
+ENERGY_ENTITY_ID = "sensor.bench_energy"
+CADENCES = (1, 10, 60)
+SIMULATED_SECONDS = 3600
+FLUSH_INTERVALS = (5, 30)
+SNAPSHOT_RUNS = 2000
+
+
+class FakeEntry:
+    """Minimal stand-in for a ConfigEntry."""
+
+    def __init__(self, data: dict[str, Any], options: dict[str, Any]) -> None:
+        self.entry_id = "bench"
+        self.data = MappingProxyType(data)
+        self.options = MappingProxyType(options)
+
+
+class CountingStore:
+    """Store replacement that counts writes on a simulated clock.
+
+    async_delay_save restarts its timer on every call, like the real Store.
+    """
+
+    def __init__(self, clock: Callable[[], datetime]) -> None:
+        self._clock = clock
+        self._due: datetime | None = None
+        self._data_func: Callable[[], Any] | None = None
+        self.writes = 0
+
+    async def async_load(self) -> None:
+        return None
+
+    async def async_save(self, data: Any) -> None:
+        self._due = None
+        self.writes += 1
+
+    def async_delay_save(self, data_func: Callable[[], Any], delay: float = 0) -> None:
+        self._data_func = data_func
+        self._due = self._clock() + timedelta(seconds=delay)
+
+    def tick(self) -> None:
+        if self._due is not None and self._clock() >= self._due:
+            self._due = None
+            self._data_func()
+            self.writes += 1
+
+
+def make_coordinator(
+    hass: HomeAssistant,
+    tariff: str,
+    options: dict[str, Any],
+    clock: Callable[[], datetime],
+) -> tuple[UteTariffCoordinator, CountingStore]:
+    entry = FakeEntry(
+        {CONF_ENERGY_ENTITY_ID: ENERGY_ENTITY_ID, CONF_TARIFF: tariff},
+        {CONF_TARIFF: tariff, **options},
+    )
+    coordinator = UteTariffCoordinator(hass, entry, UteTariffEngine(hass))
+    store = CountingStore(clock)
+    coordinator._store = store
+    coordinator._history_store = CountingStore(clock)
+    coordinator.data = coordinator._default_state({})
+    return coordinator, store
+
+
+async def run_stream(
+    hass: HomeAssistant, tariff: str, cadence: int, flush_interval: int
+) -> dict[str, float]:
+    now = datetime(2026, 3, 2, 17, 30, tzinfo=UTC)
+
+    def clock() -> datetime:
+        return now
+
+    coordinator, store = make_coordinator(
+        hass, tariff, {CONF_STORE_FLUSH_INTERVAL: flush_interval}, clock
+    )
+
+    energy = 1000.0
+    latencies: list[int] = []
+    peaks: list[int] = []
+    with patch.object(dt_util, "utcnow", clock):
+        tracemalloc.start()
+        for _ in range(SIMULATED_SECONDS // cadence):
+            now += timedelta(seconds=cadence)
+            energy += 0.0004 * cadence
+            hass.states.async_set(ENERGY_ENTITY_ID, str(round(energy, 4)))
+
+            current, _peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            start = time.perf_counter_ns()
+            await coordinator._async_update_data()
+            latencies.append(time.perf_counter_ns() - start)
+            _current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+            store.tick()
+        tracemalloc.stop()
+
+    return {
+        "updates": len(latencies),
+        "mean_us": statistics.fmean(latencies) / 1000,
+        "p95_us": percentile(latencies, 95) / 1000,
+        "peak_bytes": statistics.fmean(peaks),
+        "writes_per_hour": store.writes * 3600 / SIMULATED_SECONDS,
+    }
+
+
+async def run_flush(
+    hass: HomeAssistant, tariff: str, cadence: int, interval: int, flush_interval: int
+) -> dict[str, float]:
+    """Feed state change events at cadence and flush them every interval."""
+    now = datetime(2026, 3, 2, 17, 30, tzinfo=UTC)
+
+    def clock() -> datetime:
+        return now
+
+    coordinator, store = make_coordinator(
+        hass,
+        tariff,
+        {CONF_STORE_FLUSH_INTERVAL: flush_interval, CONF_MIN_UPDATE_INTERVAL: interval},
+        clock,
+    )
+
+    energy = 1000.0
+    event_latencies: list[int] = []
+    flush_latencies: list[int] = []
+    next_flush = now + timedelta(seconds=interval)
+    # The flush timer is fired by hand on the simulated clock.
+    with (
+        patch.object(dt_util, "utcnow", clock),
+        patch(
+            "custom_components.ute_tariff.coordinator.async_call_later",
+            lambda _hass, _delay, _action: lambda: None,
+        ),
+    ):
+        for _ in range(SIMULATED_SECONDS // cadence):
+            now += timedelta(seconds=cadence)
+            energy += 0.0004 * cadence
+            state = State(
+                ENERGY_ENTITY_ID, str(round(energy, 4)), last_changed=now, last_updated=now
+            )
+            event = SimpleNamespace(
+                data={"entity_id": ENERGY_ENTITY_ID, "old_state": None, "new_state": state}
+            )
+
+            start = time.perf_counter_ns()
+            coordinator._handle_state_change(event)
+            event_latencies.append(time.perf_counter_ns() - start)
+
+            if now >= next_flush:
+                next_flush = now + timedelta(seconds=interval)
+                start = time.perf_counter_ns()
+                coordinator._handle_flush(now)
+                flush_latencies.append(time.perf_counter_ns() - start)
+                # Let the save scheduled by the flush run.
+                await asyncio.sleep(0)
+            store.tick()
+
+    return {
+        "events": len(event_latencies),
+        "flushes": len(flush_latencies),
+        "event_us": statistics.fmean(event_latencies) / 1000,
+        "flush_us": statistics.fmean(flush_latencies) / 1000,
+        "flush_p95_us": percentile(flush_latencies, 95) / 1000,
+        "pushed": coordinator.updates_pushed,
+        "writes_per_hour": store.writes * 3600 / SIMULATED_SECONDS,
+    }
+
+
+async def run_snapshot(hass: HomeAssistant, tariff: str) -> dict[str, float]:
+    """Time _build_snapshot with every shadow, cached and rebuilt schedules."""
+    now = datetime(2026, 3, 2, 17, 30, tzinfo=UTC)
+
+    def clock() -> datetime:
+        return now
+
+    coordinator, _store = make_coordinator(
+        hass,
+        tariff,
+        {CONF_COMPARE_TARIFFS: True, CONF_COMPARE_PUNTA_WINDOWS: True},
+        clock,
+    )
+
+    energy = 1000.0
+    cached: list[int] = []
+    rebuilt: list[int] = []
+    with patch.object(dt_util, "utcnow", clock):
+        # An hour of consumption so the shadows and profile have content.
+        for _ in range(SIMULATED_SECONDS // 60):
+            now += timedelta(seconds=60)
+            energy += 0.024
+            hass.states.async_set(ENERGY_ENTITY_ID, str(round(energy, 4)))
+            await coordinator._async_update_data()
+
+        coordinator._build_snapshot(now)
+        for _ in range(SNAPSHOT_RUNS):
+            start = time.perf_counter_ns()
+            coordinator._build_snapshot(now)
+            cached.append(time.perf_counter_ns() - start)
+
+            coordinator._schedule_key = None
+            start = time.perf_counter_ns()
+            coordinator._build_snapshot(now)
+            rebuilt.append(time.perf_counter_ns() - start)
+
+    return {
+        "shadows": len(coordinator._shadow_options),
+        "cached_us": statistics.fmean(cached) / 1000,
+        "cached_p95_us": percentile(cached, 95) / 1000,
+        "rebuilt_us": statistics.fmean(rebuilt) / 1000,
+        "rebuilt_p95_us": percentile(rebuilt, 95) / 1000,
+    }
+
+
+async def async_main(flush_interval: int) -> None:
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        print(
+            f"{'tariff':<6} {'cadence':>8} {'updates':>8} {'mean µs':>10} "
+            f"{'p95 µs':>10} {'peak B/upd':>11} {'writes/h':>9}"
+        )
+        for tariff in (TARIFF_TRS, TARIFF_TRD, TARIFF_TRT):
+            for cadence in CADENCES:
+                result = await run_stream(hass, tariff, cadence, flush_interval)
+                print(
+                    f"{tariff:<6} {cadence:>7}s {result['updates']:>8} "
+                    f"{result['mean_us']:>10.1f} {result['p95_us']:>10.1f} "
+                    f"{result['peak_bytes']:>11.0f} {result['writes_per_hour']:>9.0f}"
+                )
+
+        print()
+        print(
+            f"{'tariff':<6} {'cadence':>8} {'flush':>6} {'events':>7} {'flushes':>8} "
+            f"{'event µs':>9} {'flush µs':>9} {'p95 µs':>9} {'pushed':>7} {'writes/h':>9}"
+        )
+        for tariff in (TARIFF_TRS, TARIFF_TRD, TARIFF_TRT):
+            for interval in FLUSH_INTERVALS:
+                result = await run_flush(hass, tariff, 1, interval, flush_interval)
+                print(
+                    f"{tariff:<6} {1:>7}s {interval:>5}s {result['events']:>7} "
+                    f"{result['flushes']:>8} {result['event_us']:>9.2f} "
+                    f"{result['flush_us']:>9.1f} {result['flush_p95_us']:>9.1f} "
+                    f"{result['pushed']:>7} {result['writes_per_hour']:>9.0f}"
+                )
+
+        print()
+        print(
+            f"{'tariff':<6} {'shadows':>8} {'snapshot µs':>12} {'p95 µs':>9} "
+            f"{'+schedule µs':>13} {'p95 µs':>9}"
+        )
+        for tariff in (TARIFF_TRS, TARIFF_TRD, TARIFF_TRT):
+            result = await run_snapshot(hass, tariff)
+            print(
+                f"{tariff:<6} {result['shadows']:>8} {result['cached_us']:>12.1f} "
+                f"{result['cached_p95_us']:>9.1f} {result['rebuilt_us']:>13.1f} "
+                f"{result['rebuilt_p95_us']:>9.1f}"
+            )
+        await hass.async_stop(force=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--flush-interval",
+        type=int,
+        default=60,
+        help="store_flush_interval option to benchmark (0 saves on every update)",
+    )
+    args = parser.parse_args()
+    asyncio.run(async_main(args.flush_interval))
+
+
+if __name__ == "__main__":
+    main()
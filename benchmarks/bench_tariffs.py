@@ -0,0 +1,112 @@
+"""Benchmarks for the tariff engine.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_tariffs
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import random
+from datetime import UTC, datetime
+
+from custom_components.ute_tariff.const import TARIFF_TRD, TARIFF_TRS, TARIFF_TRT
+from custom_components.ute_tariff.tariffs import (
+    DEFAULT_PRICE_TABLE,
+    batch_costs,
+    classify_period,
+    compile_price_table,
+    get_timeline,
+    trs_cost_for_delta,
+    trs_marginal_price,
+    trs_tier_breakdown,
+)
+
+from ._common import HEADER, measure
+
+TIMEZONE = "America/Montevideo"
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+HOLIDAYS = ["2026-01-01", "2026-05-01", "2026-07-18", "2026-08-25", "2026-12-25"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    base = datetime(2026, 1, 1, tzinfo=UTC).timestamp()
+    moments = [
+        datetime.fromtimestamp(base + rng.random() * 365 * 86400, UTC) for _ in range(1024)
+    ]
+    totals = [rng.random() * 900 for _ in range(1024)]
+    trs_prices = DEFAULT_PRICE_TABLE[TARIFF_TRS]
+    counter = iter(range(1 << 62))
+
+    def pick(values):
+        return values[next(counter) & 1023]
+
+    print(HEADER)
+    for tariff in (TARIFF_TRS, TARIFF_TRD, TARIFF_TRT):
+        print(
+            measure(
+                f"classify_period[{tariff}]",
+                lambda tariff=tariff: classify_period(
+                    tariff, pick(moments), "18-22", True, HOLIDAYS, TIMEZONE
+                ),
+                args.runs,
+            ).row()
+        )
+        timeline = get_timeline(tariff, TIMEZONE, "18-22", True, tuple(HOLIDAYS))
+        print(
+            measure(
+                f"PeriodTimeline.classify[{tariff}]",
+                lambda timeline=timeline: timeline.classify(pick(moments)),
+                args.runs,
+            ).row()
+        )
+
+    print(
+        measure(
+            "trs_cost_for_delta",
+            lambda: trs_cost_for_delta(pick(totals), 0.05, trs_prices),
+            args.runs,
+        ).row()
+    )
+    print(
+        measure(
+            "trs_marginal_price",
+            lambda: trs_marginal_price(pick(totals), trs_prices),
+            args.runs,
+        ).row()
+    )
+    print(
+        measure(
+            "trs_tier_breakdown",
+            lambda: trs_tier_breakdown(pick(totals), trs_prices),
+            args.runs,
+        ).row()
+    )
+
+    timestamps = [base + 900 * index for index in range(35040)]
+    kwh = [rng.random() * 0.3 for _ in timestamps]
+    prices = compile_price_table(DEFAULT_PRICE_TABLE)
+    for tariff in (TARIFF_TRS, TARIFF_TRT):
+        timeline = get_timeline(tariff, TIMEZONE, "18-22", True, tuple(HOLIDAYS))
+        for use_numpy in (True, False):
+            if use_numpy and not HAS_NUMPY:
+                continue
+            print(
+                measure(
+                    f"batch_costs[{tariff}, 35k rows, numpy={use_numpy}]",
+                    lambda timeline=timeline, use_numpy=use_numpy: batch_costs(
+                        timeline, timestamps, kwh, prices[tariff], use_numpy=use_numpy
+                    ),
+                    5,
+                ).row()
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,41 @@
 """UTE Tariff integration."""
 from __future__ import annotations
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from typing import TYPE_CHECKING
 
-from .const import DOMAIN
-from .coordinator import UteTariffCoordinator
-from .services import async_register_services
+from .const import (
+    CONF_COMPARE_TARIFFS,
+    CONF_EXTERNAL_STATISTICS,
+    CONF_POWER_ENTITY_ID,
+    DOMAIN,
+)
 
-PLATFORMS: list[str] = ["sensor"]
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant
+
+    from .coordinator import UteTariffCoordinator
+    from .engine import UteTariffEngine
+
+PLATFORMS: list[str] = ["sensor", "binary_sensor"]
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    coordinator = UteTariffCoordinator(hass, entry)
+    # Imported here so the package, and with it the tariff engine and the
+    # offline simulator, can be imported without Home Assistant installed.
+    from .coordinator import UteTariffCoordinator
+    from .engine import UteTariffEngine
+    from .services import async_register_services
+
+    engine: UteTariffEngine | None = hass.data.get(DOMAIN)
+    if engine is None:
+        engine = hass.data[DOMAIN] = UteTariffEngine(hass)
+
+    await engine.async_load_price_tables(entry)
+    coordinator = UteTariffCoordinator(hass, entry, engine)
     await coordinator.async_initialize()
 
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
+    engine.async_add(coordinator)
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
@@ -29,14 +49,26 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
 
 async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    coordinator: UteTariffCoordinator = hass.data[DOMAIN][entry.entry_id]
+    coordinator: UteTariffCoordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    options = coordinator.options
+    if options.compare_tariffs != entry.options.get(
+        CONF_COMPARE_TARIFFS, False
+    ) or options.external_statistics != entry.options.get(
+        CONF_EXTERNAL_STATISTICS, False
+    ) or options.power_entity_id != (entry.options.get(CONF_POWER_ENTITY_ID) or None):
+        # The comparison sensors and the cost sensors' state class are set
+        # up with the entities, and the power sensor is subscribed to at
+        # setup, so changing any of them needs a reload.
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
     await coordinator.async_reload_options()
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        coordinator: UteTariffCoordinator | None = hass.data[DOMAIN].pop(entry.entry_id, None)
+        engine: UteTariffEngine = hass.data[DOMAIN]
+        coordinator = engine.async_remove(entry.entry_id)
         if coordinator is not None:
             await coordinator.async_shutdown()
     return unload_ok
@@ -0,0 +1,324 @@
+"""Energy attribution for UTE Tariff."""
+from __future__ import annotations
+
+from collections.abc import Sequence
+from datetime import date, datetime
+from typing import Any
+
+from .const import TARIFF_TRS
+from .options import TariffOptions
+from .tariffs import PERIODS, PeriodInfo, batch_costs
+
+BatchPiece = tuple[int, datetime, float, float, float, str]
+
+
+def empty_buckets() -> dict[str, Any]:
+    return {
+        "kwh_today": 0.0,
+        "kwh_month": 0.0,
+        "cost_today": 0.0,
+        "cost_month": 0.0,
+        "breakdown": {},
+        "last_reset_day": None,
+        "last_reset_month": None,
+        "previous_month": None,
+    }
+
+
+def reset_if_needed(state: dict[str, Any], local_dt: datetime) -> bool:
+    day_key = local_dt.date().isoformat()
+    month_key = day_key[:8] + "01"
+    reset = False
+
+    last_day = state.get("last_reset_day")
+    if last_day is None or day_key > last_day:
+        state["kwh_today"] = 0.0
+        state["cost_today"] = 0.0
+        state["last_reset_day"] = day_key
+        reset = True
+
+    last_month = state.get("last_reset_month")
+    if last_month is None or month_key > last_month:
+        # The closed month stays available so energy reported after the
+        # reset is still costed at the tier it was consumed in.
+        state["previous_month"] = None
+        if last_month is not None:
+            state["previous_month"] = {
+                "month": last_month,
+                "kwh_month": state["kwh_month"],
+                "cost_month": state["cost_month"],
+                "breakdown": state["breakdown"],
+            }
+        state["kwh_month"] = 0.0
+        state["cost_month"] = 0.0
+        state["breakdown"] = {}
+        state["last_reset_month"] = month_key
+        reset = True
+
+    return reset
+
+
+def apply_interval(
+    state: dict[str, Any],
+    options: TariffOptions,
+    delta: float,
+    start_ts: float,
+    end_ts: float,
+) -> bool:
+    return apply_pieces(state, options, split_interval(options, delta, start_ts, end_ts))
+
+
+def split_interval(
+    options: TariffOptions, delta: float, start_ts: float, end_ts: float
+) -> list[tuple[datetime, float, PeriodInfo]]:
+    """Spread delta pro rata over [start_ts, end_ts].
+
+    The interval is split at every period transition and local midnight
+    from the tariff timeline, so energy lands in the period, day and month
+    it was consumed in regardless of how often the meter reports. Returns
+    (local start, kWh, period) pieces in order.
+    """
+    timeline = options.timeline
+    if end_ts <= start_ts:
+        local_dt = datetime.fromtimestamp(end_ts, options.tz)
+        return [(local_dt, delta, timeline.classify_ts(end_ts))]
+
+    span = end_ts - start_ts
+    return [
+        (
+            datetime.fromtimestamp(seg_start, options.tz),
+            delta * (seg_end - seg_start) / span,
+            info,
+        )
+        for seg_start, seg_end, info in timeline.segments(start_ts, end_ts)
+    ]
+
+
+def apply_pieces(
+    state: dict[str, Any],
+    options: TariffOptions,
+    pieces: list[tuple[datetime, float, PeriodInfo]],
+    circuit: dict[str, Any] | None = None,
+    costs: list[float] | None = None,
+) -> bool:
+    """Accumulate split pieces into the day and month buckets.
+
+    Pieces that belong to an already closed day are not added to today's
+    buckets, and pieces of the month before the current one are costed and
+    added to the totals kept for it at the reset. Older pieces are skipped.
+    When circuit buckets are given, each piece is also credited to them at
+    the cost it added to the household total, so TRS tiers follow the sum
+    of all meters. When a costs list is given, the cost of every piece is
+    appended to it, 0.0 for skipped pieces. Returns True if a day or month
+    reset happened.
+    """
+    reset = False
+    for local_dt, kwh, info in pieces:
+        reset |= reset_if_needed(state, local_dt)
+        local_day = local_dt.date()
+        day_key = local_day.isoformat()
+        month_key = day_key[:8] + "01"
+        buckets = month_buckets(state, month_key)
+        if buckets is None:
+            if costs is not None:
+                costs.append(0.0)
+            continue
+        count_today = day_key == state["last_reset_day"]
+        cost = apply_kwh(buckets, options, kwh, info, local_day, count_today)
+        if circuit is not None:
+            reset_if_needed(circuit, local_dt)
+            circuit_buckets = month_buckets(circuit, month_key)
+            if circuit_buckets is not None:
+                _add_share(circuit_buckets, options, kwh, cost, info.period, count_today)
+        if costs is not None:
+            costs.append(cost)
+    return reset
+
+
+def apply_batch(
+    state: dict[str, Any],
+    options: TariffOptions,
+    intervals: Sequence[tuple[float, float, float]],
+    circuits: Sequence[dict[str, Any] | None] | None = None,
+) -> list[BatchPiece]:
+    """Accumulate many (start ts, end ts, kWh) intervals costed by batch_costs.
+
+    Intervals, in order, are split like split_interval, and the pieces are
+    costed in runs that share a local month and a price table, so each run
+    has one set of prices and its TRS tiers continue from the month total so
+    far. circuits, when given, holds the circuit buckets of every interval.
+    Pieces of the previous month go to its kept totals and older pieces are
+    skipped and cost 0.0, as in apply_pieces. Returns (interval index, local start, end ts, kWh, cost,
+    period) for every piece.
+    """
+    timeline = options.timeline
+    sources: list[int] = []
+    starts: list[float] = []
+    ends: list[float] = []
+    energy: list[float] = []
+    for index, (start_ts, end_ts, kwh) in enumerate(intervals):
+        if end_ts <= start_ts:
+            segments = [(end_ts, end_ts, kwh)]
+        else:
+            span = end_ts - start_ts
+            segments = [
+                (seg_start, seg_end, kwh * (seg_end - seg_start) / span)
+                for seg_start, seg_end, _info in timeline.segments(start_ts, end_ts)
+            ]
+        for seg_start, seg_end, seg_kwh in segments:
+            sources.append(index)
+            starts.append(seg_start)
+            ends.append(seg_end)
+            energy.append(seg_kwh)
+
+    local = [datetime.fromtimestamp(ts, options.tz) for ts in starts]
+    days = [local_dt.date() for local_dt in local]
+    pieces: list[BatchPiece] = []
+    first = 0
+    while first < len(starts):
+        month = days[first].replace(day=1)
+        prices = options.prices(days[first])
+        last = first + 1
+        while (
+            last < len(starts)
+            and days[last].replace(day=1) == month
+            and options.prices(days[last]) is prices
+        ):
+            last += 1
+
+        reset_if_needed(state, local[first])
+        month_key = month.isoformat()
+        buckets = month_buckets(state, month_key)
+        result = batch_costs(
+            timeline,
+            starts[first:last],
+            energy[first:last],
+            prices,
+            0.0 if buckets is None else buckets["kwh_month"],
+        )
+        for offset, index in enumerate(range(first, last)):
+            period = PERIODS[result.period_codes[offset]]
+            cost = 0.0
+            if buckets is not None:
+                cost = float(result.costs[offset])
+                reset_if_needed(state, local[index])
+                count_today = days[index].isoformat() == state["last_reset_day"]
+                _add_totals(buckets, energy[index], cost, count_today)
+                circuit = None if circuits is None else circuits[sources[index]]
+                if circuit is not None:
+                    reset_if_needed(circuit, local[index])
+                    circuit_buckets = month_buckets(circuit, month_key)
+                    if circuit_buckets is not None:
+                        _add_share(
+                            circuit_buckets, options, energy[index], cost, period, count_today
+                        )
+            pieces.append(
+                (sources[index], local[index], ends[index], energy[index], cost, period)
+            )
+        if buckets is not None:
+            breakdown = buckets["breakdown"]
+            for key, value in result.breakdown.items():
+                breakdown[key] = breakdown.get(key, 0.0) + value
+        first = last
+    return pieces
+
+
+def month_buckets(state: dict[str, Any], month_key: str) -> dict[str, Any] | None:
+    """Return the buckets for a local month, the current or the previous one."""
+    if month_key == state["last_reset_month"]:
+        return state
+    previous = state.get("previous_month")
+    if previous is not None and previous["month"] == month_key:
+        return previous
+    return None
+
+
+def apply_kwh(
+    state: dict[str, Any],
+    options: TariffOptions,
+    kwh: float,
+    info: PeriodInfo,
+    day: date,
+    count_today: bool = True,
+) -> float:
+    """Add kWh consumed on a local day at the prices in effect that day."""
+    prev_kwh_month = state["kwh_month"]
+    state["kwh_month"] += kwh
+
+    prices = options.prices(day)
+    if prices.tiers is not None:
+        tiers = prices.tiers
+        cost = tiers.cost_for_delta(prev_kwh_month, kwh)
+        # Added as a difference so that, when prices change mid-month, tier
+        # costs already booked keep the rates they were consumed at.
+        before = tiers.breakdown(prev_kwh_month)
+        breakdown = state["breakdown"]
+        for key, value in tiers.breakdown(state["kwh_month"]).items():
+            breakdown[key] = breakdown.get(key, 0.0) + value - before[key]
+    else:
+        cost = kwh * prices.rates[info.period]
+        breakdown = state["breakdown"]
+        key_kwh = f"kwh_{info.period}"
+        key_cost = f"cost_{info.period}"
+        breakdown[key_kwh] = breakdown.get(key_kwh, 0.0) + kwh
+        breakdown[key_cost] = breakdown.get(key_cost, 0.0) + cost
+
+    state["cost_month"] += cost
+    if count_today:
+        state["kwh_today"] += kwh
+        state["cost_today"] += cost
+    return cost
+
+
+def _add_share(
+    buckets: dict[str, Any],
+    options: TariffOptions,
+    kwh: float,
+    cost: float,
+    period: str,
+    count_today: bool,
+) -> None:
+    _add_totals(buckets, kwh, cost, count_today)
+    if options.tariff != TARIFF_TRS:
+        breakdown = buckets["breakdown"]
+        key_kwh = f"kwh_{period}"
+        key_cost = f"cost_{period}"
+        breakdown[key_kwh] = breakdown.get(key_kwh, 0.0) + kwh
+        breakdown[key_cost] = breakdown.get(key_cost, 0.0) + cost
+
+
+def bill_total(options: TariffOptions, energy_cost: float, day: date) -> float:
+    prices = options.prices(day)
+    fixed = 0.0
+    if options.include_fixed:
+        fixed = prices.fixed_charge_month
+
+    power = 0.0
+    if options.include_power:
+        power = prices.power_charge_per_kw * options.contracted_power_kw
+
+    if options.include_vat:
+        energy_cost *= 1 + options.vat_rate
+        if options.apply_vat_to_fixed:
+            fixed *= 1 + options.vat_rate
+            power *= 1 + options.vat_rate
+
+    return energy_cost + fixed + power
+
+
+def power_charge(options: TariffOptions, power_kw: float, day: date) -> float:
+    """Return the power charge for power_kw, with VAT as bill_total applies it."""
+    charge = options.prices(day).power_charge_per_kw * power_kw
+    if options.include_vat and options.apply_vat_to_fixed:
+        charge *= 1 + options.vat_rate
+    return charge
+
+
+def _add_totals(
+    buckets: dict[str, Any], kwh: float, cost: float, count_today: bool
+) -> None:
+    buckets["kwh_month"] += kwh
+    buckets["cost_month"] += cost
+    if count_today:
+        buckets["kwh_today"] += kwh
+        buckets["cost_today"] += cost
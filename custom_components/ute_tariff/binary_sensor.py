@@ -0,0 +1,76 @@
+"""Binary sensors for UTE Tariff."""
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import ATTR_CONTRACTED_POWER_KW, CONF_TARIFF, DOMAIN
+from .coordinator import UteTariffCoordinator
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities
+) -> None:
+    coordinator: UteTariffCoordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+    async_add_entities([UteTariffOverContractSensor(coordinator, entry)])
+
+
+class UteTariffOverContractSensor(
+    CoordinatorEntity[UteTariffCoordinator], BinarySensorEntity
+):
+    """On while the month's peak demand exceeds the contracted power.
+
+    Unavailable until a contracted power is configured.
+    """
+
+    _attr_name = "UTE Tariff Over Contracted Power"
+    _attr_device_class = BinarySensorDeviceClass.PROBLEM
+    # The live demand changes with every update.
+    _unrecorded_attributes = frozenset({"demand_kw"})
+
+    def __init__(self, coordinator: UteTariffCoordinator, entry: ConfigEntry) -> None:
+        super().__init__(coordinator)
+        self._attr_unique_id = f"{entry.entry_id}_over_contracted_power"
+        self._entry = entry
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        return DeviceInfo(
+            identifiers={(DOMAIN, self._entry.entry_id)},
+            name="UTE Tariff",
+            manufacturer="UTE",
+            model=self._entry.options.get(CONF_TARIFF, self._entry.data.get(CONF_TARIFF)),
+        )
+
+    @property
+    def available(self) -> bool:
+        return super().available and self.coordinator.options.contracted_power_kw > 0
+
+    @property
+    def is_on(self) -> bool | None:
+        max_demand_kw = self.coordinator.snapshot.values.get("max_demand_kw_month")
+        if max_demand_kw is None:
+            return None
+        return max_demand_kw > self.coordinator.options.contracted_power_kw
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any]:
+        values = self.coordinator.snapshot.values
+        return {
+            ATTR_CONTRACTED_POWER_KW: self.coordinator.options.contracted_power_kw,
+            "max_demand_kw_month": _round(values.get("max_demand_kw_month")),
+            "demand_kw": _round(values.get("demand_kw")),
+        }
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 3)
@@ -1,7 +1,6 @@
 """Config flow for UTE Tariff."""
 from __future__ import annotations
 
-import json
 import logging
 from typing import Any
 
@@ -14,21 +13,35 @@ from homeassistant.helpers import selector
 
 from .const import (
     CONF_APPLY_VAT_TO_FIXED,
+    CONF_COMPARE_PUNTA_WINDOWS,
+    CONF_COMPARE_TARIFFS,
     CONF_CONTRACTED_POWER_KW,
     CONF_ENERGY_ENTITY_ID,
+    CONF_EXTERNAL_STATISTICS,
     CONF_HOLIDAYS_LIST,
     CONF_INCLUDE_FIXED,
     CONF_INCLUDE_POWER,
     CONF_INCLUDE_VAT,
+    CONF_MIN_UPDATE_INTERVAL,
     CONF_MODE,
+    CONF_PRICE_TABLE_FILE,
+    CONF_POWER_ENTITY_ID,
     CONF_PRICE_TABLE_OVERRIDE,
     CONF_PUNTA_WINDOW,
+    CONF_SENSOR_THRESHOLDS,
+    CONF_STORE_FLUSH_INTERVAL,
     CONF_TARIFF,
     CONF_TIMEZONE,
+    CONF_UPDATE_THRESHOLD,
     CONF_USE_HOLIDAYS,
     CONF_VAT_RATE,
     DEFAULT_HOLIDAYS_2026,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_PUNTA_WINDOW,
+    DEFAULT_STORE_FLUSH_INTERVAL,
     DEFAULT_TIMEZONE,
+    DEFAULT_UPDATE_THRESHOLD,
+    DEFAULT_VAT_RATE,
     DOMAIN,
     MODE_AVERAGE,
     MODE_BILL_LIKE,
@@ -38,6 +51,8 @@ from .const import (
     TARIFF_TRT,
     TARIFF_TRS,
 )
+from .options import parse_price_table_override, parse_sensor_thresholds
+from .tariffs import load_price_tables
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -49,13 +64,14 @@ class UteTariffConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_user(self, user_input: dict[str, Any] | None = None):
         if user_input is not None:
-            await self._warn_if_energy_entity_invalid(user_input[CONF_ENERGY_ENTITY_ID])
+            for entity_id in user_input[CONF_ENERGY_ENTITY_ID]:
+                await self._warn_if_energy_entity_invalid(entity_id)
             return self.async_create_entry(title="UTE Tariff", data=user_input)
 
         data_schema = vol.Schema(
             {
                 vol.Required(CONF_ENERGY_ENTITY_ID): selector.EntitySelector(
-                    selector.EntitySelectorConfig()
+                    selector.EntitySelectorConfig(multiple=True)
                 ),
                 vol.Required(CONF_TARIFF, default=TARIFF_TRS): vol.In(
                     [TARIFF_TRS, TARIFF_TRD, TARIFF_TRT]
@@ -101,6 +117,14 @@ class UteTariffOptionsFlowHandler(config_entries.OptionsFlow):
 
         if user_input is not None:
             options = self._normalize_options(user_input, errors)
+            price_file = options.get(CONF_PRICE_TABLE_FILE)
+            if price_file:
+                try:
+                    await self.hass.async_add_executor_job(
+                        load_price_tables, self.hass.config.path(price_file)
+                    )
+                except (OSError, ValueError):
+                    errors[CONF_PRICE_TABLE_FILE] = "invalid_price_table_file"
             if not errors:
                 return self.async_create_entry(title="", data=options)
 
@@ -113,7 +137,7 @@ class UteTariffOptionsFlowHandler(config_entries.OptionsFlow):
                 vol.Optional(CONF_MODE, default=options.get(CONF_MODE, MODE_MARGINAL)): vol.In(
                     [MODE_MARGINAL, MODE_AVERAGE, MODE_BILL_LIKE]
                 ),
-                vol.Optional(CONF_PUNTA_WINDOW, default=options.get(CONF_PUNTA_WINDOW, "18-22")): vol.In(
+                vol.Optional(CONF_PUNTA_WINDOW, default=options.get(CONF_PUNTA_WINDOW, DEFAULT_PUNTA_WINDOW)): vol.In(
                     PUNTA_WINDOWS
                 ),
                 vol.Optional(CONF_USE_HOLIDAYS, default=options.get(CONF_USE_HOLIDAYS, False)): bool,
@@ -133,13 +157,21 @@ class UteTariffOptionsFlowHandler(config_entries.OptionsFlow):
                     CONF_CONTRACTED_POWER_KW,
                     default=options.get(CONF_CONTRACTED_POWER_KW, 0.0),
                 ): vol.Coerce(float),
+                vol.Optional(
+                    CONF_POWER_ENTITY_ID,
+                    description={
+                        "suggested_value": options.get(CONF_POWER_ENTITY_ID)
+                    },
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(domain="sensor")
+                ),
                 vol.Optional(
                     CONF_INCLUDE_VAT,
                     default=options.get(CONF_INCLUDE_VAT, False),
                 ): bool,
                 vol.Optional(
                     CONF_VAT_RATE,
-                    default=options.get(CONF_VAT_RATE, 0.22),
+                    default=options.get(CONF_VAT_RATE, DEFAULT_VAT_RATE),
                 ): vol.Coerce(float),
                 vol.Optional(
                     CONF_APPLY_VAT_TO_FIXED,
@@ -149,6 +181,42 @@ class UteTariffOptionsFlowHandler(config_entries.OptionsFlow):
                     CONF_PRICE_TABLE_OVERRIDE,
                     default=options.get(CONF_PRICE_TABLE_OVERRIDE, ""),
                 ): str,
+                vol.Optional(
+                    CONF_PRICE_TABLE_FILE,
+                    default=options.get(CONF_PRICE_TABLE_FILE, ""),
+                ): str,
+                vol.Optional(
+                    CONF_STORE_FLUSH_INTERVAL,
+                    default=options.get(
+                        CONF_STORE_FLUSH_INTERVAL, DEFAULT_STORE_FLUSH_INTERVAL
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                vol.Optional(
+                    CONF_MIN_UPDATE_INTERVAL,
+                    default=options.get(
+                        CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                vol.Optional(
+                    CONF_UPDATE_THRESHOLD,
+                    default=options.get(CONF_UPDATE_THRESHOLD, DEFAULT_UPDATE_THRESHOLD),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_COMPARE_TARIFFS,
+                    default=options.get(CONF_COMPARE_TARIFFS, False),
+                ): bool,
+                vol.Optional(
+                    CONF_COMPARE_PUNTA_WINDOWS,
+                    default=options.get(CONF_COMPARE_PUNTA_WINDOWS, False),
+                ): bool,
+                vol.Optional(
+                    CONF_EXTERNAL_STATISTICS,
+                    default=options.get(CONF_EXTERNAL_STATISTICS, False),
+                ): bool,
+                vol.Optional(
+                    CONF_SENSOR_THRESHOLDS,
+                    default=options.get(CONF_SENSOR_THRESHOLDS, ""),
+                ): str,
             }
         )
 
@@ -173,8 +241,16 @@ class UteTariffOptionsFlowHandler(config_entries.OptionsFlow):
         override = options.get(CONF_PRICE_TABLE_OVERRIDE)
         if override:
             try:
-                json.loads(override)
+                parse_price_table_override(override)
+            except (ValueError, TypeError) as err:
+                _LOGGER.warning("Invalid price table override: %s", err)
+                errors[CONF_PRICE_TABLE_OVERRIDE] = "invalid_price_table"
+
+        thresholds = options.get(CONF_SENSOR_THRESHOLDS)
+        if thresholds:
+            try:
+                parse_sensor_thresholds(thresholds)
             except ValueError:
-                errors[CONF_PRICE_TABLE_OVERRIDE] = "invalid_json"
+                errors[CONF_SENSOR_THRESHOLDS] = "invalid_sensor_thresholds"
 
         return options
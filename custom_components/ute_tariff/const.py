@@ -6,8 +6,12 @@ NAME = "UTE Tariff (Uruguay)"
 
 DEFAULT_TIMEZONE = "America/Montevideo"
 DEFAULT_SCAN_INTERVAL = 30
+DEFAULT_STORE_FLUSH_INTERVAL = 60
+DEFAULT_MIN_UPDATE_INTERVAL = 0
+DEFAULT_UPDATE_THRESHOLD = 0.0
 
 CONF_ENERGY_ENTITY_ID = "energy_entity_id"
+CONF_POWER_ENTITY_ID = "power_entity_id"
 CONF_TARIFF = "tariff"
 CONF_MODE = "mode"
 CONF_TIMEZONE = "timezone"
@@ -22,16 +26,27 @@ CONF_INCLUDE_VAT = "include_vat"
 CONF_VAT_RATE = "vat_rate"
 CONF_APPLY_VAT_TO_FIXED = "apply_vat_to_fixed_charge"
 CONF_PRICE_TABLE_OVERRIDE = "price_table_override"
+CONF_PRICE_TABLE_FILE = "price_table_file"
+CONF_STORE_FLUSH_INTERVAL = "store_flush_interval"
+CONF_MIN_UPDATE_INTERVAL = "min_update_interval"
+CONF_UPDATE_THRESHOLD = "update_threshold"
+CONF_COMPARE_TARIFFS = "compare_tariffs"
+CONF_COMPARE_PUNTA_WINDOWS = "compare_punta_windows"
+CONF_EXTERNAL_STATISTICS = "external_statistics"
+CONF_SENSOR_THRESHOLDS = "sensor_thresholds"
 
 TARIFF_TRS = "TRS"
 TARIFF_TRD = "TRD"
 TARIFF_TRT = "TRT"
+TARIFFS = [TARIFF_TRS, TARIFF_TRD, TARIFF_TRT]
 
 MODE_MARGINAL = "marginal"
 MODE_AVERAGE = "average"
 MODE_BILL_LIKE = "bill_like"
 
 PUNTA_WINDOWS = ["17-21", "18-22", "19-23"]
+DEFAULT_PUNTA_WINDOW = "18-22"
+DEFAULT_VAT_RATE = 0.22
 
 DEFAULT_HOLIDAYS_2026 = [
     "2026-01-01",
@@ -42,9 +57,27 @@ DEFAULT_HOLIDAYS_2026 = [
 ]
 
 SERVICE_SET_VALUE = "set_value"
+SERVICE_SET_VALUES = "set_values"
+SERVICE_RECOMPUTE = "recompute"
+SERVICE_GET_HISTORY = "get_history"
+SERVICE_GET_PRICE_SCHEDULE = "get_price_schedule"
+SERVICE_FIND_CHEAPEST_WINDOW = "find_cheapest_window"
 SERVICE_FIELD_TARGET_ENTITY_ID = "target_entity_id"
 SERVICE_FIELD_VALUE_SOURCE = "value_source"
+SERVICE_FIELD_TARGETS = "targets"
 SERVICE_FIELD_ROUND_DIGITS = "round_digits"
+SERVICE_FIELD_START = "start"
+SERVICE_FIELD_END = "end"
+SERVICE_FIELD_CONFIG_ENTRY_ID = "config_entry_id"
+SERVICE_FIELD_DEVICE_ID = "device_id"
+SERVICE_FIELD_GROUP_BY = "group_by"
+SERVICE_FIELD_HOURS = "hours"
+SERVICE_FIELD_DURATION = "duration"
+SERVICE_FIELD_ENERGY_KWH = "energy_kwh"
+SERVICE_FIELD_DEADLINE = "deadline"
+
+GROUP_BY_HOUR = "hour"
+GROUP_BY_DAY = "day"
 
 VALUE_SOURCE_PRICE_NOW = "price_kwh_now"
 VALUE_SOURCE_AVG_MONTH = "avg_kwh_month"
@@ -60,8 +93,25 @@ ATTR_IS_HOLIDAY_TODAY = "is_holiday_today"
 ATTR_IS_PEAK_NOW = "is_peak_now"
 ATTR_BREAKDOWN = "breakdown"
 ATTR_LAST_UPDATE_TS = "last_update_ts"
+ATTR_KWH_MONTH = "kwh_month"
+ATTR_PUNTA_WINDOWS = "punta_windows"
+ATTR_CIRCUITS = "circuits"
+ATTR_SCHEDULE = "schedule"
+ATTR_CONTRACTED_POWER_KW = "contracted_power_kw"
+ATTR_MAX_DEMAND_AT = "max_demand_at"
+ATTR_MAX_DEMAND_BY_PERIOD = "max_demand_by_period"
+ATTR_POWER_CHARGE_ESTIMATE = "power_charge_estimate"
+
+SENSOR_THRESHOLD_KEYS = ("decimals", "absolute", "relative")
 
 STORAGE_KEY = "ute_tariff_state"
 STORAGE_VERSION = 1
 
 MAX_DELTA_KWH = 100000.0
+RECOMPUTE_CHUNK_DAYS = 7
+STATISTICS_SETTLE_HOURS = 24
+PROFILE_WEEKS = 8
+HISTORY_HOURS = 13 * 31 * 24
+SCHEDULE_HOURS = 48
+DEMAND_WINDOW_SECONDS = 15 * 60
+DEMAND_SLOT_SECONDS = 10
@@ -1,162 +1,489 @@
 """Coordinator for UTE Tariff."""
 from __future__ import annotations
 
-import json
 import logging
+from collections.abc import Mapping
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Any
+from datetime import UTC, datetime, timedelta
+from time import monotonic
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
 
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    statistics_during_period,
+)
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
-from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    State,
+    callback,
+)
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_state_change_event,
+)
 from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from homeassistant.util import dt as dt_util
 
+try:
+    from homeassistant.components.recorder.models import StatisticMeanType
+except ImportError:  # Home Assistant before 2025.4 only has has_mean.
+    StatisticMeanType = None
+
 from .const import (
-    CONF_APPLY_VAT_TO_FIXED,
-    CONF_CONTRACTED_POWER_KW,
-    CONF_ENERGY_ENTITY_ID,
-    CONF_HOLIDAYS_LIST,
-    CONF_INCLUDE_FIXED,
-    CONF_INCLUDE_POWER,
-    CONF_INCLUDE_VAT,
-    CONF_MODE,
-    CONF_PRICE_TABLE_OVERRIDE,
-    CONF_PUNTA_WINDOW,
-    CONF_TARIFF,
-    CONF_TIMEZONE,
-    CONF_USE_HOLIDAYS,
-    CONF_VAT_RATE,
-    DEFAULT_HOLIDAYS_2026,
+    ATTR_BREAKDOWN,
+    ATTR_CIRCUITS,
+    ATTR_CONTRACTED_POWER_KW,
+    ATTR_IS_HOLIDAY_TODAY,
+    ATTR_IS_PEAK_NOW,
+    ATTR_KWH_MONTH,
+    ATTR_LAST_UPDATE_TS,
+    ATTR_MAX_DEMAND_AT,
+    ATTR_MAX_DEMAND_BY_PERIOD,
+    ATTR_MODE,
+    ATTR_POWER_CHARGE_ESTIMATE,
+    ATTR_PUNTA_WINDOW,
+    ATTR_PUNTA_WINDOWS,
+    ATTR_TARIFF,
+    ATTR_TIMEZONE,
     DEFAULT_SCAN_INTERVAL,
-    DEFAULT_TIMEZONE,
+    DEMAND_WINDOW_SECONDS,
     DOMAIN,
     MAX_DELTA_KWH,
     MODE_AVERAGE,
     MODE_BILL_LIKE,
     MODE_MARGINAL,
-    TARIFF_TRD,
-    TARIFF_TRT,
+    RECOMPUTE_CHUNK_DAYS,
+    SCHEDULE_HOURS,
+    STATISTICS_SETTLE_HOURS,
     TARIFF_TRS,
+    TARIFFS,
+    VALUE_SOURCE_AVG_MONTH,
+    VALUE_SOURCE_EFF_MONTH,
+)
+from .accounting import (
+    apply_batch,
+    apply_interval,
+    apply_pieces,
+    bill_total,
+    empty_buckets,
+    power_charge,
+    reset_if_needed,
+    split_interval,
 )
-from .tariffs import (
-    DEFAULT_PRICE_TABLE,
-    classify_period,
-    trs_cost_for_delta,
-    trs_marginal_price,
-    trs_tier_breakdown,
+from .demand import DemandWindow, empty_demand, record_demand, reset_demand_if_needed
+from .forecast import (
+    empty_profile,
+    hourly_rate,
+    profile_key,
+    project_month,
+    update_profile,
 )
+from .history import HourlyHistory
+from .options import TariffOptions
+from .schedule import Interval, cheapest_window, price_schedule, schedule_rows
+from .tariffs import PERIOD_CODES, PeriodInfo
+
+if TYPE_CHECKING:
+    from .engine import UteTariffEngine
 
 _LOGGER = logging.getLogger(__name__)
 
+PUSH_KEYS = ("kwh_today", "kwh_month", "cost_today", "cost_month")
+POWER_UNITS = {"W": 0.001, "kW": 1.0, "MW": 1000.0}
+
 
-@dataclass
-class TariffOptions:
-    tariff: str
-    mode: str
-    timezone: str
-    punta_window: str
-    use_holidays: bool
-    holidays_list: list[str]
-    include_fixed: bool
-    include_power: bool
-    contracted_power_kw: float
-    include_vat: bool
-    vat_rate: float
-    apply_vat_to_fixed: bool
-    price_table: dict[str, Any]
+@dataclass(frozen=True, slots=True)
+class TariffSnapshot:
+    """Derived values computed once per refresh for sensors and services."""
+
+    values: Mapping[str, float | None]
+    attributes: Mapping[str, Any]
+    shadows: Mapping[str, Mapping[str, Any]]
+    schedule: tuple[Interval, ...]
+    schedule_rows: tuple[Mapping[str, Any], ...]
+    demand: Mapping[str, Any]
+
+
+EMPTY_SNAPSHOT = TariffSnapshot(
+    values=MappingProxyType({}),
+    attributes=MappingProxyType({}),
+    shadows=MappingProxyType({}),
+    schedule=(),
+    schedule_rows=(),
+    demand=MappingProxyType({}),
+)
 
 
 class UteTariffCoordinator(DataUpdateCoordinator[dict[str, Any]]):
     """Update coordinator for UTE Tariff."""
 
-    def __init__(self, hass: HomeAssistant, entry: ConfigEntry) -> None:
+    def __init__(
+        self, hass: HomeAssistant, entry: ConfigEntry, engine: UteTariffEngine
+    ) -> None:
+        # The energy entity pushes its changes through state change events and
+        # period edges are scheduled from the timeline, so polling is only a
+        # fallback for entries without an energy entity.
+        options, shadow_options = engine.compile(entry)
+        update_interval = None
+        if not options.energy_entity_ids:
+            update_interval = timedelta(seconds=DEFAULT_SCAN_INTERVAL)
         super().__init__(
             hass,
             _LOGGER,
             name=DOMAIN,
-            update_interval=timedelta(seconds=DEFAULT_SCAN_INTERVAL),
+            update_interval=update_interval,
         )
         self.entry = entry
+        self._engine = engine
         self._store = Store(hass, 1, f"{DOMAIN}.{entry.entry_id}")
+        self._history_store = Store(hass, 1, f"{DOMAIN}.{entry.entry_id}.history")
         self._unsub_state_change = None
+        self._unsub_power_change = None
+        self._options = options
+        self._shadow_options = shadow_options
+        self._pending_saves = 0
+        self._pending_readings: list[tuple[str, datetime, float]] = []
+        self._unsub_flush: CALLBACK_TYPE | None = None
+        self._last_flush = 0.0
+        # Set while recompute awaits the recorder; readings wait until the
+        # rebuilt state is in place instead of going into the one it replaces.
+        self._recomputing = False
+        self._update_deferred = False
+        self._pushed: dict[str, float] = {}
+        self.snapshot = EMPTY_SNAPSHOT
+        self.history = HourlyHistory()
+        self._history_dirty = False
+        self._history_saved_hour: int | None = None
+        # Demand is only kept in memory; the month maxima are stored.
+        self.demand = DemandWindow()
+        self._power_sample: tuple[float, float] | None = None
+        self._meter_power: dict[str, tuple[float, float]] = {}
+        self._schedule: tuple[Interval, ...] = ()
+        self._schedule_key: tuple[Any, ...] | None = None
+        self._schedule_end = 0.0
+        self.next_transition: datetime | None = None
+        self.store_writes = 0
+        self.store_writes_coalesced = 0
+        self.events_received = 0
+        self.batches_applied = 0
+        self.updates_pushed = 0
+        self.updates_suppressed = 0
 
     async def async_initialize(self) -> None:
         stored = await self._store.async_load()
         if stored is None:
             stored = {}
         self.data = self._default_state(stored)
+        stored_history = await self._history_store.async_load()
+        if stored_history is None and stored.get("history") is not None:
+            # Entries from before the separate store kept the ring with the
+            # state; it moves over before the state is saved without it.
+            self.history = HourlyHistory.from_dict(stored["history"])
+            self._history_dirty = True
+            await self._async_save_history(force=True)
+        else:
+            self.history = HourlyHistory.from_dict(stored_history)
+            self._history_saved_hour = self.history.last_hour
 
-        energy_entity_id = self.entry.data.get(CONF_ENERGY_ENTITY_ID)
-        if energy_entity_id:
+        energy_entity_ids = self._options.energy_entity_ids
+        if energy_entity_ids:
             self._unsub_state_change = async_track_state_change_event(
-                self.hass, [energy_entity_id], self._handle_state_change
+                self.hass, list(energy_entity_ids), self._handle_state_change
+            )
+        power_entity_id = self._options.power_entity_id
+        if power_entity_id:
+            state = self.hass.states.get(power_entity_id)
+            if state is not None:
+                self._power_sample = _power_sample(state)
+            self._unsub_power_change = async_track_state_change_event(
+                self.hass, [power_entity_id], self._handle_power_change
             )
 
         await self.async_config_entry_first_refresh()
 
     async def async_reload_options(self) -> None:
+        await self._engine.async_load_price_tables(self.entry)
+        self._options, self._shadow_options = self._engine.compile(self.entry)
+        self.data["shadows"] = {
+            name: shadow
+            for name, shadow in self.data["shadows"].items()
+            if name in self._shadow_options
+        }
         await self.async_request_refresh()
 
     @callback
-    def _handle_state_change(self, event) -> None:
-        self.async_request_refresh()
+    def _handle_state_change(self, event: Event[EventStateChangedData]) -> None:
+        self.events_received += 1
+        interval = self._options.min_update_interval
+        if interval <= 0:
+            self.hass.async_create_task(self.async_request_refresh())
+            return
+
+        new_state = event.data["new_state"]
+        if new_state is None:
+            return
+        try:
+            value = float(new_state.state)
+        except ValueError:
+            return
+
+        self._pending_readings.append(
+            (event.data["entity_id"], new_state.last_updated, value)
+        )
+        if self._unsub_flush is None:
+            delay = max(0.0, self._last_flush + interval - monotonic())
+            self._unsub_flush = async_call_later(self.hass, delay, self._handle_flush)
+
+    @callback
+    def _handle_power_change(self, event: Event[EventStateChangedData]) -> None:
+        # Power samples only feed the demand window, which is cheap enough to
+        # update at any rate; sensors pick it up with the next refresh.
+        new_state = event.data["new_state"]
+        if new_state is None:
+            return
+        self._record_demand(new_state.last_updated.timestamp())
+        self._power_sample = _power_sample(new_state)
+
+    @callback
+    def _handle_flush(self, _now: datetime) -> None:
+        self._unsub_flush = None
+        reset = self._flush_readings()
+        self.hass.async_create_task(self._async_save(force=reset))
+
+        if reset or self._visible_change():
+            self.updates_pushed += 1
+            self.async_set_updated_data(self.data)
+        else:
+            self.updates_suppressed += 1
+
+    def _flush_readings(self) -> bool:
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        self._last_flush = monotonic()
+        if self._recomputing:
+            self._update_deferred = True
+            return False
+        if not self._pending_readings:
+            return False
+
+        readings, self._pending_readings = self._pending_readings, []
+        options = self._get_options()
+        now_utc = dt_util.utcnow()
+        reset = self._reset_if_needed(now_utc.astimezone(options.tz))
+        for entity_id, when, value in readings:
+            reset |= self._ingest_reading(entity_id, value, when, options)
+        self.data["last_update_ts"] = now_utc.astimezone(options.tz).isoformat()
+        self.batches_applied += 1
+        return reset
+
+    def _visible_change(self) -> bool:
+        threshold = self._options.update_threshold
+        for key, value in self._pushed.items():
+            if abs(self.data.get(key, 0.0) - value) >= threshold:
+                return True
+        return False
 
     async def _async_update_data(self) -> dict[str, Any]:
-        energy_entity_id = self.entry.data.get(CONF_ENERGY_ENTITY_ID)
-        if not energy_entity_id:
+        options = self._get_options()
+        if not options.energy_entity_ids:
+            return self.data
+        if self._recomputing:
+            self._update_deferred = True
             return self.data
 
-        options = self._get_options()
+        reset = self._flush_readings()
 
         now_utc = dt_util.utcnow()
-        local_now = now_utc.astimezone(dt_util.get_time_zone(options.timezone))
-        self._reset_if_needed(local_now)
-
-        state = self.hass.states.get(energy_entity_id)
-        if state is None or state.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
-            _LOGGER.debug("Energy entity unavailable: %s", energy_entity_id)
-            self.data["last_update_ts"] = local_now.isoformat()
-            await self._store.async_save(self.data)
-            return self.data
+        local_now = now_utc.astimezone(options.tz)
+        reset |= self._reset_if_needed(local_now)
+        self.data["last_update_ts"] = local_now.isoformat()
 
-        try:
-            current_energy = float(state.state)
-        except ValueError:
-            _LOGGER.warning("Invalid energy state for %s: %s", energy_entity_id, state.state)
-            self.data["last_update_ts"] = local_now.isoformat()
-            await self._store.async_save(self.data)
-            return self.data
+        for energy_entity_id in options.energy_entity_ids:
+            state = self.hass.states.get(energy_entity_id)
+            if state is None or state.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+                _LOGGER.debug("Energy entity unavailable: %s", energy_entity_id)
+                continue
+            try:
+                current_energy = float(state.state)
+            except ValueError:
+                _LOGGER.warning(
+                    "Invalid energy state for %s: %s", energy_entity_id, state.state
+                )
+                continue
+            # The reading is dated when the meter reported it, so polls and
+            # period edge refreshes never move the baseline on their own.
+            reset |= self._ingest_reading(
+                energy_entity_id, current_energy, state.last_updated, options
+            )
+
+        await self._async_save(force=reset)
 
-        last_energy = self.data.get("last_energy_value")
+        return self.data
+
+    def _ingest_reading(
+        self,
+        entity_id: str,
+        current_energy: float,
+        when: datetime,
+        options: TariffOptions,
+    ) -> bool:
+        meter = self._meter_state(entity_id)
+        # Readings from before the baseline, such as ones that arrived while
+        # recompute set it from statistics, are already counted.
+        if self._last_energy_time(meter, when) > when:
+            return False
+        last_energy = meter["last_energy_value"]
         delta = 0.0
         if last_energy is not None:
             delta = current_energy - last_energy
         if delta < 0 or delta > MAX_DELTA_KWH:
             _LOGGER.warning(
                 "Energy delta reset detected for %s (last=%s current=%s)",
-                energy_entity_id,
+                entity_id,
                 last_energy,
                 current_energy,
             )
             delta = 0.0
 
+        reset = False
         if delta > 0:
-            self._apply_delta(delta, options, local_now)
+            start = self._last_energy_time(meter, when)
+            reset = self._apply_delta(delta, options, start, when, entity_id)
+            if options.power_entity_id is None:
+                self._add_energy_demand(entity_id, delta, start, when)
 
-        self.data["last_energy_value"] = current_energy
-        self.data["last_update_ts"] = local_now.isoformat()
+        meter["last_energy_value"] = current_energy
+        meter["last_energy_ts"] = when.astimezone(options.tz).isoformat()
+        return reset
+
+    async def async_recompute(self, start: datetime, end: datetime) -> dict[str, Any] | None:
+        options = self._get_options()
+        energy_entity_ids = options.energy_entity_ids
+        if not energy_entity_ids:
+            return None
 
-        await self._store.async_save(self.data)
+        self._recomputing = True
+        try:
+            return await self._async_rebuild(options, start, end)
+        finally:
+            self._recomputing = False
+            if self._update_deferred or self._pending_readings:
+                # Readings held back during the rebuild are applied to the
+                # new state, after its baselines.
+                self._update_deferred = False
+                self.hass.async_create_task(self.async_request_refresh())
 
-        return self.data
+    async def _async_rebuild(
+        self, options: TariffOptions, start: datetime, end: datetime
+    ) -> dict[str, Any] | None:
+        energy_entity_ids = options.energy_entity_ids
+        recorder = get_instance(self.hass)
+        state = self._default_state({})
+        history = self.history.copy()
+        history.clear(start.timestamp(), end.timestamp())
+        state["statistics"] = self._rewind_statistics(start)
+        # Statistics are hourly, too coarse for demand, so the maxima stay.
+        state["demand"] = self.data["demand"]
+        multi_meter = len(energy_entity_ids) > 1
+        last_rows: dict[str, dict[str, Any]] = {}
+        rows = 0
+
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(chunk_start + timedelta(days=RECOMPUTE_CHUNK_DAYS), end)
+            stats = await recorder.async_add_executor_job(
+                statistics_during_period,
+                self.hass,
+                chunk_start,
+                chunk_end,
+                set(energy_entity_ids),
+                "hour",
+                {"energy": "kWh"},
+                {"change", "state"},
+            )
+            # Hours are applied in order across all meters so the TRS tiers
+            # see the household total as it grew.
+            chunk_rows = sorted(
+                (row["start"], entity_id, row)
+                for entity_id in energy_entity_ids
+                for row in stats.get(entity_id, [])
+            )
+            intervals: list[tuple[float, float, float]] = []
+            circuits: list[dict[str, Any] | None] = []
+            for _start, entity_id, row in chunk_rows:
+                change = row.get("change")
+                if change is not None and 0 < change <= MAX_DELTA_KWH:
+                    intervals.append((row["start"], row["end"], change))
+                    circuits.append(
+                        self._circuit_state(state, entity_id) if multi_meter else None
+                    )
+                last_rows[entity_id] = row
+                rows += 1
+            self._accumulate_batch(state, options, intervals, circuits, history)
+            chunk_start = chunk_end
+
+        if not last_rows:
+            return None
+
+        now_local = dt_util.utcnow().astimezone(options.tz)
+        self._reset_buckets(state, now_local)
+        # The meter reading at the end of the last statistics hour becomes the
+        # baseline, so the next update attributes the remainder up to now.
+        for entity_id in energy_entity_ids:
+            last_row = last_rows.get(entity_id)
+            if last_row is not None and last_row.get("state") is not None:
+                state["meters"][entity_id] = {
+                    "last_energy_value": last_row["state"],
+                    "last_energy_ts": datetime.fromtimestamp(
+                        last_row["end"], options.tz
+                    ).isoformat(),
+                }
+            elif entity_id in self.data["meters"]:
+                state["meters"][entity_id] = dict(self.data["meters"][entity_id])
+        state["last_update_ts"] = now_local.isoformat()
+
+        self.data = state
+        self.history = history
+        self._history_dirty = True
+        self._pending_saves += 1
+        self._record_write()
+        await self._store.async_save(self._stored_data())
+        await self._async_save_history(force=True)
+        self.async_set_updated_data(self.data)
+        self.async_import_statistics()
+
+        return {
+            "rows": rows,
+            "kwh_month": state["kwh_month"],
+            "cost_month": state["cost_month"],
+        }
 
     def _default_state(self, stored: dict[str, Any]) -> dict[str, Any]:
+        meters = stored.get("meters")
+        if meters is None:
+            # Entries from before multi-meter support kept a single baseline
+            # at the top level; it belongs to the first configured meter.
+            meters = {}
+            energy_entity_ids = self._options.energy_entity_ids
+            if energy_entity_ids and stored.get("last_energy_value") is not None:
+                meters[energy_entity_ids[0]] = {
+                    "last_energy_value": stored["last_energy_value"],
+                    "last_energy_ts": stored.get(
+                        "last_energy_ts", stored.get("last_update_ts")
+                    ),
+                }
         return {
-            "last_energy_value": stored.get("last_energy_value"),
+            "meters": meters,
             "last_update_ts": stored.get("last_update_ts"),
             "kwh_today": stored.get("kwh_today", 0.0),
             "kwh_month": stored.get("kwh_month", 0.0),
@@ -165,118 +492,509 @@ class UteTariffCoordinator(DataUpdateCoordinator[dict[str, Any]]):
             "breakdown": stored.get("breakdown", {}),
             "last_reset_day": stored.get("last_reset_day"),
             "last_reset_month": stored.get("last_reset_month"),
+            "previous_month": stored.get("previous_month"),
+            "shadows": stored.get("shadows", {}),
+            "circuits": stored.get("circuits", {}),
+            "statistics": stored.get("statistics", {"last_hour": None, "sum": 0.0}),
+            "profile": stored.get("profile"),
+            "demand": stored.get("demand") or empty_demand(),
         }
 
+    @property
+    def statistic_id(self) -> str:
+        return f"{DOMAIN}:cost_{self.entry.entry_id.lower()}"
+
+    @callback
+    def async_import_statistics(self) -> None:
+        """Add the cost of every completed hour since the last settled one."""
+        options = self._get_options()
+        if not options.external_statistics or self.history.last_hour is None:
+            return
+
+        imported = self.data["statistics"]
+        first_hour = 0 if imported["last_hour"] is None else imported["last_hour"] + 1
+        last_hour = int(dt_util.utcnow().timestamp() // 3600) - 1
+        if first_hour > last_hour:
+            return
+        # A reading spreads its energy back to the meter's previous one, so an
+        # hour settles once every meter has reported past it, or after
+        # STATISTICS_SETTLE_HOURS; later hours are imported again each time.
+        settled_hour = min(
+            max(self._reported_hour(last_hour + 1) - 1, last_hour - STATISTICS_SETTLE_HOURS),
+            last_hour,
+        )
+
+        total = settled_sum = imported["sum"]
+        statistics: list[StatisticData] = []
+        for hour_ts, _kwh, cost, _code in self.history.hours(
+            first_hour * 3600, (last_hour + 1) * 3600
+        ):
+            total += cost
+            if hour_ts // 3600 <= settled_hour:
+                settled_sum = total
+            statistics.append(
+                StatisticData(
+                    start=datetime.fromtimestamp(hour_ts, UTC), state=total, sum=total
+                )
+            )
+        if settled_hour >= first_hour:
+            imported["last_hour"] = settled_hour
+            imported["sum"] = settled_sum
+        if statistics:
+            async_add_external_statistics(self.hass, self._statistic_metadata(), statistics)
+        self.hass.async_create_task(self._async_save())
+
+    def _reported_hour(self, default: int) -> int:
+        """Return the hour of the oldest meter reading."""
+        hour = default
+        for entity_id in self._get_options().energy_entity_ids:
+            meter = self.data["meters"].get(entity_id)
+            if meter is None or not meter["last_energy_ts"]:
+                continue
+            reported = dt_util.parse_datetime(meter["last_energy_ts"])
+            if reported is not None:
+                hour = min(hour, int(reported.timestamp() // 3600))
+        return hour
+
+    def _statistic_metadata(self) -> StatisticMetaData:
+        metadata = StatisticMetaData(
+            has_sum=True,
+            name=f"{self.entry.title} Cost",
+            source=DOMAIN,
+            statistic_id=self.statistic_id,
+            unit_of_measurement="UYU",
+        )
+        if StatisticMeanType is None:
+            metadata["has_mean"] = False
+        else:
+            metadata["mean_type"] = StatisticMeanType.NONE
+        if "unit_class" in StatisticMetaData.__annotations__:
+            metadata["unit_class"] = None
+        return metadata
+
+    def _rewind_statistics(self, start: datetime) -> dict[str, Any]:
+        # Hours from start on are imported again with the recomputed costs,
+        # continuing from the sum just before start.
+        imported = dict(self.data["statistics"])
+        start_hour = int(start.timestamp() // 3600)
+        if imported["last_hour"] is None or imported["last_hour"] < start_hour:
+            return imported
+        for _hour_ts, _kwh, cost, _code in self.history.hours(
+            start_hour * 3600, (imported["last_hour"] + 1) * 3600
+        ):
+            imported["sum"] -= cost
+        imported["last_hour"] = start_hour - 1
+        return imported
+
+    @property
+    def options(self) -> TariffOptions:
+        return self._options
+
     def _get_options(self) -> TariffOptions:
-        data = self.entry.data
-        opts = self.entry.options
-
-        tariff = opts.get(CONF_TARIFF, data.get(CONF_TARIFF, TARIFF_TRS))
-        mode = opts.get(CONF_MODE, data.get(CONF_MODE, MODE_MARGINAL))
-        timezone = opts.get(CONF_TIMEZONE, data.get(CONF_TIMEZONE, DEFAULT_TIMEZONE))
-        punta_window = opts.get(CONF_PUNTA_WINDOW, "18-22")
-        use_holidays = opts.get(CONF_USE_HOLIDAYS, False)
-        holidays_list = opts.get(CONF_HOLIDAYS_LIST, DEFAULT_HOLIDAYS_2026)
-        include_fixed = opts.get(CONF_INCLUDE_FIXED, False)
-        include_power = opts.get(CONF_INCLUDE_POWER, False)
-        contracted_power_kw = opts.get(CONF_CONTRACTED_POWER_KW, 0.0)
-        include_vat = opts.get(CONF_INCLUDE_VAT, False)
-        vat_rate = opts.get(CONF_VAT_RATE, 0.22)
-        apply_vat_to_fixed = opts.get(CONF_APPLY_VAT_TO_FIXED, False)
-
-        price_table = DEFAULT_PRICE_TABLE
-        override = opts.get(CONF_PRICE_TABLE_OVERRIDE)
-        if override:
-            try:
-                price_table = json.loads(override)
-            except (ValueError, TypeError):
-                _LOGGER.warning("Invalid price_table_override JSON; using defaults")
-
-        return TariffOptions(
-            tariff=tariff,
-            mode=mode,
-            timezone=timezone,
-            punta_window=punta_window,
-            use_holidays=use_holidays,
-            holidays_list=holidays_list,
-            include_fixed=include_fixed,
-            include_power=include_power,
-            contracted_power_kw=contracted_power_kw,
-            include_vat=include_vat,
-            vat_rate=vat_rate,
-            apply_vat_to_fixed=apply_vat_to_fixed,
-            price_table=price_table,
+        return self._options
+
+    async def _async_save(self, force: bool = False) -> None:
+        self._pending_saves += 1
+        delay = self._options.store_flush_interval
+        if force or delay <= 0:
+            self._record_write()
+            await self._store.async_save(self._stored_data())
+        elif self._pending_saves == 1:
+            # async_delay_save restarts its timer on every call, so only
+            # schedule once per flush or a busy meter would never be saved.
+            self._store.async_delay_save(self._data_to_save, delay)
+        await self._async_save_history(force)
+
+    async def _async_save_history(self, force: bool = False) -> None:
+        # The ring is over 100 KB, so rather than with every state save it is
+        # written once an hour has closed since the last write, on resets and
+        # at shutdown.
+        if not self._history_dirty:
+            return
+        if not force and self.history.last_hour == self._history_saved_hour:
+            return
+        self._history_dirty = False
+        self._history_saved_hour = self.history.last_hour
+        await self._history_store.async_save(self.history.as_dict())
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        self._record_write()
+        return self._stored_data()
+
+    def _stored_data(self) -> dict[str, Any]:
+        return self.data
+
+    def _record_write(self) -> None:
+        if self._pending_saves:
+            self.store_writes_coalesced += self._pending_saves - 1
+        self._pending_saves = 0
+        self.store_writes += 1
+
+    def _meter_state(self, entity_id: str) -> dict[str, Any]:
+        meter = self.data["meters"].get(entity_id)
+        if meter is None:
+            meter = self.data["meters"][entity_id] = {
+                "last_energy_value": None,
+                "last_energy_ts": None,
+            }
+        return meter
+
+    @staticmethod
+    def _last_energy_time(meter: dict[str, Any], default: datetime) -> datetime:
+        last_energy_ts = meter["last_energy_ts"]
+        if last_energy_ts:
+            parsed = dt_util.parse_datetime(last_energy_ts)
+            if parsed is not None:
+                return parsed
+        return default
+
+    def _reset_if_needed(self, local_now: datetime) -> bool:
+        return self._reset_buckets(self.data, local_now)
+
+    def _apply_delta(
+        self,
+        delta: float,
+        options: TariffOptions,
+        start: datetime,
+        end: datetime,
+        entity_id: str,
+    ) -> bool:
+        circuit = None
+        if len(options.energy_entity_ids) > 1:
+            circuit = self._circuit_state(self.data, entity_id)
+        self._history_dirty = True
+        return self._accumulate(
+            self.data,
+            options,
+            delta,
+            start.timestamp(),
+            end.timestamp(),
+            circuit,
+            self.history,
         )
 
-    def _reset_if_needed(self, local_now: datetime) -> None:
-        day_key = local_now.date().isoformat()
-        month_key = local_now.replace(day=1).date().isoformat()
+    def _reset_buckets(self, state: dict[str, Any], local_now: datetime) -> bool:
+        reset = reset_if_needed(state, local_now)
+        for name in self._shadow_options:
+            reset_if_needed(self._shadow_state(state, name), local_now)
+        for circuit in state["circuits"].values():
+            reset_if_needed(circuit, local_now)
+        reset_demand_if_needed(state["demand"], local_now)
+        return reset
 
-        if self.data.get("last_reset_day") != day_key:
-            self.data["kwh_today"] = 0.0
-            self.data["cost_today"] = 0.0
-            self.data["last_reset_day"] = day_key
+    def _add_energy_demand(
+        self, entity_id: str, delta: float, start: datetime, end: datetime
+    ) -> None:
+        # Without a power sensor the meter's energy is spread evenly over the
+        # time since its previous reading, which also gives its power.
+        start_ts = start.timestamp()
+        end_ts = end.timestamp()
+        self.demand.add(start_ts, end_ts, delta)
+        if end_ts > start_ts:
+            self._meter_power[entity_id] = (end_ts, delta * 3600 / (end_ts - start_ts))
+        self._record_demand(end_ts)
 
-        if self.data.get("last_reset_month") != month_key:
-            self.data["kwh_month"] = 0.0
-            self.data["cost_month"] = 0.0
-            self.data["breakdown"] = {}
-            self.data["last_reset_month"] = month_key
+    def _record_demand(self, now_ts: float) -> float:
+        """Bring the demand window up to now_ts and raise the month maxima."""
+        sample = self._power_sample
+        if sample is not None and now_ts > sample[0]:
+            # A power sensor only reports changes, so its last value holds
+            # until now.
+            sample_ts, power_kw = sample
+            self.demand.add(sample_ts, now_ts, power_kw * (now_ts - sample_ts) / 3600)
+            self._power_sample = (now_ts, power_kw)
 
-    def _apply_delta(self, delta: float, options: TariffOptions, local_now: datetime) -> None:
-        self.data["kwh_today"] += delta
-        prev_kwh_month = self.data["kwh_month"]
-        self.data["kwh_month"] += delta
+        options = self._get_options()
+        demand_kw = self.demand.demand_kw(now_ts)
+        period = None
+        if options.tariff != TARIFF_TRS:
+            period = options.timeline.classify_ts(now_ts).period
+        record_demand(
+            self.data["demand"],
+            demand_kw,
+            period,
+            datetime.fromtimestamp(now_ts, options.tz),
+        )
+        return demand_kw
 
-        breakdown = self.data.get("breakdown", {})
+    def _peek_demand(self, now_ts: float) -> float:
+        """Return the demand at now_ts without touching the window or maxima."""
+        sample = self._power_sample
+        if sample is None:
+            return self.demand.peek_kw(now_ts, now_ts, 0.0)
+        return self.demand.peek_kw(now_ts, sample[0], sample[1])
 
-        if options.tariff == TARIFF_TRS:
-            cost_delta = trs_cost_for_delta(prev_kwh_month, delta, options.price_table["TRS"])
-            self.data["cost_today"] += cost_delta
-            self.data["cost_month"] += cost_delta
-            breakdown = trs_tier_breakdown(self.data["kwh_month"], options.price_table["TRS"])
+    def compute_power_now(self, now_ts: float) -> float | None:
+        if self._options.power_entity_id:
+            return None if self._power_sample is None else self._power_sample[1]
+        if not self._meter_power:
+            return None
+        # Meters only report when their reading changes, so a meter that has
+        # been quiet for a whole demand window counts as drawing nothing.
+        return sum(
+            power_kw
+            for ts, power_kw in self._meter_power.values()
+            if now_ts - ts <= DEMAND_WINDOW_SECONDS
+        )
+
+    def _accumulate(
+        self,
+        state: dict[str, Any],
+        options: TariffOptions,
+        delta: float,
+        start_ts: float,
+        end_ts: float,
+        circuit: dict[str, Any] | None = None,
+        history: HourlyHistory | None = None,
+    ) -> bool:
+        pieces = split_interval(options, delta, start_ts, end_ts)
+        costs: list[float] = []
+        reset = apply_pieces(state, options, pieces, circuit, costs)
+        if history is not None:
+            for index, (local_dt, kwh, info) in enumerate(pieces):
+                piece_end = end_ts
+                if index + 1 < len(pieces):
+                    piece_end = pieces[index + 1][0].timestamp()
+                history.add(
+                    local_dt.timestamp(),
+                    piece_end,
+                    kwh,
+                    costs[index],
+                    PERIOD_CODES[info.period],
+                )
+        profile = self._profile_state(state, options)
+        for local_dt, kwh, info in pieces:
+            update_profile(profile, local_dt, info.period, kwh)
+        for name, shadow_options in self._shadow_options.items():
+            shadow = self._shadow_state(state, name)
+            apply_interval(shadow, shadow_options, delta, start_ts, end_ts)
+        return reset
+
+    def _accumulate_batch(
+        self,
+        state: dict[str, Any],
+        options: TariffOptions,
+        intervals: list[tuple[float, float, float]],
+        circuits: list[dict[str, Any] | None],
+        history: HourlyHistory,
+    ) -> None:
+        """Accumulate many intervals in one pass, as _accumulate does one at a time."""
+        profile = self._profile_state(state, options)
+        for _index, local_dt, end_ts, kwh, cost, period in apply_batch(
+            state, options, intervals, circuits
+        ):
+            history.add(local_dt.timestamp(), end_ts, kwh, cost, PERIOD_CODES[period])
+            update_profile(profile, local_dt, period, kwh)
+        for name, shadow_options in self._shadow_options.items():
+            apply_batch(self._shadow_state(state, name), shadow_options, intervals)
+
+    @staticmethod
+    def _profile_state(state: dict[str, Any], options: TariffOptions) -> dict[str, Any]:
+        key = profile_key(options)
+        profile = state.get("profile")
+        if profile is None or profile["key"] != key:
+            profile = state["profile"] = empty_profile(key)
+        return profile
+
+    @staticmethod
+    def _circuit_state(state: dict[str, Any], entity_id: str) -> dict[str, Any]:
+        circuit = state["circuits"].get(entity_id)
+        if circuit is None:
+            circuit = state["circuits"][entity_id] = empty_buckets()
+        return circuit
+
+    @staticmethod
+    def _shadow_state(state: dict[str, Any], name: str) -> dict[str, Any]:
+        shadow = state["shadows"].get(name)
+        if shadow is None:
+            shadow = state["shadows"][name] = empty_buckets()
+        return shadow
+
+    @callback
+    def async_update_listeners(self) -> None:
+        now = dt_util.utcnow()
+        self._record_pushed()
+        self.snapshot = self._build_snapshot(now)
+        self._schedule_transition(now)
+        super().async_update_listeners()
+
+    def _record_pushed(self) -> None:
+        # Every push, from a refresh or a batch flush, goes through
+        # async_update_listeners, so the update threshold is always measured
+        # from what the sensors last showed.
+        self._pushed = {key: self.data[key] for key in PUSH_KEYS}
+
+    @callback
+    def _schedule_transition(self, now: datetime) -> None:
+        # The engine keeps a single timer for the earliest transition of all
+        # entries and refreshes every coordinator that is due.
+        self.next_transition = self._get_options().next_transition(now)
+        self._engine.async_schedule_transition()
+
+    def _build_snapshot(self, now: datetime) -> TariffSnapshot:
+        options = self._get_options()
+        data = self.data
+        period_info = options.classify(now)
+
+        marginal_price = self.compute_price_now(period_info)
+        average_price = self.compute_average_price()
+        effective_price = self.compute_effective_price()
+        if options.mode == MODE_MARGINAL:
+            price_now = marginal_price
+        elif options.mode == MODE_AVERAGE:
+            price_now = average_price
+        elif options.mode == MODE_BILL_LIKE:
+            price_now = effective_price
         else:
-            period_info = classify_period(
-                options.tariff,
-                local_now,
-                options.punta_window,
-                options.use_holidays,
-                options.holidays_list,
-                options.timezone,
+            price_now = None
+
+        values: dict[str, float | None] = {
+            key: data.get(key) for key in ("kwh_today", "kwh_month", "cost_today", "cost_month")
+        }
+        values["price_kwh_now"] = price_now
+        values["marginal_kwh_now"] = marginal_price
+        values[VALUE_SOURCE_AVG_MONTH] = average_price
+        values[VALUE_SOURCE_EFF_MONTH] = effective_price
+        values.update(self.compute_forecast())
+
+        now_ts = now.timestamp()
+        demand_state = data["demand"]
+        values["power_kw_now"] = self.compute_power_now(now_ts)
+        # Maxima are only raised as energy and power samples come in, so a
+        # snapshot reads the window without changing any state.
+        values["demand_kw"] = self._peek_demand(now_ts)
+        values["max_demand_kw_month"] = demand_state["max_kw"]
+        contracted_power_kw = options.contracted_power_kw
+        demand = {
+            ATTR_MAX_DEMAND_AT: demand_state["max_at"],
+            ATTR_MAX_DEMAND_BY_PERIOD: dict(demand_state["periods"]),
+            ATTR_CONTRACTED_POWER_KW: contracted_power_kw or None,
+            ATTR_POWER_CHARGE_ESTIMATE: power_charge(
+                options,
+                max(contracted_power_kw, demand_state["max_kw"]),
+                now.astimezone(options.tz).date(),
+            ),
+        }
+
+        shadows: dict[str, Mapping[str, Any]] = {}
+        for tariff in TARIFFS:
+            shadow = data["shadows"].get(tariff)
+            values[f"cost_month_if_{tariff}"] = None if shadow is None else shadow["cost_month"]
+            prefix = f"{tariff}_"
+            shadows[tariff] = MappingProxyType(
+                {
+                    ATTR_TARIFF: tariff,
+                    ATTR_KWH_MONTH: None if shadow is None else shadow["kwh_month"],
+                    ATTR_BREAKDOWN: {} if shadow is None else dict(shadow["breakdown"]),
+                    ATTR_PUNTA_WINDOWS: {
+                        name.removeprefix(prefix): value["cost_month"]
+                        for name, value in data["shadows"].items()
+                        if name.startswith(prefix)
+                    },
+                }
             )
-            if options.tariff == TARIFF_TRD:
-                rate = options.price_table["TRD"][f"{period_info.period}_kwh"]
-                key_kwh = f"kwh_{period_info.period}"
-                key_cost = f"cost_{period_info.period}"
-            else:
-                rate = options.price_table["TRT"][f"{period_info.period}_kwh"]
-                key_kwh = f"kwh_{period_info.period}"
-                key_cost = f"cost_{period_info.period}"
 
-            breakdown[key_kwh] = breakdown.get(key_kwh, 0.0) + delta
-            breakdown[key_cost] = breakdown.get(key_cost, 0.0) + (delta * rate)
+        attributes = {
+            ATTR_TARIFF: options.tariff,
+            ATTR_MODE: options.mode,
+            ATTR_PUNTA_WINDOW: options.punta_window,
+            ATTR_TIMEZONE: options.timezone,
+            ATTR_BREAKDOWN: dict(data.get("breakdown", {})),
+            ATTR_LAST_UPDATE_TS: data.get("last_update_ts"),
+            ATTR_IS_HOLIDAY_TODAY: period_info.is_holiday,
+            ATTR_IS_PEAK_NOW: period_info.is_peak,
+        }
+        if data["circuits"]:
+            attributes[ATTR_CIRCUITS] = {
+                entity_id: {
+                    key: circuit[key]
+                    for key in ("kwh_today", "kwh_month", "cost_today", "cost_month")
+                }
+                for entity_id, circuit in data["circuits"].items()
+            }
+
+        schedule = self.price_schedule(now)
+        return TariffSnapshot(
+            values=MappingProxyType(values),
+            attributes=MappingProxyType(attributes),
+            shadows=MappingProxyType(shadows),
+            schedule=schedule,
+            schedule_rows=tuple(
+                schedule_rows(schedule, options, now_ts, now_ts + SCHEDULE_HOURS * 3600)
+            ),
+            demand=MappingProxyType(demand),
+        )
 
-            self.data["cost_today"] += delta * rate
-            self.data["cost_month"] += delta * rate
+    def price_schedule(self, now: datetime) -> tuple[Interval, ...]:
+        """Return the price intervals for at least the next SCHEDULE_HOURS hours."""
+        options = self._get_options()
+        kwh_month = self.data.get("kwh_month", 0.0)
+        tier = None
+        if options.tariff == TARIFF_TRS:
+            tier = options.prices(now.astimezone(options.tz).date()).tiers.index(kwh_month)
+        # The schedule only changes at a period transition or a TRS tier
+        # change, so it is cached until then and reaches SCHEDULE_HOURS past
+        # the transition.
+        next_transition = options.next_transition(now)
+        key = (options, next_transition, tier)
+        now_ts = now.timestamp()
+        window_end = now_ts + SCHEDULE_HOURS * 3600
+        if (
+            self._schedule_key is not None
+            and self._schedule_key[0] is options
+            and self._schedule_key[1:] == key[1:]
+            and self._schedule_end >= window_end
+        ):
+            return self._schedule
 
-        self.data["breakdown"] = breakdown
+        rate = 0.0
+        if tier is not None:
+            rate = self._forecast_rate(options, now, kwh_month)
+        end_ts = window_end
+        if next_transition is not None:
+            end_ts = max(end_ts, next_transition.timestamp() + SCHEDULE_HOURS * 3600)
+        self._schedule = tuple(price_schedule(options, now_ts, end_ts, kwh_month, rate))
+        self._schedule_key = key
+        self._schedule_end = end_ts
+        return self._schedule
 
-    def compute_price_now(self) -> float | None:
+    def find_cheapest_window(
+        self, now: datetime, duration: timedelta, energy_kwh: float, deadline: datetime
+    ) -> tuple[float, float, float] | None:
         options = self._get_options()
+        kwh_month = self.data.get("kwh_month", 0.0)
+        rate = 0.0
         if options.tariff == TARIFF_TRS:
-            return trs_marginal_price(self.data.get("kwh_month", 0.0), options.price_table["TRS"])
+            rate = self._forecast_rate(options, now, kwh_month)
+        return cheapest_window(
+            options,
+            now.timestamp(),
+            deadline.timestamp(),
+            duration.total_seconds(),
+            energy_kwh,
+            kwh_month,
+            rate,
+        )
 
+    def _forecast_rate(
+        self, options: TariffOptions, now: datetime, kwh_month: float
+    ) -> float:
+        forecast_kwh = self.snapshot.values.get("kwh_month_forecast")
+        if forecast_kwh is None:
+            forecast_kwh = self.compute_forecast()["kwh_month_forecast"]
+        return hourly_rate(kwh_month, forecast_kwh, now.astimezone(options.tz))
+
+    def compute_price_now(self, period_info: PeriodInfo | None = None) -> float | None:
+        options = self._get_options()
         now = dt_util.utcnow()
-        period_info = classify_period(
-            options.tariff,
-            now,
-            options.punta_window,
-            options.use_holidays,
-            options.holidays_list,
-            options.timezone,
-        )
-        key = f"{period_info.period}_kwh"
-        return options.price_table[options.tariff][key]
+        prices = options.prices(now.astimezone(options.tz).date())
+        if prices.tiers is not None:
+            return prices.tiers.marginal_price(self.data.get("kwh_month", 0.0))
+
+        if period_info is None:
+            period_info = options.classify(now)
+        return prices.rates[period_info.period]
 
     def compute_average_price(self) -> float | None:
         kwh_month = self.data.get("kwh_month", 0.0)
@@ -290,41 +1008,48 @@ class UteTariffCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         if kwh_month <= 0:
             return None
 
-        energy_cost = self.data.get("cost_month", 0.0)
-
-        fixed = 0.0
-        if options.include_fixed:
-            fixed = options.price_table[options.tariff]["fixed_charge_month"]
-
-        power = 0.0
-        if options.include_power:
-            power = options.price_table[options.tariff]["power_charge_per_kw"] * options.contracted_power_kw
-
-        if options.include_vat:
-            energy_cost *= 1 + options.vat_rate
-            if options.apply_vat_to_fixed:
-                fixed *= 1 + options.vat_rate
-                power *= 1 + options.vat_rate
-
-        total = energy_cost + fixed + power
+        today = dt_util.utcnow().astimezone(options.tz).date()
+        total = bill_total(options, self.data.get("cost_month", 0.0), today)
         return total / kwh_month
 
-    def current_period_info(self) -> dict[str, Any]:
+    def compute_forecast(self) -> dict[str, float]:
         options = self._get_options()
-        now = dt_util.utcnow()
-        period_info = classify_period(
-            options.tariff,
-            now,
-            options.punta_window,
-            options.use_holidays,
-            options.holidays_list,
-            options.timezone,
-        )
+        local_now = dt_util.utcnow().astimezone(options.tz)
+        profile = self._profile_state(self.data, options)
+        kwh, cost = project_month(profile, self.data, options, local_now)
         return {
-            "is_holiday_today": period_info.is_holiday,
-            "is_peak_now": period_info.is_peak,
+            "kwh_month_forecast": kwh,
+            "cost_month_forecast": cost,
+            "bill_month_forecast": bill_total(options, cost, local_now.date()),
         }
 
     async def async_shutdown(self) -> None:
+        await super().async_shutdown()
         if self._unsub_state_change:
             self._unsub_state_change()
+            self._unsub_state_change = None
+        if self._unsub_power_change:
+            self._unsub_power_change()
+            self._unsub_power_change = None
+        self.next_transition = None
+        if self._pending_readings:
+            self._flush_readings()
+            self._pending_saves += 1
+        if self._pending_saves:
+            self._record_write()
+            await self._store.async_save(self._stored_data())
+        await self._async_save_history(force=True)
+
+
+def _power_sample(state: State) -> tuple[float, float] | None:
+    """Return (timestamp, kW) for a power sensor state, or None if unusable."""
+    try:
+        value = float(state.state)
+    except ValueError:
+        return None
+    unit = state.attributes.get("unit_of_measurement")
+    scale = POWER_UNITS.get(unit)
+    if scale is None:
+        _LOGGER.debug("Unsupported power unit for %s: %s", state.entity_id, unit)
+        return None
+    return state.last_updated.timestamp(), value * scale
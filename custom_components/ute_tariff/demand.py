@@ -0,0 +1,133 @@
+"""Rolling power demand for UTE Tariff."""
+from __future__ import annotations
+
+from array import array
+from datetime import datetime
+from math import fsum
+from typing import Any
+
+from .const import DEMAND_SLOT_SECONDS, DEMAND_WINDOW_SECONDS
+
+
+class DemandWindow:
+    """Energy of the last DEMAND_WINDOW_SECONDS in a fixed ring of time slots.
+
+    Slots are indexed by slot number modulo the size, and the window total
+    is updated as energy is added and slots expire, so an update touches a
+    bounded number of slots whatever the sample rate. The total is summed
+    again once per turn of the ring so rounding does not build up.
+    """
+
+    __slots__ = ("slot_seconds", "size", "energy", "total", "last_slot")
+
+    def __init__(
+        self,
+        window_seconds: int = DEMAND_WINDOW_SECONDS,
+        slot_seconds: int = DEMAND_SLOT_SECONDS,
+    ) -> None:
+        self.slot_seconds = slot_seconds
+        self.size = window_seconds // slot_seconds
+        self.energy = array("d", bytes(8 * self.size))
+        self.total = 0.0
+        self.last_slot: int | None = None
+
+    def add(self, start_ts: float, end_ts: float, kwh: float) -> None:
+        """Spread kWh pro rata over [start_ts, end_ts]."""
+        if end_ts <= start_ts:
+            self._add_slot(int(end_ts // self.slot_seconds), kwh)
+            return
+
+        span = end_ts - start_ts
+        # Energy from before the window at end_ts can never count again.
+        position = max(start_ts, end_ts - self.size * self.slot_seconds)
+        slot = int(position // self.slot_seconds)
+        while position < end_ts:
+            slot_end = min((slot + 1) * self.slot_seconds, end_ts)
+            self._add_slot(slot, kwh * (slot_end - position) / span)
+            position = slot_end
+            slot += 1
+
+    def demand_kw(self, now_ts: float) -> float:
+        """Return the average power over the window ending at now_ts."""
+        self._advance(int(now_ts // self.slot_seconds))
+        return max(self.total, 0.0) * 3600 / self._window_seconds(now_ts, self.last_slot)
+
+    def peek_kw(self, now_ts: float, held_since: float, held_kw: float) -> float:
+        """Return demand_kw(now_ts) without expiring slots.
+
+        held_kw is drawn from held_since to now_ts on top of the slots, as a
+        power sensor's last sample holds until its next one.
+        """
+        slot = int(now_ts // self.slot_seconds)
+        if self.last_slot is None:
+            last_slot = slot
+            total = 0.0
+        elif slot - self.last_slot >= self.size:
+            last_slot = slot
+            total = 0.0
+        else:
+            last_slot = max(slot, self.last_slot)
+            total = self.total - sum(
+                self.energy[stale % self.size]
+                for stale in range(self.last_slot + 1, slot + 1)
+            )
+        seconds = self._window_seconds(now_ts, last_slot)
+        held_seconds = min(max(now_ts - held_since, 0.0), seconds)
+        return (max(total, 0.0) * 3600 + held_kw * held_seconds) / seconds
+
+    def _window_seconds(self, now_ts: float, last_slot: int) -> float:
+        # The newest slot is still filling, so the window spans the older
+        # slots plus the part of it that has elapsed.
+        elapsed = now_ts - last_slot * self.slot_seconds
+        if elapsed < 0:
+            elapsed = self.slot_seconds
+        return (self.size - 1) * self.slot_seconds + elapsed
+
+    def _add_slot(self, slot: int, kwh: float) -> None:
+        self._advance(slot)
+        if slot <= self.last_slot - self.size:
+            return
+        self.energy[slot % self.size] += kwh
+        self.total += kwh
+
+    def _advance(self, slot: int) -> None:
+        if self.last_slot is None:
+            self.last_slot = slot
+            return
+        if slot <= self.last_slot:
+            return
+        if slot - self.last_slot >= self.size:
+            for index in range(self.size):
+                self.energy[index] = 0.0
+            self.total = 0.0
+        else:
+            for stale in range(self.last_slot + 1, slot + 1):
+                index = stale % self.size
+                self.total -= self.energy[index]
+                self.energy[index] = 0.0
+                if index == 0:
+                    self.total = fsum(self.energy)
+        self.last_slot = slot
+
+
+def empty_demand() -> dict[str, Any]:
+    return {"month": None, "max_kw": 0.0, "max_at": None, "periods": {}}
+
+
+def reset_demand_if_needed(state: dict[str, Any], local_dt: datetime) -> None:
+    month_key = local_dt.date().isoformat()[:8] + "01"
+    if state["month"] is None or month_key > state["month"]:
+        state.update(empty_demand())
+        state["month"] = month_key
+
+
+def record_demand(
+    state: dict[str, Any], demand_kw: float, period: str | None, local_dt: datetime
+) -> None:
+    """Raise the month maxima, overall and for the period, to demand_kw."""
+    reset_demand_if_needed(state, local_dt)
+    if period is not None and demand_kw > state["periods"].get(period, 0.0):
+        state["periods"][period] = demand_kw
+    if demand_kw > state["max_kw"]:
+        state["max_kw"] = demand_kw
+        state["max_at"] = local_dt.isoformat()
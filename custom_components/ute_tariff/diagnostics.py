@@ -0,0 +1,40 @@
+"""Diagnostics for UTE Tariff."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import UteTariffCoordinator
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    coordinator: UteTariffCoordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
+
+    return {
+        "data": dict(entry.data),
+        "options": dict(entry.options),
+        "state": coordinator.data,
+        "store": {
+            "writes": coordinator.store_writes,
+            "writes_coalesced": coordinator.store_writes_coalesced,
+        },
+        "history": {
+            "hours": coordinator.history.size,
+            "last_hour": coordinator.history.last_hour,
+        },
+        "statistics": {
+            "statistic_id": coordinator.statistic_id,
+            **coordinator.data["statistics"],
+        },
+        "ingestion": {
+            "events_received": coordinator.events_received,
+            "batches_applied": coordinator.batches_applied,
+            "updates_pushed": coordinator.updates_pushed,
+            "updates_suppressed": coordinator.updates_suppressed,
+        },
+    }
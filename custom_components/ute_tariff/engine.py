@@ -0,0 +1,151 @@
+"""Domain-wide engine shared by UTE Tariff config entries."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.event import (
+    async_track_point_in_utc_time,
+    async_track_utc_time_change,
+)
+
+from .const import CONF_PRICE_TABLE_FILE
+from .options import (
+    OptionsCache,
+    TariffOptions,
+    compile_options,
+    compile_shadow_options,
+)
+
+if TYPE_CHECKING:
+    from .coordinator import UteTariffCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class UteTariffEngine:
+    """Compiled tariffs, transition timer and coordinators of all entries."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self.coordinators: dict[str, UteTariffCoordinator] = {}
+        self.services_registered = False
+        self._cache = OptionsCache()
+        self._compiled: dict[str, tuple[TariffOptions, dict[str, TariffOptions]]] = {}
+        self._unsub_transition: CALLBACK_TYPE | None = None
+        self._next_transition: datetime | None = None
+        self._unsub_hourly: CALLBACK_TYPE | None = None
+
+    async def async_load_price_tables(self, entry: ConfigEntry) -> None:
+        """Read the entry's price table file, if any, before it is compiled."""
+        name = entry.options.get(CONF_PRICE_TABLE_FILE)
+        if name:
+            await self.hass.async_add_executor_job(
+                self._cache.load_price_file, name, self.hass.config.path(name)
+            )
+
+    def compile(
+        self, entry: ConfigEntry
+    ) -> tuple[TariffOptions, dict[str, TariffOptions]]:
+        options = compile_options(entry.data, entry.options, self._cache)
+        shadows = compile_shadow_options(options, self._cache)
+        self._compiled[entry.entry_id] = (options, shadows)
+        self._retain()
+        return options, shadows
+
+    @callback
+    def async_add(self, coordinator: UteTariffCoordinator) -> None:
+        self.coordinators[coordinator.entry.entry_id] = coordinator
+        self.async_schedule_transition()
+        if self._unsub_hourly is None:
+            # A few minutes past the hour, so late meter reports for the
+            # previous hour are in before its statistics are written.
+            self._unsub_hourly = async_track_utc_time_change(
+                self.hass, self._handle_hour, minute=5, second=0
+            )
+
+    @callback
+    def async_remove(self, entry_id: str) -> UteTariffCoordinator | None:
+        coordinator = self.coordinators.pop(entry_id, None)
+        self._compiled.pop(entry_id, None)
+        self._retain()
+        self.async_schedule_transition()
+        if not self.coordinators and self._unsub_hourly is not None:
+            self._unsub_hourly()
+            self._unsub_hourly = None
+        return coordinator
+
+    def resolve(
+        self, config_entry_id: str | None = None, device_id: str | None = None
+    ) -> UteTariffCoordinator | None:
+        """Return the coordinator a service call is addressed to.
+
+        Without a target the only entry is used; with several entries the
+        call must name one by config entry or device.
+        """
+        if device_id is not None:
+            device = dr.async_get(self.hass).async_get(device_id)
+            if device is None:
+                return None
+            for entry_id in device.config_entries:
+                if entry_id in self.coordinators:
+                    return self.coordinators[entry_id]
+            return None
+
+        if config_entry_id is not None:
+            return self.coordinators.get(config_entry_id)
+
+        if len(self.coordinators) > 1:
+            _LOGGER.error(
+                "Several UTE Tariff entries are configured; pass config_entry_id or device_id"
+            )
+            return None
+        return next(iter(self.coordinators.values()), None)
+
+    @callback
+    def async_schedule_transition(self) -> None:
+        """Keep one timer armed for the earliest transition of any entry."""
+        next_transition = min(
+            (
+                coordinator.next_transition
+                for coordinator in self.coordinators.values()
+                if coordinator.next_transition is not None
+            ),
+            default=None,
+        )
+        if next_transition == self._next_transition and self._unsub_transition:
+            return
+        if self._unsub_transition:
+            self._unsub_transition()
+            self._unsub_transition = None
+        self._next_transition = next_transition
+        if next_transition is not None:
+            self._unsub_transition = async_track_point_in_utc_time(
+                self.hass, self._handle_transition, next_transition
+            )
+
+    @callback
+    def _handle_transition(self, now: datetime) -> None:
+        self._unsub_transition = None
+        self._next_transition = None
+        for coordinator in self.coordinators.values():
+            if coordinator.next_transition is not None and coordinator.next_transition <= now:
+                coordinator.next_transition = None
+                self.hass.async_create_task(coordinator.async_refresh())
+        self.async_schedule_transition()
+
+    @callback
+    def _handle_hour(self, _now: datetime) -> None:
+        for coordinator in self.coordinators.values():
+            coordinator.async_import_statistics()
+
+    def _retain(self) -> None:
+        self._cache.retain(
+            options
+            for active, shadows in self._compiled.values()
+            for options in (active, *shadows.values())
+        )
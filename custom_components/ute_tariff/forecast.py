@@ -0,0 +1,150 @@
+"""Month-end forecast for UTE Tariff."""
+from __future__ import annotations
+
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from .const import PROFILE_WEEKS, TARIFF_TRS
+from .options import TariffOptions
+
+
+def profile_key(options: TariffOptions) -> str:
+    return f"{options.tariff}/{options.punta_window}"
+
+
+def empty_profile(key: str) -> dict[str, Any]:
+    return {
+        "key": key,
+        "kwh": [{} for _ in range(7)],
+        "days": [0.0] * 7,
+        "day": None,
+        "partial": True,
+        "today": {},
+    }
+
+
+def update_profile(
+    profile: dict[str, Any], local_dt: datetime, period: str, kwh: float
+) -> None:
+    """Add one attributed piece to the weekday/period consumption profile.
+
+    Consumption is collected per period for the current day and folded
+    into running per-weekday sums when the day rolls over, so each update
+    is constant time. Sums decay once a weekday has PROFILE_WEEKS samples,
+    which keeps the profile following seasonal changes.
+    """
+    day_key = local_dt.date().isoformat()
+    current_day = profile["day"]
+    if current_day != day_key:
+        if current_day is not None and day_key < current_day:
+            return
+        if current_day is not None:
+            _fold_day(profile)
+        profile["partial"] = current_day is None
+        profile["day"] = day_key
+        profile["today"] = {}
+
+    today = profile["today"]
+    today[period] = today.get(period, 0.0) + kwh
+
+
+def _fold_day(profile: dict[str, Any]) -> None:
+    if profile["partial"]:
+        return
+
+    weekday = date.fromisoformat(profile["day"]).weekday()
+    sums = profile["kwh"][weekday]
+    days = profile["days"]
+    if days[weekday] >= PROFILE_WEEKS:
+        scale = (PROFILE_WEEKS - 1) / PROFILE_WEEKS
+        for period in sums:
+            sums[period] *= scale
+        days[weekday] *= scale
+
+    for period, kwh in profile["today"].items():
+        sums[period] = sums.get(period, 0.0) + kwh
+    days[weekday] += 1
+
+
+def project_month(
+    profile: dict[str, Any],
+    state: dict[str, Any],
+    options: TariffOptions,
+    local_now: datetime,
+) -> tuple[float, float]:
+    """Return the projected (kWh, energy cost) at the end of the month."""
+    kwh_month = state.get("kwh_month", 0.0)
+    cost_month = state.get("cost_month", 0.0)
+    remaining = _remaining_by_period(profile, local_now)
+    prices = options.prices(local_now.date())
+
+    if remaining is None:
+        # No complete day observed yet: extrapolate the month so far linearly.
+        days_in_month = monthrange(local_now.year, local_now.month)[1]
+        month_start = local_now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        elapsed = (local_now - month_start).total_seconds()
+        if elapsed <= 0 or kwh_month <= 0:
+            return kwh_month, cost_month
+        factor = days_in_month * 86400 / elapsed - 1
+        remaining_kwh = kwh_month * factor
+        if options.tariff == TARIFF_TRS:
+            return kwh_month + remaining_kwh, cost_month + prices.tiers.cost_for_delta(
+                kwh_month, remaining_kwh
+            )
+        return kwh_month + remaining_kwh, cost_month * (1 + factor)
+
+    remaining_kwh = sum(remaining.values())
+    if options.tariff == TARIFF_TRS:
+        remaining_cost = prices.tiers.cost_for_delta(kwh_month, remaining_kwh)
+    else:
+        average = cost_month / kwh_month if kwh_month > 0 else 0.0
+        remaining_cost = sum(
+            kwh * prices.rates.get(period, average) for period, kwh in remaining.items()
+        )
+    return kwh_month + remaining_kwh, cost_month + remaining_cost
+
+
+def hourly_rate(kwh_month: float, kwh_forecast: float, local_now: datetime) -> float:
+    """Return the kWh per hour needed to reach the forecast by the end of the month."""
+    days_in_month = monthrange(local_now.year, local_now.month)[1]
+    month_start = local_now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    remaining = (month_start + timedelta(days=days_in_month) - local_now).total_seconds()
+    if remaining <= 0:
+        return 0.0
+    return max(0.0, kwh_forecast - kwh_month) * 3600 / remaining
+
+
+def _remaining_by_period(
+    profile: dict[str, Any], local_now: datetime
+) -> dict[str, float] | None:
+    days = profile["days"]
+    total_days = sum(days)
+    if total_days <= 0:
+        return None
+
+    overall: dict[str, float] = {}
+    for sums in profile["kwh"]:
+        for period, kwh in sums.items():
+            overall[period] = overall.get(period, 0.0) + kwh / total_days
+
+    def average_day(weekday: int) -> dict[str, float]:
+        if days[weekday] <= 0:
+            return overall
+        return {period: kwh / days[weekday] for period, kwh in profile["kwh"][weekday].items()}
+
+    remaining: dict[str, float] = {}
+    today = profile["today"] if profile["day"] == local_now.date().isoformat() else {}
+    for period, kwh in average_day(local_now.weekday()).items():
+        remaining[period] = max(0.0, kwh - today.get(period, 0.0))
+
+    days_left = monthrange(local_now.year, local_now.month)[1] - local_now.day
+    full_weeks, extra = divmod(days_left, 7)
+    first_weekday = (local_now.weekday() + 1) % 7
+    for weekday in range(7):
+        count = full_weeks + (1 if (weekday - first_weekday) % 7 < extra else 0)
+        if not count:
+            continue
+        for period, kwh in average_day(weekday).items():
+            remaining[period] = remaining.get(period, 0.0) + kwh * count
+    return remaining
@@ -0,0 +1,156 @@
+"""Hourly cost history for UTE Tariff."""
+from __future__ import annotations
+
+import sys
+from array import array
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from datetime import datetime, tzinfo
+from typing import Any
+
+from .const import HISTORY_HOURS
+
+NO_PERIOD = -1
+
+
+class HourlyHistory:
+    """Fixed-size ring of hourly kWh, cost and period code.
+
+    Slots are indexed by UTC hour number modulo the size, so memory stays
+    at nine bytes per hour however long the integration runs. Hours older
+    than the ring are overwritten as newer ones arrive.
+    """
+
+    __slots__ = ("size", "kwh", "cost", "period", "last_hour")
+
+    def __init__(self, size: int = HISTORY_HOURS) -> None:
+        self.size = size
+        self.kwh = array("f", bytes(4 * size))
+        self.cost = array("f", bytes(4 * size))
+        self.period = array("b", [NO_PERIOD]) * size
+        self.last_hour: int | None = None
+
+    def copy(self) -> HourlyHistory:
+        history = HourlyHistory.__new__(HourlyHistory)
+        history.size = self.size
+        history.kwh = array("f", self.kwh)
+        history.cost = array("f", self.cost)
+        history.period = array("b", self.period)
+        history.last_hour = self.last_hour
+        return history
+
+    def add(
+        self, start_ts: float, end_ts: float, kwh: float, cost: float, period_code: int
+    ) -> None:
+        """Spread one attributed piece pro rata over the hours it covers."""
+        if end_ts <= start_ts:
+            self._add_hour(int(end_ts // 3600), kwh, cost, period_code)
+            return
+
+        span = end_ts - start_ts
+        hour = int(start_ts // 3600)
+        position = start_ts
+        while position < end_ts:
+            hour_end = min((hour + 1) * 3600, end_ts)
+            share = (hour_end - position) / span
+            self._add_hour(hour, kwh * share, cost * share, period_code)
+            position = hour_end
+            hour += 1
+
+    def clear(self, start_ts: float, end_ts: float) -> None:
+        for hour in self._hours(start_ts, end_ts):
+            index = hour % self.size
+            self.kwh[index] = 0.0
+            self.cost[index] = 0.0
+            self.period[index] = NO_PERIOD
+
+    def hours(self, start_ts: float, end_ts: float) -> list[tuple[int, float, float, int]]:
+        """Return (hour start ts, kWh, cost, period code) for recorded hours in range."""
+        rows = []
+        for hour in self._hours(start_ts, end_ts):
+            index = hour % self.size
+            if self.period[index] != NO_PERIOD:
+                rows.append(
+                    (hour * 3600, self.kwh[index], self.cost[index], self.period[index])
+                )
+        return rows
+
+    def days(
+        self, start_ts: float, end_ts: float, tz: tzinfo
+    ) -> list[tuple[str, float, float]]:
+        """Return (local date, kWh, cost) per local day for recorded hours in range."""
+        totals: dict[str, list[float]] = {}
+        for hour_ts, kwh, cost, _code in self.hours(start_ts, end_ts):
+            day = datetime.fromtimestamp(hour_ts, tz).date().isoformat()
+            total = totals.get(day)
+            if total is None:
+                total = totals[day] = [0.0, 0.0]
+            total[0] += kwh
+            total[1] += cost
+        return [(day, kwh, cost) for day, (kwh, cost) in totals.items()]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "size": self.size,
+            "last_hour": self.last_hour,
+            "kwh": _encode(self.kwh),
+            "cost": _encode(self.cost),
+            "period": _encode(self.period),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any] | None) -> HourlyHistory:
+        history = cls()
+        if not data or data.get("size") != history.size:
+            return history
+        try:
+            kwh = _decode("f", data["kwh"])
+            cost = _decode("f", data["cost"])
+            period = _decode("b", data["period"])
+        except (KeyError, TypeError, ValueError, BinasciiError):
+            return history
+        if not len(kwh) == len(cost) == len(period) == history.size:
+            return history
+        history.kwh, history.cost, history.period = kwh, cost, period
+        history.last_hour = data.get("last_hour")
+        return history
+
+    def _hours(self, start_ts: float, end_ts: float) -> range:
+        if self.last_hour is None:
+            return range(0)
+        first = max(int(start_ts // 3600), self.last_hour - self.size + 1)
+        last = min(int(-(-end_ts // 3600)) - 1, self.last_hour)
+        return range(first, last + 1)
+
+    def _add_hour(self, hour: int, kwh: float, cost: float, period_code: int) -> None:
+        if self.last_hour is None:
+            self.last_hour = hour
+        elif hour > self.last_hour:
+            for stale in range(max(self.last_hour + 1, hour - self.size + 1), hour + 1):
+                index = stale % self.size
+                self.kwh[index] = 0.0
+                self.cost[index] = 0.0
+                self.period[index] = NO_PERIOD
+            self.last_hour = hour
+        elif hour <= self.last_hour - self.size:
+            return
+
+        index = hour % self.size
+        self.kwh[index] += kwh
+        self.cost[index] += cost
+        self.period[index] = period_code
+
+
+def _encode(values: array) -> str:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return b64encode(values.tobytes()).decode("ascii")
+
+
+def _decode(typecode: str, encoded: str) -> array:
+    values = array(typecode)
+    values.frombytes(b64decode(encoded, validate=True))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
@@ -0,0 +1,384 @@
+"""Compiled tariff options for UTE Tariff."""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, replace
+from datetime import date, datetime
+from typing import Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .const import (
+    CONF_APPLY_VAT_TO_FIXED,
+    CONF_COMPARE_PUNTA_WINDOWS,
+    CONF_COMPARE_TARIFFS,
+    CONF_CONTRACTED_POWER_KW,
+    CONF_ENERGY_ENTITY_ID,
+    CONF_EXTERNAL_STATISTICS,
+    CONF_HOLIDAYS_LIST,
+    CONF_INCLUDE_FIXED,
+    CONF_INCLUDE_POWER,
+    CONF_INCLUDE_VAT,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_MODE,
+    CONF_PRICE_TABLE_FILE,
+    CONF_PRICE_TABLE_OVERRIDE,
+    CONF_POWER_ENTITY_ID,
+    CONF_PUNTA_WINDOW,
+    CONF_SENSOR_THRESHOLDS,
+    CONF_STORE_FLUSH_INTERVAL,
+    CONF_TARIFF,
+    CONF_TIMEZONE,
+    CONF_UPDATE_THRESHOLD,
+    CONF_USE_HOLIDAYS,
+    CONF_VAT_RATE,
+    DEFAULT_HOLIDAYS_2026,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_PUNTA_WINDOW,
+    DEFAULT_STORE_FLUSH_INTERVAL,
+    DEFAULT_TIMEZONE,
+    DEFAULT_UPDATE_THRESHOLD,
+    DEFAULT_VAT_RATE,
+    MODE_MARGINAL,
+    PUNTA_WINDOWS,
+    SENSOR_THRESHOLD_KEYS,
+    TARIFF_TRS,
+    TARIFFS,
+)
+from .tariffs import (
+    DEFAULT_PRICE_TABLE,
+    PeriodInfo,
+    PeriodTimeline,
+    PriceTableRegistry,
+    TariffPrices,
+    compile_price_table,
+    load_price_tables,
+    merge_price_table,
+    parse_punta_window,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PRICES = compile_price_table(DEFAULT_PRICE_TABLE)
+
+
+@dataclass(frozen=True, slots=True)
+class TariffOptions:
+    """Entry options compiled once and shared by every calculation."""
+
+    tariff: str
+    mode: str
+    timezone: str
+    tz: ZoneInfo
+    punta_window: str
+    punta_start: int
+    punta_end: int
+    use_holidays: bool
+    holidays_list: tuple[str, ...]
+    holidays: frozenset[date]
+    include_fixed: bool
+    include_power: bool
+    contracted_power_kw: float
+    include_vat: bool
+    vat_rate: float
+    apply_vat_to_fixed: bool
+    price_tables: PriceTableRegistry
+    timeline: PeriodTimeline
+    store_flush_interval: int
+    min_update_interval: int
+    update_threshold: float
+    compare_tariffs: bool
+    compare_punta_windows: bool
+    energy_entity_ids: tuple[str, ...]
+    power_entity_id: str | None
+    external_statistics: bool
+    sensor_thresholds: Mapping[str, Mapping[str, float]]
+
+    def classify(self, now: datetime) -> PeriodInfo:
+        return self.timeline.classify(now)
+
+    def next_transition(self, now: datetime) -> datetime:
+        return self.timeline.next_transition(now)
+
+    def prices(self, day: date) -> TariffPrices:
+        """Return the compiled prices of the tariff in effect on a local date."""
+        return self.price_tables.at(day)[self.tariff]
+
+
+class OptionsCache:
+    """Timelines and price tables shared by every entry with the same settings."""
+
+    def __init__(self) -> None:
+        self._timelines: dict[tuple[Any, ...], PeriodTimeline] = {}
+        self._price_tables: dict[tuple[Any, ...], PriceTableRegistry] = {}
+        self._price_files: dict[str, tuple[int | None, tuple[Any, ...]]] = {}
+
+    def timeline(
+        self,
+        tariff: str,
+        tz: ZoneInfo,
+        punta_start: int,
+        punta_end: int,
+        use_holidays: bool,
+        holidays: frozenset[date],
+    ) -> PeriodTimeline:
+        key = (tariff, tz.key, punta_start, punta_end, use_holidays, holidays)
+        timeline = self._timelines.get(key)
+        if timeline is None:
+            timeline = self._timelines[key] = PeriodTimeline(
+                tariff, tz, punta_start, punta_end, use_holidays, holidays
+            )
+        return timeline
+
+    def price_tables(
+        self, override: str | None, price_file: str | None
+    ) -> PriceTableRegistry:
+        """Return the registry for the override and the loaded price file.
+
+        The override, or the default table, applies before the first dated
+        table of the file. The file must have been read with
+        load_price_file first; until then only the base table is used.
+        """
+        version, dated = None, ()
+        if price_file:
+            version, dated = self._price_files.get(price_file, (None, ()))
+        key = (override or None, price_file or None, version)
+        registry = self._price_tables.get(key)
+        if registry is None:
+            compiled = []
+            for day, table in dated:
+                try:
+                    compiled.append((day, compile_price_table(table)))
+                except (ValueError, TypeError) as err:
+                    _LOGGER.warning(
+                        "Ignoring price table from %s in %s (%s)", day, price_file, err
+                    )
+            registry = self._price_tables[key] = PriceTableRegistry(
+                _load_price_table(override), compiled
+            )
+        return registry
+
+    def load_price_file(self, name: str, path: str) -> None:
+        """Read the dated price tables of a file unless it is unchanged.
+
+        Does blocking I/O. An unreadable or invalid file is logged and
+        leaves only the base table in effect.
+        """
+        try:
+            version = os.stat(path).st_mtime_ns
+        except OSError as err:
+            _LOGGER.warning("Cannot read price_table_file %s (%s)", path, err)
+            self._price_files[name] = (None, ())
+            return
+        cached = self._price_files.get(name)
+        if cached is not None and cached[0] == version:
+            return
+        try:
+            dated = tuple(load_price_tables(path))
+        except (OSError, ValueError) as err:
+            _LOGGER.warning("Invalid price_table_file %s (%s); using defaults", path, err)
+            dated = ()
+        self._price_files[name] = (version, dated)
+
+    def retain(self, in_use: Iterable[TariffOptions]) -> None:
+        """Drop cached objects that no compiled options refer to any more."""
+        timelines = set()
+        price_tables = set()
+        for options in in_use:
+            timelines.add(id(options.timeline))
+            price_tables.add(id(options.price_tables))
+        self._timelines = {
+            key: timeline
+            for key, timeline in self._timelines.items()
+            if id(timeline) in timelines
+        }
+        self._price_tables = {
+            key: registry
+            for key, registry in self._price_tables.items()
+            if id(registry) in price_tables
+        }
+        price_files = {key[1] for key in self._price_tables}
+        self._price_files = {
+            name: loaded
+            for name, loaded in self._price_files.items()
+            if name in price_files
+        }
+
+
+def compile_options(
+    data: Mapping[str, Any],
+    opts: Mapping[str, Any],
+    cache: OptionsCache | None = None,
+) -> TariffOptions:
+    if cache is None:
+        cache = OptionsCache()
+
+    timezone = opts.get(CONF_TIMEZONE, data.get(CONF_TIMEZONE, DEFAULT_TIMEZONE))
+    try:
+        tz = ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        _LOGGER.warning("Unknown timezone %s; using %s", timezone, DEFAULT_TIMEZONE)
+        timezone = DEFAULT_TIMEZONE
+        tz = ZoneInfo(timezone)
+
+    punta_window = opts.get(CONF_PUNTA_WINDOW, DEFAULT_PUNTA_WINDOW)
+    if punta_window not in PUNTA_WINDOWS:
+        punta_window = DEFAULT_PUNTA_WINDOW
+    punta_start, punta_end = parse_punta_window(punta_window)
+
+    tariff = opts.get(CONF_TARIFF, data.get(CONF_TARIFF, TARIFF_TRS))
+    use_holidays = opts.get(CONF_USE_HOLIDAYS, False)
+    holidays_list = tuple(opts.get(CONF_HOLIDAYS_LIST, DEFAULT_HOLIDAYS_2026))
+    holidays = _parse_holidays(holidays_list)
+
+    return TariffOptions(
+        tariff=tariff,
+        mode=opts.get(CONF_MODE, data.get(CONF_MODE, MODE_MARGINAL)),
+        timezone=timezone,
+        tz=tz,
+        punta_window=punta_window,
+        punta_start=punta_start,
+        punta_end=punta_end,
+        use_holidays=use_holidays,
+        holidays_list=holidays_list,
+        holidays=holidays,
+        include_fixed=opts.get(CONF_INCLUDE_FIXED, False),
+        include_power=opts.get(CONF_INCLUDE_POWER, False),
+        contracted_power_kw=opts.get(CONF_CONTRACTED_POWER_KW, 0.0),
+        include_vat=opts.get(CONF_INCLUDE_VAT, False),
+        vat_rate=opts.get(CONF_VAT_RATE, DEFAULT_VAT_RATE),
+        apply_vat_to_fixed=opts.get(CONF_APPLY_VAT_TO_FIXED, False),
+        price_tables=cache.price_tables(
+            opts.get(CONF_PRICE_TABLE_OVERRIDE), opts.get(CONF_PRICE_TABLE_FILE)
+        ),
+        timeline=cache.timeline(
+            tariff, tz, punta_start, punta_end, use_holidays, holidays
+        ),
+        store_flush_interval=opts.get(
+            CONF_STORE_FLUSH_INTERVAL, DEFAULT_STORE_FLUSH_INTERVAL
+        ),
+        min_update_interval=opts.get(
+            CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL
+        ),
+        update_threshold=opts.get(CONF_UPDATE_THRESHOLD, DEFAULT_UPDATE_THRESHOLD),
+        compare_tariffs=opts.get(CONF_COMPARE_TARIFFS, False),
+        compare_punta_windows=opts.get(CONF_COMPARE_PUNTA_WINDOWS, False),
+        energy_entity_ids=energy_entity_ids(data),
+        power_entity_id=opts.get(CONF_POWER_ENTITY_ID) or None,
+        external_statistics=opts.get(CONF_EXTERNAL_STATISTICS, False),
+        sensor_thresholds=_load_sensor_thresholds(opts.get(CONF_SENSOR_THRESHOLDS)),
+    )
+
+
+def energy_entity_ids(data: Mapping[str, Any]) -> tuple[str, ...]:
+    """Return the configured meters; entries created before multi-meter store a string."""
+    value = data.get(CONF_ENERGY_ENTITY_ID)
+    if not value:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value)
+
+
+def compile_shadow_options(
+    options: TariffOptions, cache: OptionsCache | None = None
+) -> dict[str, TariffOptions]:
+    """Return the alternative tariffs to accumulate alongside the active one.
+
+    Keys are the tariff name, suffixed with the punta window for windows
+    other than the configured one.
+    """
+    if not options.compare_tariffs:
+        return {}
+    if cache is None:
+        cache = OptionsCache()
+
+    shadows: dict[str, TariffOptions] = {}
+    for tariff in TARIFFS:
+        windows = [options.punta_window]
+        if options.compare_punta_windows and tariff != TARIFF_TRS:
+            windows = PUNTA_WINDOWS
+        for window in windows:
+            name = tariff if window == options.punta_window else f"{tariff}_{window}"
+            punta_start, punta_end = parse_punta_window(window)
+            shadows[name] = replace(
+                options,
+                tariff=tariff,
+                punta_window=window,
+                punta_start=punta_start,
+                punta_end=punta_end,
+                timeline=cache.timeline(
+                    tariff,
+                    options.tz,
+                    punta_start,
+                    punta_end,
+                    options.use_holidays,
+                    options.holidays,
+                ),
+            )
+    return shadows
+
+
+def _parse_holidays(holidays_list: tuple[str, ...]) -> frozenset[date]:
+    holidays: set[date] = set()
+    for item in holidays_list:
+        try:
+            holidays.add(date.fromisoformat(item))
+        except (TypeError, ValueError):
+            _LOGGER.warning("Ignoring invalid holiday date: %s", item)
+    return frozenset(holidays)
+
+
+def parse_price_table_override(raw: str) -> dict[str, TariffPrices]:
+    """Parse a JSON price table over the defaults and compile it.
+
+    Raises ValueError if the merged table is invalid.
+    """
+    return compile_price_table(merge_price_table(DEFAULT_PRICE_TABLE, json.loads(raw)))
+
+
+def _load_price_table(override: str | None) -> dict[str, TariffPrices]:
+    if not override:
+        return DEFAULT_PRICES
+
+    try:
+        return parse_price_table_override(override)
+    except (ValueError, TypeError) as err:
+        _LOGGER.warning("Invalid price_table_override (%s); using defaults", err)
+        return DEFAULT_PRICES
+
+
+def parse_sensor_thresholds(raw: str) -> dict[str, dict[str, float]]:
+    """Parse the per-sensor precision override.
+
+    The value is a JSON object mapping sensor keys to any of decimals,
+    absolute and relative, e.g. {"cost_month": {"decimals": 0, "absolute": 5}}.
+    Raises ValueError if it is malformed.
+    """
+    thresholds = json.loads(raw)
+    if not isinstance(thresholds, dict):
+        raise ValueError("expected an object of sensor keys")
+    for key, settings in thresholds.items():
+        if not isinstance(settings, dict):
+            raise ValueError(f"{key}: expected an object")
+        for name, value in settings.items():
+            if name not in SENSOR_THRESHOLD_KEYS:
+                raise ValueError(f"{key}: unknown setting {name}")
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(f"{key}.{name}: expected a non-negative number")
+            if name == "decimals" and int(value) != value:
+                raise ValueError(f"{key}.decimals: expected an integer")
+    return thresholds
+
+
+def _load_sensor_thresholds(raw: str | None) -> Mapping[str, Mapping[str, float]]:
+    if not raw:
+        return {}
+
+    try:
+        return parse_sensor_thresholds(raw)
+    except ValueError as err:
+        _LOGGER.warning("Invalid sensor_thresholds (%s); using defaults", err)
+        return {}
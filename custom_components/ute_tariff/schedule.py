@@ -0,0 +1,222 @@
+"""Upcoming price schedule for UTE Tariff."""
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any
+
+from .const import TARIFF_TRS
+from .options import TariffOptions
+from .tariffs import TariffPrices
+
+Interval = tuple[float, float, str, float]
+
+# A TRS load is also tried this many seconds before a month start, the
+# latest start still counted at the month's total.
+RESET_MARGIN = 60.0
+
+
+def price_schedule(
+    options: TariffOptions,
+    start_ts: float,
+    end_ts: float,
+    kwh_month: float,
+    rate_kwh_per_hour: float,
+) -> list[Interval]:
+    """Return (start ts, end ts, period, price per kWh) intervals for the range.
+
+    TRD/TRT prices follow the timeline periods. TRS has a single period, so
+    its intervals are split where the month total, growing at
+    rate_kwh_per_hour and restarting at the first of each month, is
+    projected to cross a tier limit. Adjacent intervals with the same period
+    and price are merged.
+    """
+    intervals: list[Interval] = []
+    if options.tariff != TARIFF_TRS:
+        for seg_start, seg_end, info in options.timeline.segments(start_ts, end_ts):
+            rate = _prices_at(options, seg_start).rates[info.period]
+            _append(intervals, seg_start, seg_end, info.period, rate)
+        return intervals
+
+    kwh = kwh_month
+    for seg_start, seg_end, info in options.timeline.segments(start_ts, end_ts):
+        if seg_start > start_ts and _is_month_start(seg_start, options):
+            kwh = 0.0
+        tiers = _prices_at(options, seg_start).tiers
+        position = seg_start
+        while position < seg_end:
+            tier = tiers.index(kwh)
+            limit = tiers.limit(tier)
+            price = tiers.rates[tier]
+            if limit is not None and rate_kwh_per_hour > 0:
+                crossing = position + (limit - kwh) / rate_kwh_per_hour * 3600
+                if crossing < seg_end:
+                    _append(intervals, position, crossing, info.period, price)
+                    kwh = limit
+                    position = crossing
+                    continue
+            _append(intervals, position, seg_end, info.period, price)
+            kwh += rate_kwh_per_hour * (seg_end - position) / 3600
+            position = seg_end
+    return intervals
+
+
+def schedule_rows(
+    intervals: tuple[Interval, ...], options: TariffOptions, start_ts: float, end_ts: float
+) -> list[dict[str, Any]]:
+    """Format the intervals overlapping [start_ts, end_ts), clipped to it."""
+    rows = []
+    for interval_start, interval_end, period, price in intervals:
+        if interval_end <= start_ts or interval_start >= end_ts:
+            continue
+        rows.append(
+            {
+                "start": datetime.fromtimestamp(
+                    max(interval_start, start_ts), options.tz
+                ).isoformat(timespec="seconds"),
+                "end": datetime.fromtimestamp(
+                    min(interval_end, end_ts), options.tz
+                ).isoformat(timespec="seconds"),
+                "period": period,
+                "price": price,
+            }
+        )
+    return rows
+
+
+def cheapest_window(
+    options: TariffOptions,
+    start_ts: float,
+    deadline_ts: float,
+    duration: float,
+    energy_kwh: float,
+    kwh_month: float,
+    rate_kwh_per_hour: float,
+) -> tuple[float, float, float] | None:
+    """Find the start that minimises the cost of a deferrable load.
+
+    The load draws energy_kwh evenly over duration seconds and must finish
+    by deadline_ts. Returns (best start ts, its cost, cost of starting at
+    start_ts), or None if the load does not fit. Ties go to the earliest
+    start.
+    """
+    latest = deadline_ts - duration
+    if duration <= 0 or latest < start_ts:
+        return None
+    if options.tariff == TARIFF_TRS:
+        return _cheapest_trs(
+            options, start_ts, latest, energy_kwh, kwh_month, rate_kwh_per_hour
+        )
+
+    # The cost of a window is the integral of the price over it, which is
+    # piecewise linear in the start time, so the minimum is at a start or an
+    # end touching an interval boundary. Prefix sums make each candidate
+    # two bisects.
+    intervals = price_schedule(
+        options, start_ts, deadline_ts, kwh_month, rate_kwh_per_hour
+    )
+    bounds = [interval[0] for interval in intervals]
+    prefix = [0.0]
+    for interval_start, interval_end, _period, price in intervals:
+        prefix.append(prefix[-1] + price * (interval_end - interval_start))
+
+    def integral(ts: float) -> float:
+        index = min(max(bisect_right(bounds, ts) - 1, 0), len(intervals) - 1)
+        return prefix[index] + intervals[index][3] * (ts - bounds[index])
+
+    candidates = {start_ts, latest}
+    for bound in bounds:
+        if start_ts <= bound <= latest:
+            candidates.add(bound)
+        if start_ts <= bound - duration <= latest:
+            candidates.add(bound - duration)
+
+    scale = energy_kwh / duration
+    best_start = start_ts
+    best_cost = (integral(start_ts + duration) - integral(start_ts)) * scale
+    now_cost = best_cost
+    for candidate in sorted(candidates):
+        cost = (integral(candidate + duration) - integral(candidate)) * scale
+        if cost < best_cost - 1e-9:
+            best_start, best_cost = candidate, cost
+    return best_start, best_cost, now_cost
+
+
+def _cheapest_trs(
+    options: TariffOptions,
+    start_ts: float,
+    latest: float,
+    energy_kwh: float,
+    kwh_month: float,
+    rate_kwh_per_hour: float,
+) -> tuple[float, float, float]:
+    # TRS only depends on how far into its tiers the month total is when the
+    # load runs. The total is projected at rate_kwh_per_hour and drops to zero
+    # at each month start, so between month starts and price table changes
+    # the cost is piecewise linear in the start, with corners where the
+    # total, or the total plus the load, reaches a tier limit. Checking those
+    # starts finds the minimum whatever the tier prices are.
+    rate = max(rate_kwh_per_hour, 0.0) / 3600
+    options.timeline.cover(start_ts, latest)
+    resets = {ts for ts in options.timeline.month_starts if start_ts < ts <= latest}
+    edges = sorted({start_ts, latest, *resets, *_table_changes(options, start_ts, latest)})
+
+    candidates: list[tuple[float, float]] = []
+    base_ts, base_total = start_ts, kwh_month
+    for index, seg_start in enumerate(edges):
+        if seg_start in resets:
+            base_ts, base_total = seg_start, 0.0
+        candidates.append((seg_start, base_total + rate * (seg_start - base_ts)))
+        if index + 1 == len(edges):
+            break
+        seg_end = edges[index + 1]
+        if seg_end in resets and seg_end - RESET_MARGIN > seg_start:
+            # The total is highest just before it resets.
+            before = seg_end - RESET_MARGIN
+            candidates.append((before, base_total + rate * (before - base_ts)))
+        if rate > 0:
+            for bound in _prices_at(options, seg_start).tiers.bounds[1:]:
+                for total in (bound, bound - energy_kwh):
+                    ts = base_ts + (total - base_total) / rate
+                    if seg_start < ts < seg_end:
+                        candidates.append((ts, total))
+
+    candidates.sort()
+    now_cost = _prices_at(options, start_ts).tiers.cost_for_delta(kwh_month, energy_kwh)
+    best_start, best_cost = start_ts, now_cost
+    for ts, total in candidates:
+        cost = _prices_at(options, ts).tiers.cost_for_delta(total, energy_kwh)
+        if cost < best_cost - 1e-9:
+            best_start, best_cost = ts, cost
+    return best_start, best_cost, now_cost
+
+
+def _table_changes(options: TariffOptions, start_ts: float, end_ts: float) -> list[float]:
+    """Return the local midnights in (start_ts, end_ts] where a price table starts."""
+    changes = []
+    for day in options.price_tables.dates[1:]:
+        ts = datetime(day.year, day.month, day.day, tzinfo=options.tz).timestamp()
+        if start_ts < ts <= end_ts:
+            changes.append(ts)
+    return changes
+
+
+def _prices_at(options: TariffOptions, ts: float) -> TariffPrices:
+    return options.prices(datetime.fromtimestamp(ts, options.tz).date())
+
+
+def _is_month_start(ts: float, options: TariffOptions) -> bool:
+    local_dt = datetime.fromtimestamp(ts, options.tz)
+    return local_dt.day == 1 and local_dt.hour == 0 and local_dt.minute == 0
+
+
+def _append(
+    intervals: list[Interval], start: float, end: float, period: str, price: float
+) -> None:
+    if intervals:
+        last_start, last_end, last_period, last_price = intervals[-1]
+        if last_end == start and last_period == period and last_price == price:
+            intervals[-1] = (last_start, end, period, price)
+            return
+    intervals.append((start, end, period, price))
+
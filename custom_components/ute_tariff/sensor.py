@@ -1,6 +1,8 @@
 """Sensors for UTE Tariff."""
 from __future__ import annotations
 
+from collections.abc import Mapping
+from dataclasses import dataclass
 from typing import Any
 
 from homeassistant.components.sensor import (
@@ -10,89 +12,175 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import (
     ATTR_BREAKDOWN,
-    ATTR_IS_HOLIDAY_TODAY,
-    ATTR_IS_PEAK_NOW,
+    ATTR_CIRCUITS,
     ATTR_LAST_UPDATE_TS,
-    ATTR_MODE,
-    ATTR_PUNTA_WINDOW,
-    ATTR_TARIFF,
-    ATTR_TIMEZONE,
-    CONF_MODE,
-    CONF_PUNTA_WINDOW,
+    ATTR_SCHEDULE,
     CONF_TARIFF,
-    CONF_TIMEZONE,
     DOMAIN,
-    MODE_AVERAGE,
-    MODE_BILL_LIKE,
-    MODE_MARGINAL,
+    TARIFFS,
 )
 from .coordinator import UteTariffCoordinator
 
 
-SENSORS: list[SensorEntityDescription] = [
-    SensorEntityDescription(
+@dataclass(frozen=True, kw_only=True)
+class UteTariffSensorEntityDescription(SensorEntityDescription):
+    """Sensor description with the precision and significance of its state.
+
+    A new state is only written when the rounded value moved by at least
+    one of the thresholds; a threshold of 0 is disabled, and with both
+    disabled every change of the rounded value is written. The
+    sensor_thresholds option overrides these per key.
+    """
+
+    decimals: int = 2
+    absolute: float = 0.0
+    relative: float = 0.0
+
+
+SENSORS: list[UteTariffSensorEntityDescription] = [
+    UteTariffSensorEntityDescription(
         key="price_kwh_now",
         name="UTE Tariff Price kWh Now",
         native_unit_of_measurement="UYU/kWh",
         device_class=None,
         state_class=SensorStateClass.MEASUREMENT,
+        decimals=3,
     ),
-    SensorEntityDescription(
+    UteTariffSensorEntityDescription(
         key="cost_today",
         name="UTE Tariff Cost Today",
         native_unit_of_measurement="UYU",
         device_class=SensorDeviceClass.MONETARY,
         state_class=SensorStateClass.MEASUREMENT,
+        decimals=2,
     ),
-    SensorEntityDescription(
+    UteTariffSensorEntityDescription(
         key="cost_month",
         name="UTE Tariff Cost Month",
         native_unit_of_measurement="UYU",
         device_class=SensorDeviceClass.MONETARY,
         state_class=SensorStateClass.MEASUREMENT,
+        decimals=2,
     ),
-    SensorEntityDescription(
+    UteTariffSensorEntityDescription(
         key="kwh_today",
         name="UTE Tariff kWh Today",
         native_unit_of_measurement="kWh",
         device_class=SensorDeviceClass.ENERGY,
         state_class=SensorStateClass.MEASUREMENT,
+        decimals=3,
     ),
-    SensorEntityDescription(
+    UteTariffSensorEntityDescription(
         key="kwh_month",
         name="UTE Tariff kWh Month",
         native_unit_of_measurement="kWh",
         device_class=SensorDeviceClass.ENERGY,
         state_class=SensorStateClass.MEASUREMENT,
+        decimals=3,
+    ),
+    UteTariffSensorEntityDescription(
+        key="kwh_month_forecast",
+        name="UTE Tariff kWh Month Forecast",
+        native_unit_of_measurement="kWh",
+        device_class=SensorDeviceClass.ENERGY,
+        decimals=1,
+    ),
+    UteTariffSensorEntityDescription(
+        key="cost_month_forecast",
+        name="UTE Tariff Cost Month Forecast",
+        native_unit_of_measurement="UYU",
+        device_class=SensorDeviceClass.MONETARY,
+        decimals=2,
+    ),
+    UteTariffSensorEntityDescription(
+        key="bill_month_forecast",
+        name="UTE Tariff Bill Month Forecast",
+        native_unit_of_measurement="UYU",
+        device_class=SensorDeviceClass.MONETARY,
+        decimals=2,
+    ),
+    UteTariffSensorEntityDescription(
+        key="power_kw_now",
+        name="UTE Tariff Power Now",
+        native_unit_of_measurement="kW",
+        device_class=SensorDeviceClass.POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+        decimals=3,
+    ),
+    UteTariffSensorEntityDescription(
+        key="demand_kw",
+        name="UTE Tariff Demand 15 Min",
+        native_unit_of_measurement="kW",
+        device_class=SensorDeviceClass.POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+        decimals=3,
     ),
+    UteTariffSensorEntityDescription(
+        key="max_demand_kw_month",
+        name="UTE Tariff Max Demand Month",
+        native_unit_of_measurement="kW",
+        device_class=SensorDeviceClass.POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+        decimals=3,
+    ),
+]
+
+ATTRIBUTE_DECIMALS = 3
+
+# With external statistics enabled these costs reach the Energy dashboard
+# through the imported hourly statistic, so the sensors keep no statistics.
+EXTERNAL_STATISTICS_KEYS = ("cost_today", "cost_month")
+
+COMPARISON_SENSORS: list[UteTariffSensorEntityDescription] = [
+    UteTariffSensorEntityDescription(
+        key=f"cost_month_if_{tariff}",
+        name=f"UTE Tariff Cost Month If {tariff}",
+        native_unit_of_measurement="UYU",
+        device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.MEASUREMENT,
+        decimals=2,
+    )
+    for tariff in TARIFFS
 ]
 
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities
 ) -> None:
-    coordinator: UteTariffCoordinator = hass.data[DOMAIN][entry.entry_id]
+    coordinator: UteTariffCoordinator = hass.data[DOMAIN].coordinators[entry.entry_id]
 
     entities: list[SensorEntity] = [
         UteTariffSensor(coordinator, entry, description) for description in SENSORS
     ]
+    if coordinator.options.compare_tariffs:
+        entities.extend(
+            UteTariffComparisonSensor(coordinator, entry, description, tariff)
+            for description, tariff in zip(COMPARISON_SENSORS, TARIFFS)
+        )
     async_add_entities(entities)
 
 
 class UteTariffSensor(CoordinatorEntity[UteTariffCoordinator], SensorEntity):
     """UTE Tariff sensor."""
 
+    entity_description: UteTariffSensorEntityDescription
+    # The breakdown and per-circuit totals change with every update and are
+    # only useful live; last_update_ts would make every state unique.
+    _unrecorded_attributes = frozenset(
+        {ATTR_BREAKDOWN, ATTR_CIRCUITS, ATTR_LAST_UPDATE_TS, ATTR_SCHEDULE}
+    )
+
     def __init__(
         self,
         coordinator: UteTariffCoordinator,
         entry: ConfigEntry,
-        description: SensorEntityDescription,
+        description: UteTariffSensorEntityDescription,
     ) -> None:
         super().__init__(coordinator)
         self.entity_description = description
@@ -100,7 +188,13 @@ class UteTariffSensor(CoordinatorEntity[UteTariffCoordinator], SensorEntity):
         self._attr_unique_id = f"{entry.entry_id}_{description.key}"
         self._attr_device_class = description.device_class
         self._attr_state_class = description.state_class
+        if (
+            coordinator.options.external_statistics
+            and description.key in EXTERNAL_STATISTICS_KEYS
+        ):
+            self._attr_state_class = None
         self._entry = entry
+        self._written: tuple[bool, float | None, dict[str, Any]] | None = None
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -113,41 +207,93 @@ class UteTariffSensor(CoordinatorEntity[UteTariffCoordinator], SensorEntity):
 
     @property
     def native_value(self) -> float | None:
-        key = self.entity_description.key
-        data = self.coordinator.data
-
-        if key == "price_kwh_now":
-            mode = self._current_mode
-            if mode == MODE_MARGINAL:
-                return self.coordinator.compute_price_now()
-            if mode == MODE_AVERAGE:
-                return self.coordinator.compute_average_price()
-            if mode == MODE_BILL_LIKE:
-                return self.coordinator.compute_effective_price()
+        value = self.coordinator.snapshot.values.get(self.entity_description.key)
+        if value is None:
             return None
-
-        return data.get(key)
+        return round(value, self._setting("decimals"))
 
     @property
-    def extra_state_attributes(self) -> dict[str, Any]:
-        data = self.coordinator.data
-        options = self._entry.options
+    def extra_state_attributes(self) -> Mapping[str, Any]:
+        return _round_attributes(self._source_attributes())
 
-        attrs = {
-            ATTR_TARIFF: options.get(CONF_TARIFF, self._entry.data.get(CONF_TARIFF)),
-            ATTR_MODE: options.get(CONF_MODE, self._entry.data.get(CONF_MODE)),
-            ATTR_PUNTA_WINDOW: options.get(CONF_PUNTA_WINDOW, "18-22"),
-            ATTR_TIMEZONE: options.get(CONF_TIMEZONE, self._entry.data.get(CONF_TIMEZONE)),
-            ATTR_BREAKDOWN: data.get("breakdown", {}),
-            ATTR_LAST_UPDATE_TS: data.get("last_update_ts"),
-        }
+    def _source_attributes(self) -> Mapping[str, Any]:
+        snapshot = self.coordinator.snapshot
+        if self.entity_description.key == "max_demand_kw_month":
+            return {**snapshot.attributes, **snapshot.demand}
+        if self.entity_description.key != "price_kwh_now":
+            return snapshot.attributes
+        return {**snapshot.attributes, ATTR_SCHEDULE: snapshot.schedule_rows}
 
-        period_info = self.coordinator.current_period_info()
-        attrs[ATTR_IS_HOLIDAY_TODAY] = period_info["is_holiday_today"]
-        attrs[ATTR_IS_PEAK_NOW] = period_info["is_peak_now"]
+    def _setting(self, name: str) -> float:
+        override = self.coordinator.options.sensor_thresholds.get(self.entity_description.key)
+        if override and name in override:
+            return int(override[name]) if name == "decimals" else override[name]
+        return getattr(self.entity_description, name)
 
-        return attrs
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        written = (
+            self.available,
+            self.native_value,
+            {
+                key: value
+                for key, value in self.extra_state_attributes.items()
+                if key not in self._unrecorded_attributes
+            },
+        )
+        if self._written is not None and not self._significant(self._written, written):
+            return
+        self._written = written
+        self.async_write_ha_state()
 
-    @property
-    def _current_mode(self) -> str:
-        return self._entry.options.get(CONF_MODE, self._entry.data.get(CONF_MODE))
+    def _significant(
+        self,
+        old: tuple[bool, float | None, dict[str, Any]],
+        new: tuple[bool, float | None, dict[str, Any]],
+    ) -> bool:
+        old_available, old_value, old_attributes = old
+        available, value, attributes = new
+        if available != old_available or attributes != old_attributes:
+            return True
+        if value == old_value:
+            return False
+        if value is None or old_value is None:
+            return True
+
+        absolute = self._setting("absolute")
+        relative = self._setting("relative")
+        if not absolute and not relative:
+            return True
+        change = abs(value - old_value)
+        if absolute and change >= absolute:
+            return True
+        return bool(relative) and change >= relative * abs(old_value)
+
+
+class UteTariffComparisonSensor(UteTariffSensor):
+    """Month cost the same consumption would have had under another tariff."""
+
+    def __init__(
+        self,
+        coordinator: UteTariffCoordinator,
+        entry: ConfigEntry,
+        description: UteTariffSensorEntityDescription,
+        tariff: str,
+    ) -> None:
+        super().__init__(coordinator, entry, description)
+        self._tariff = tariff
+
+    def _source_attributes(self) -> Mapping[str, Any]:
+        return self.coordinator.snapshot.shadows.get(self._tariff, {})
+
+
+def _round_attributes(attributes: Mapping[str, Any]) -> dict[str, Any]:
+    """Round floats, including nested ones, so attribute payloads stay stable."""
+    rounded: dict[str, Any] = {}
+    for key, value in attributes.items():
+        if isinstance(value, float):
+            value = round(value, ATTRIBUTE_DECIMALS)
+        elif isinstance(value, Mapping):
+            value = _round_attributes(value)
+        rounded[key] = value
+    return rounded
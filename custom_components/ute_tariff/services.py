@@ -1,30 +1,137 @@
 """Services for UTE Tariff."""
 from __future__ import annotations
 
+import asyncio
 import logging
+from collections.abc import Mapping
+from datetime import datetime, timedelta, tzinfo
 from typing import Any
 
-from homeassistant.core import HomeAssistant, ServiceCall
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
 
 from .const import (
     DOMAIN,
+    GROUP_BY_DAY,
+    GROUP_BY_HOUR,
+    SCHEDULE_HOURS,
+    SERVICE_FIELD_CONFIG_ENTRY_ID,
+    SERVICE_FIELD_DEADLINE,
+    SERVICE_FIELD_DEVICE_ID,
+    SERVICE_FIELD_DURATION,
+    SERVICE_FIELD_END,
+    SERVICE_FIELD_ENERGY_KWH,
+    SERVICE_FIELD_GROUP_BY,
+    SERVICE_FIELD_HOURS,
     SERVICE_FIELD_ROUND_DIGITS,
+    SERVICE_FIELD_START,
     SERVICE_FIELD_TARGET_ENTITY_ID,
+    SERVICE_FIELD_TARGETS,
     SERVICE_FIELD_VALUE_SOURCE,
+    SERVICE_FIND_CHEAPEST_WINDOW,
+    SERVICE_GET_HISTORY,
+    SERVICE_GET_PRICE_SCHEDULE,
+    SERVICE_RECOMPUTE,
     SERVICE_SET_VALUE,
+    SERVICE_SET_VALUES,
     VALUE_SOURCE_AVG_MONTH,
     VALUE_SOURCE_COST_MONTH,
     VALUE_SOURCE_COST_TODAY,
     VALUE_SOURCE_EFF_MONTH,
     VALUE_SOURCE_PRICE_NOW,
 )
-from .coordinator import UteTariffCoordinator
+from .coordinator import TariffSnapshot, UteTariffCoordinator
+from .engine import UteTariffEngine
+from .schedule import schedule_rows
+from .tariffs import PERIODS
 
 _LOGGER = logging.getLogger(__name__)
 
+# Snapshot keys behind each value source. price_kwh_now keeps returning the
+# marginal price whatever the sensor mode.
+VALUE_SOURCE_KEYS = {
+    VALUE_SOURCE_PRICE_NOW: "marginal_kwh_now",
+    VALUE_SOURCE_AVG_MONTH: VALUE_SOURCE_AVG_MONTH,
+    VALUE_SOURCE_EFF_MONTH: VALUE_SOURCE_EFF_MONTH,
+    VALUE_SOURCE_COST_TODAY: "cost_today",
+    VALUE_SOURCE_COST_MONTH: "cost_month",
+}
+
+# Every service takes the entry to act on, by entry or by device.
+TARGET_FIELDS = {
+    vol.Optional(SERVICE_FIELD_CONFIG_ENTRY_ID): cv.string,
+    vol.Optional(SERVICE_FIELD_DEVICE_ID): cv.string,
+}
+
+ROUND_DIGITS = vol.All(vol.Coerce(int), vol.Range(min=0, max=6))
+
+SET_VALUE_SCHEMA = vol.Schema(
+    {
+        **TARGET_FIELDS,
+        vol.Required(SERVICE_FIELD_TARGET_ENTITY_ID): cv.entity_id,
+        vol.Required(SERVICE_FIELD_VALUE_SOURCE): vol.In(list(VALUE_SOURCE_KEYS)),
+        vol.Optional(SERVICE_FIELD_ROUND_DIGITS): ROUND_DIGITS,
+    }
+)
+
+SET_VALUES_SCHEMA = vol.Schema(
+    {
+        **TARGET_FIELDS,
+        vol.Required(SERVICE_FIELD_TARGETS): {
+            cv.entity_domain("input_number"): vol.In(list(VALUE_SOURCE_KEYS))
+        },
+        vol.Optional(SERVICE_FIELD_ROUND_DIGITS): ROUND_DIGITS,
+    }
+)
+
+GET_HISTORY_SCHEMA = vol.Schema(
+    {
+        **TARGET_FIELDS,
+        vol.Optional(SERVICE_FIELD_START): cv.datetime,
+        vol.Optional(SERVICE_FIELD_END): cv.datetime,
+        vol.Optional(SERVICE_FIELD_GROUP_BY): vol.In([GROUP_BY_HOUR, GROUP_BY_DAY]),
+    }
+)
+
+GET_PRICE_SCHEDULE_SCHEMA = vol.Schema(
+    {
+        **TARGET_FIELDS,
+        vol.Optional(SERVICE_FIELD_HOURS): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=SCHEDULE_HOURS)
+        ),
+    }
+)
+
+FIND_CHEAPEST_WINDOW_SCHEMA = vol.Schema(
+    {
+        **TARGET_FIELDS,
+        vol.Required(SERVICE_FIELD_DURATION): cv.positive_time_period,
+        vol.Required(SERVICE_FIELD_ENERGY_KWH): cv.positive_float,
+        vol.Optional(SERVICE_FIELD_DEADLINE): cv.datetime,
+    }
+)
+
+RECOMPUTE_SCHEMA = vol.Schema(
+    {
+        **TARGET_FIELDS,
+        vol.Optional(SERVICE_FIELD_START): cv.datetime,
+        vol.Optional(SERVICE_FIELD_END): cv.datetime,
+    }
+)
+
 
 def async_register_services(hass: HomeAssistant) -> None:
-    if hass.data.get(DOMAIN, {}).get("services_registered"):
+    engine: UteTariffEngine = hass.data[DOMAIN]
+    if engine.services_registered:
         return
 
     async def handle_set_value(call: ServiceCall) -> None:
@@ -36,12 +143,12 @@ def async_register_services(hass: HomeAssistant) -> None:
             _LOGGER.error("Target entity must be input_number, got %s", target_entity_id)
             return
 
-        coordinator = _pick_coordinator(hass)
+        coordinator = _pick_coordinator(hass, call)
         if coordinator is None:
             _LOGGER.error("No UTE Tariff coordinator available")
             return
 
-        value = _resolve_value(coordinator, value_source)
+        value = _resolve_value(coordinator.snapshot, value_source)
         if value is None:
             _LOGGER.error("Value source %s is unavailable", value_source)
             return
@@ -53,31 +160,230 @@ def async_register_services(hass: HomeAssistant) -> None:
             blocking=True,
         )
 
-    hass.services.async_register(DOMAIN, SERVICE_SET_VALUE, handle_set_value)
-    hass.data[DOMAIN]["services_registered"] = True
+    async def handle_set_values(call: ServiceCall) -> ServiceResponse:
+        targets: Mapping[str, str] = call.data[SERVICE_FIELD_TARGETS]
+        round_digits = call.data.get(SERVICE_FIELD_ROUND_DIGITS, 3)
+
+        coordinator = _require_coordinator(hass, call)
+
+        # Every value comes from the same snapshot, so the targets are
+        # consistent with each other and with the sensors.
+        snapshot = coordinator.snapshot
+        values: dict[str, float] = {}
+        skipped: list[str] = []
+        pending: list[str] = []
+        for target_entity_id, value_source in targets.items():
+            value = _resolve_value(snapshot, value_source)
+            if value is None:
+                _LOGGER.error("Value source %s is unavailable", value_source)
+                continue
+            value = round(value, round_digits)
+            values[target_entity_id] = value
+            if _current_value(hass, target_entity_id) == value:
+                skipped.append(target_entity_id)
+            else:
+                pending.append(target_entity_id)
+
+        results = await asyncio.gather(
+            *(
+                hass.services.async_call(
+                    "input_number",
+                    "set_value",
+                    {"entity_id": target_entity_id, "value": values[target_entity_id]},
+                    blocking=True,
+                )
+                for target_entity_id in pending
+            ),
+            return_exceptions=True,
+        )
+        written: list[str] = []
+        for target_entity_id, result in zip(pending, results):
+            if isinstance(result, Exception):
+                _LOGGER.error("Failed to set %s: %s", target_entity_id, result)
+            else:
+                written.append(target_entity_id)
+
+        if not call.return_response:
+            return None
+        return {"values": values, "written": written, "skipped": skipped}
+
+    async def handle_recompute(call: ServiceCall) -> ServiceResponse:
+        coordinator = _require_coordinator(hass, call)
+
+        tz = coordinator.options.tz
+        now = dt_util.now(tz)
+        start = _parse_datetime(call.data.get(SERVICE_FIELD_START), tz)
+        if start is None:
+            start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = _parse_datetime(call.data.get(SERVICE_FIELD_END), tz) or now
+        if start >= end:
+            raise ServiceValidationError(
+                f"Recompute start {start} must be before end {end}"
+            )
+
+        result = await coordinator.async_recompute(start, end)
+        if result is None:
+            raise HomeAssistantError(
+                f"No statistics found to recompute between {start} and {end}"
+            )
+        return result if call.return_response else None
+
+    async def handle_get_history(call: ServiceCall) -> ServiceResponse:
+        coordinator = _require_coordinator(hass, call)
+
+        tz = coordinator.options.tz
+        now = dt_util.now(tz)
+        start = _parse_datetime(call.data.get(SERVICE_FIELD_START), tz)
+        if start is None:
+            start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = _parse_datetime(call.data.get(SERVICE_FIELD_END), tz) or now
+        history = coordinator.history
+
+        if call.data.get(SERVICE_FIELD_GROUP_BY, GROUP_BY_HOUR) == GROUP_BY_DAY:
+            rows = [
+                {"date": day, "kwh": round(kwh, 4), "cost": round(cost, 4)}
+                for day, kwh, cost in history.days(start.timestamp(), end.timestamp(), tz)
+            ]
+        else:
+            rows = [
+                {
+                    "start": datetime.fromtimestamp(hour_ts, tz).isoformat(),
+                    "kwh": round(kwh, 4),
+                    "cost": round(cost, 4),
+                    "period": PERIODS[code],
+                }
+                for hour_ts, kwh, cost, code in history.hours(
+                    start.timestamp(), end.timestamp()
+                )
+            ]
+        return {"rows": rows}
+
+    async def handle_get_price_schedule(call: ServiceCall) -> ServiceResponse:
+        coordinator = _require_coordinator(hass, call)
 
+        options = coordinator.options
+        now = dt_util.utcnow()
+        hours = call.data.get(SERVICE_FIELD_HOURS, 24)
+        now_ts = now.timestamp()
+        return {
+            "tariff": options.tariff,
+            "intervals": schedule_rows(
+                coordinator.price_schedule(now), options, now_ts, now_ts + hours * 3600
+            ),
+        }
 
-def _pick_coordinator(hass: HomeAssistant) -> UteTariffCoordinator | None:
-    entries = hass.data.get(DOMAIN, {})
-    for value in entries.values():
-        if isinstance(value, UteTariffCoordinator):
-            return value
-    return None
+    async def handle_find_cheapest_window(call: ServiceCall) -> ServiceResponse:
+        coordinator = _require_coordinator(hass, call)
 
+        duration = call.data[SERVICE_FIELD_DURATION]
+        energy_kwh = call.data[SERVICE_FIELD_ENERGY_KWH]
+        tz = coordinator.options.tz
+        now = dt_util.now(tz)
+        deadline = _parse_datetime(call.data.get(SERVICE_FIELD_DEADLINE), tz)
+        if deadline is None:
+            deadline = now + timedelta(hours=24)
+
+        result = coordinator.find_cheapest_window(now, duration, energy_kwh, deadline)
+        if result is None:
+            raise ServiceValidationError(f"A {duration} load does not fit before {deadline}")
+        start_ts, cost, cost_now = result
+        start = datetime.fromtimestamp(start_ts, tz)
+        return {
+            "start": start.isoformat(timespec="seconds"),
+            "end": (start + duration).isoformat(timespec="seconds"),
+            "cost": round(cost, 4),
+            "cost_if_started_now": round(cost_now, 4),
+            "savings": round(cost_now - cost, 4),
+        }
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SET_VALUE, handle_set_value, schema=SET_VALUE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_VALUES,
+        handle_set_values,
+        schema=SET_VALUES_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_RECOMPUTE,
+        handle_recompute,
+        schema=RECOMPUTE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_HISTORY,
+        handle_get_history,
+        schema=GET_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_PRICE_SCHEDULE,
+        handle_get_price_schedule,
+        schema=GET_PRICE_SCHEDULE_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_FIND_CHEAPEST_WINDOW,
+        handle_find_cheapest_window,
+        schema=FIND_CHEAPEST_WINDOW_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    engine.services_registered = True
+
+
+def _pick_coordinator(
+    hass: HomeAssistant, call: ServiceCall
+) -> UteTariffCoordinator | None:
+    engine: UteTariffEngine | None = hass.data.get(DOMAIN)
+    if engine is None:
+        return None
+    return engine.resolve(
+        call.data.get(SERVICE_FIELD_CONFIG_ENTRY_ID),
+        call.data.get(SERVICE_FIELD_DEVICE_ID),
+    )
+
+
+def _require_coordinator(
+    hass: HomeAssistant, call: ServiceCall
+) -> UteTariffCoordinator:
+    coordinator = _pick_coordinator(hass, call)
+    if coordinator is None:
+        raise ServiceValidationError(
+            "No UTE Tariff entry matches the call; pass config_entry_id or device_id"
+        )
+    return coordinator
+
+
+def _parse_datetime(value: Any, tz: tzinfo) -> datetime | None:
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = dt_util.parse_datetime(str(value))
+        if value is None:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz)
+    return value
 
-def _resolve_value(coordinator: UteTariffCoordinator, value_source: str) -> float | None:
-    data = coordinator.data
 
-    if value_source == VALUE_SOURCE_PRICE_NOW:
-        return coordinator.compute_price_now()
-    if value_source == VALUE_SOURCE_AVG_MONTH:
-        return coordinator.compute_average_price()
-    if value_source == VALUE_SOURCE_EFF_MONTH:
-        return coordinator.compute_effective_price()
-    if value_source == VALUE_SOURCE_COST_TODAY:
-        return data.get("cost_today")
-    if value_source == VALUE_SOURCE_COST_MONTH:
-        return data.get("cost_month")
+def _resolve_value(snapshot: TariffSnapshot, value_source: str) -> float | None:
+    key = VALUE_SOURCE_KEYS.get(value_source)
+    if key is None:
+        return None
+    return snapshot.values.get(key)
 
-    return None
 
+def _current_value(hass: HomeAssistant, entity_id: str) -> float | None:
+    state = hass.states.get(entity_id)
+    if state is None:
+        return None
+    try:
+        return float(state.state)
+    except ValueError:
+        return None
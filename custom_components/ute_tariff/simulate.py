@@ -0,0 +1,416 @@
+"""Offline tariff simulator for exported meter readings.
+
+Run from the repository root, without Home Assistant:
+
+    python -m custom_components.ute_tariff.simulate readings.csv > bills.csv
+
+The input is a CSV or Parquet file with a timestamp and a kWh column and
+optionally a meter column. Timestamps are epoch seconds or ISO 8601; naive
+ones are local to --timezone. Each reading is billed at the period in force
+at its timestamp. The output has one row per meter, month, tariff, punta
+window and VAT setting.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import sys
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from multiprocessing import Pool
+from pathlib import Path
+from threading import BoundedSemaphore
+from typing import Any
+
+from zoneinfo import ZoneInfo
+
+from .const import (
+    DEFAULT_HOLIDAYS_2026,
+    DEFAULT_PUNTA_WINDOW,
+    DEFAULT_TIMEZONE,
+    DEFAULT_VAT_RATE,
+    PUNTA_WINDOWS,
+    TARIFF_TRS,
+    TARIFFS,
+)
+from .tariffs import (
+    DEFAULT_PRICE_TABLE,
+    PERIODS,
+    PeriodTimeline,
+    TariffPrices,
+    classify_batch,
+    compile_price_table,
+    get_timeline,
+    merge_price_table,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+VAT_NONE = "none"
+VAT_ENERGY = "energy"
+VAT_ALL = "all"
+VAT_SETTINGS = (VAT_NONE, VAT_ENERGY, VAT_ALL)
+
+# TRS has no punta, so it is simulated once instead of once per window.
+NO_PUNTA_WINDOW = "-"
+
+DEFAULT_CHUNK_ROWS = 200_000
+
+OUTPUT_COLUMNS = (
+    "meter",
+    "month",
+    "tariff",
+    "punta_window",
+    "vat",
+    "kwh",
+    "energy_cost",
+    "fixed_charge",
+    "power_charge",
+    "total",
+)
+
+# (tariff, punta window, meter, local month) -> kWh per period code.
+Totals = dict[tuple[str, str, str, str], list[float]]
+
+
+@dataclass(frozen=True)
+class SimulationConfig:
+    """What to simulate and where to find it in the input rows."""
+
+    timezone: str
+    scenarios: tuple[tuple[str, str], ...]
+    use_holidays: bool
+    holidays: tuple[str, ...]
+    timestamp_column: int
+    kwh_column: int
+    meter_column: int | None
+    default_meter: str
+
+
+_CONFIG: SimulationConfig | None = None
+
+
+def scenarios(
+    tariffs: Iterable[str], punta_windows: Iterable[str]
+) -> tuple[tuple[str, str], ...]:
+    windows = tuple(punta_windows)
+    return tuple(
+        (tariff, window)
+        for tariff in tariffs
+        for window in ((NO_PUNTA_WINDOW,) if tariff == TARIFF_TRS else windows)
+    )
+
+
+def simulate(
+    chunks: Iterable[tuple[str, Any]], config: SimulationConfig, workers: int = 1
+) -> Totals:
+    """Aggregate kWh per scenario, meter, month and period over all chunks.
+
+    Chunks are independent, so they are spread over a process pool; at most
+    two per worker are in flight, which keeps memory flat however large the
+    input is. Results are merged in input order so the sums are
+    reproducible.
+    """
+    totals: Totals = {}
+    if workers <= 1:
+        _init_worker(config)
+        for chunk in chunks:
+            _merge(totals, _aggregate(chunk))
+        return totals
+
+    in_flight = BoundedSemaphore(2 * workers)
+    with Pool(workers, initializer=_init_worker, initargs=(config,)) as pool:
+        for part in pool.imap(_aggregate, _throttle(chunks, in_flight)):
+            in_flight.release()
+            _merge(totals, part)
+    return totals
+
+
+def bills(
+    totals: Totals,
+    price_table: Mapping[str, TariffPrices],
+    vat_rate: float,
+    include_fixed: bool,
+    contracted_power_kw: float,
+) -> Iterator[dict[str, Any]]:
+    """Yield one bill per scenario, meter, month and VAT setting."""
+    for (tariff, window, meter, month), period_kwh in sorted(totals.items()):
+        prices = price_table[tariff]
+        kwh = sum(period_kwh)
+        if prices.tiers is not None:
+            energy_cost = prices.tiers.cost(kwh)
+        else:
+            energy_cost = sum(
+                energy * prices.rates.get(period, 0.0)
+                for period, energy in zip(PERIODS, period_kwh)
+            )
+        fixed = prices.fixed_charge_month if include_fixed else 0.0
+        power = prices.power_charge_per_kw * contracted_power_kw
+
+        for vat in VAT_SETTINGS:
+            energy_factor = 1.0 if vat == VAT_NONE else 1 + vat_rate
+            charge_factor = 1 + vat_rate if vat == VAT_ALL else 1.0
+            row_energy = energy_cost * energy_factor
+            row_fixed = fixed * charge_factor
+            row_power = power * charge_factor
+            yield {
+                "meter": meter,
+                "month": month,
+                "tariff": tariff,
+                "punta_window": window,
+                "vat": vat,
+                "kwh": round(kwh, 3),
+                "energy_cost": round(row_energy, 2),
+                "fixed_charge": round(row_fixed, 2),
+                "power_charge": round(row_power, 2),
+                "total": round(row_energy + row_fixed + row_power, 2),
+            }
+
+
+def csv_chunks(path: Path, chunk_rows: int) -> tuple[list[str], Iterator[tuple[str, Any]]]:
+    """Return the header and a stream of raw line chunks.
+
+    Lines are parsed in the workers, which is where most of the time goes.
+    """
+    handle = path.open(newline="", encoding="utf-8-sig")
+    header = next(csv.reader([handle.readline()]), [])
+
+    def chunks() -> Iterator[tuple[str, Any]]:
+        with handle:
+            while lines := list(islice(handle, chunk_rows)):
+                yield "lines", lines
+
+    return header, chunks()
+
+
+def parquet_chunks(
+    path: Path, chunk_rows: int, columns: Sequence[str]
+) -> tuple[list[str], Iterator[tuple[str, Any]]]:
+    """Return the selected columns and a stream of column batches."""
+    if pq is None:
+        raise ValueError("reading Parquet needs pyarrow installed")
+    parquet = pq.ParquetFile(path)
+    header = [name for name in columns if name in parquet.schema_arrow.names]
+
+    def chunks() -> Iterator[tuple[str, Any]]:
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=header):
+            yield "columns", [batch.column(index).to_pylist() for index in range(len(header))]
+
+    return header, chunks()
+
+
+def _throttle(
+    chunks: Iterable[tuple[str, Any]], in_flight: BoundedSemaphore
+) -> Iterator[tuple[str, Any]]:
+    for chunk in chunks:
+        in_flight.acquire()
+        yield chunk
+
+
+def _init_worker(config: SimulationConfig) -> None:
+    global _CONFIG
+    _CONFIG = config
+
+
+def _aggregate(chunk: tuple[str, Any]) -> Totals:
+    config = _CONFIG
+    kind, payload = chunk
+    if kind == "lines":
+        columns = _split_lines(payload, config)
+    else:
+        columns = payload
+
+    tz = ZoneInfo(config.timezone)
+    # A fleet export repeats the same instants for every meter, so each
+    # distinct timestamp is parsed once per chunk.
+    parsed: dict[Any, float] = {}
+    timestamps = []
+    for value in columns[config.timestamp_column]:
+        ts = parsed.get(value)
+        if ts is None:
+            ts = parsed[value] = _parse_timestamp(value, tz)
+        timestamps.append(ts)
+    kwh = [float(value) for value in columns[config.kwh_column]]
+    if config.meter_column is None:
+        meters = [config.default_meter] * len(timestamps)
+    else:
+        meters = [str(value) for value in columns[config.meter_column]]
+
+    totals: Totals = {}
+    if not timestamps:
+        return totals
+    meter_index: dict[str, int] = {}
+    groups = [meter_index.setdefault(meter, len(meter_index)) for meter in meters]
+    names = list(meter_index)
+    for tariff, window in config.scenarios:
+        timeline = get_timeline(
+            tariff,
+            config.timezone,
+            window if window != NO_PUNTA_WINDOW else DEFAULT_PUNTA_WINDOW,
+            config.use_holidays,
+            config.holidays,
+        )
+        timeline.cover(min(timestamps), max(timestamps))
+        month_labels = [
+            datetime.fromtimestamp(start, tz).strftime("%Y-%m")
+            for start in timeline.month_starts
+        ]
+        for (group, month, code), energy in _period_sums(timeline, groups, timestamps, kwh):
+            key = (tariff, window, names[group], month_labels[month])
+            period_kwh = totals.get(key)
+            if period_kwh is None:
+                period_kwh = totals[key] = [0.0] * len(PERIODS)
+            period_kwh[code] += energy
+    return totals
+
+
+def _period_sums(
+    timeline: PeriodTimeline,
+    groups: list[int],
+    timestamps: list[float],
+    kwh: list[float],
+) -> Iterator[tuple[tuple[int, int, int], float]]:
+    """Sum kWh per (meter, month, period code), classified by classify_batch."""
+    codes, months = classify_batch(timeline, timestamps)
+    if np is None:
+        sums: dict[tuple[int, int, int], float] = {}
+        for key, energy in zip(zip(groups, months, codes), kwh):
+            sums[key] = sums.get(key, 0.0) + energy
+        yield from sums.items()
+        return
+
+    month_count = len(timeline.month_starts)
+    keys = (np.asarray(groups) * month_count + months) * len(PERIODS) + codes
+    unique, inverse = np.unique(keys, return_inverse=True)
+    energy_sums = np.bincount(inverse.ravel(), weights=np.asarray(kwh, dtype=np.float64))
+    for key, energy in zip(unique.tolist(), energy_sums.tolist()):
+        rest, code = divmod(key, len(PERIODS))
+        group, month = divmod(rest, month_count)
+        yield (group, month, code), energy
+
+
+def _split_lines(lines: list[str], config: SimulationConfig) -> dict[int, list[str]]:
+    rows = [row for row in csv.reader(lines) if row]
+    indices = [config.timestamp_column, config.kwh_column]
+    if config.meter_column is not None:
+        indices.append(config.meter_column)
+    try:
+        return {index: [row[index] for row in rows] for index in indices}
+    except IndexError:
+        raise ValueError("a row has fewer columns than the header") from None
+
+
+def _parse_timestamp(value: Any, tz: ZoneInfo) -> float:
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, (int, float)):
+        return float(value)
+    else:
+        try:
+            return float(value)
+        except ValueError:
+            moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=tz)
+    return moment.timestamp()
+
+
+def _merge(totals: Totals, part: Totals) -> None:
+    for key, period_kwh in part.items():
+        current = totals.get(key)
+        if current is None:
+            totals[key] = period_kwh
+            continue
+        for code, energy in enumerate(period_kwh):
+            current[code] += energy
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", type=Path, help="CSV or Parquet file of readings")
+    parser.add_argument("--output", type=Path, help="write bills here instead of stdout")
+    parser.add_argument("--timestamp-column", default="timestamp")
+    parser.add_argument("--kwh-column", default="kwh")
+    parser.add_argument("--meter-column", default="meter")
+    parser.add_argument("--timezone", default=DEFAULT_TIMEZONE)
+    parser.add_argument("--tariffs", nargs="+", choices=TARIFFS, default=TARIFFS)
+    parser.add_argument(
+        "--punta-windows", nargs="+", choices=PUNTA_WINDOWS, default=PUNTA_WINDOWS
+    )
+    parser.add_argument("--holidays", nargs="*", default=DEFAULT_HOLIDAYS_2026)
+    parser.add_argument("--no-holidays", action="store_true")
+    parser.add_argument("--vat-rate", type=float, default=DEFAULT_VAT_RATE)
+    parser.add_argument("--no-fixed-charge", action="store_true")
+    parser.add_argument("--contracted-power-kw", type=float, default=0.0)
+    parser.add_argument(
+        "--price-table", type=Path, help="JSON prices to use over the default table"
+    )
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    try:
+        raw_table = DEFAULT_PRICE_TABLE
+        if args.price_table is not None:
+            raw_table = merge_price_table(
+                DEFAULT_PRICE_TABLE,
+                json.loads(args.price_table.read_text(encoding="utf-8")),
+            )
+        price_table = compile_price_table(raw_table)
+
+        wanted = (args.timestamp_column, args.kwh_column, args.meter_column)
+        if args.input.suffix.lower() in (".parquet", ".pq"):
+            header, chunks = parquet_chunks(args.input, args.chunk_rows, wanted)
+        else:
+            header, chunks = csv_chunks(args.input, args.chunk_rows)
+        for name in wanted[:2]:
+            if name not in header:
+                raise ValueError(f"{args.input} has no {name} column")
+
+        config = SimulationConfig(
+            timezone=args.timezone,
+            scenarios=scenarios(args.tariffs, args.punta_windows),
+            use_holidays=not args.no_holidays,
+            holidays=tuple(args.holidays),
+            timestamp_column=header.index(args.timestamp_column),
+            kwh_column=header.index(args.kwh_column),
+            meter_column=(
+                header.index(args.meter_column) if args.meter_column in header else None
+            ),
+            default_meter=args.input.stem,
+        )
+        totals = simulate(chunks, config, args.workers)
+    except (OSError, ValueError) as err:
+        parser.exit(1, f"{parser.prog}: error: {err}\n")
+
+    rows = bills(
+        totals,
+        price_table,
+        args.vat_rate,
+        not args.no_fixed_charge,
+        args.contracted_power_kw,
+    )
+    output = args.output.open("w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(output, fieldnames=OUTPUT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,30 @@
 """Tariff calculation helpers for UTE Tariff."""
 from __future__ import annotations
 
+import json
+from bisect import bisect_right
+from collections.abc import Collection, Iterable, Iterator, Mapping, Sequence
 from dataclasses import dataclass
-from datetime import date, datetime, time
+from datetime import UTC, date, datetime, time, timedelta
+from functools import lru_cache
+from math import fsum
 from typing import Any
 
 from zoneinfo import ZoneInfo
 
-from .const import PUNTA_WINDOWS, TARIFF_TRD, TARIFF_TRT, TARIFF_TRS
+# numpy and PyYAML ship with Home Assistant; without them the batch engine
+# uses its pure Python path and only JSON price files can be read.
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover
+    yaml = None
+
+from .const import DEFAULT_PUNTA_WINDOW, PUNTA_WINDOWS, TARIFF_TRD, TARIFF_TRT, TARIFF_TRS
 
 
 DEFAULT_PRICE_TABLE: dict[str, Any] = {
@@ -36,7 +53,14 @@ DEFAULT_PRICE_TABLE: dict[str, Any] = {
 }
 
 
-@dataclass
+PRICE_TABLE_RATE_KEYS: dict[str, tuple[str, ...]] = {
+    TARIFF_TRS: (),
+    TARIFF_TRD: ("offpeak_kwh", "peak_kwh"),
+    TARIFF_TRT: ("valley_kwh", "flat_kwh", "peak_kwh"),
+}
+
+
+@dataclass(frozen=True)
 class PeriodInfo:
     period: str
     is_peak: bool
@@ -45,7 +69,7 @@ class PeriodInfo:
 
 def parse_punta_window(window: str) -> tuple[int, int]:
     if window not in PUNTA_WINDOWS:
-        window = "18-22"
+        window = DEFAULT_PUNTA_WINDOW
     start, end = window.split("-")
     return int(start), int(end)
 
@@ -66,11 +90,185 @@ def classify_period(
     holidays_list: list[str],
     timezone: str,
 ) -> PeriodInfo:
-    tz = ZoneInfo(timezone)
-    local_dt = now.astimezone(tz)
-    local_date = local_dt.date()
-    business_day = is_business_day(local_date, use_holidays, holidays_list)
+    timeline = get_timeline(
+        tariff, timezone, punta_window, use_holidays, tuple(holidays_list)
+    )
+    return timeline.classify(now)
+
+
+@lru_cache(maxsize=32)
+def get_timeline(
+    tariff: str,
+    timezone: str,
+    punta_window: str,
+    use_holidays: bool,
+    holidays_list: tuple[str, ...],
+) -> PeriodTimeline:
     start_hour, end_hour = parse_punta_window(punta_window)
+    holidays = set()
+    for item in holidays_list:
+        try:
+            holidays.add(date.fromisoformat(item))
+        except ValueError:
+            continue
+    return PeriodTimeline(
+        tariff, ZoneInfo(timezone), start_hour, end_hour, use_holidays, holidays
+    )
+
+
+class PeriodTimeline:
+    """Sorted index of period transitions for one tariff calendar.
+
+    Transitions are stored as UTC timestamps and built one local year at a
+    time on demand, so classifying a reading is a bisect instead of a
+    timezone conversion. Every local midnight is a transition, even when
+    the period does not change, so consumers can split on day boundaries.
+    """
+
+    def __init__(
+        self,
+        tariff: str,
+        tz: ZoneInfo,
+        punta_start: int,
+        punta_end: int,
+        use_holidays: bool,
+        holidays: Collection[date],
+    ) -> None:
+        self.tariff = tariff
+        self.tz = tz
+        self.punta_start = punta_start
+        self.punta_end = punta_end
+        self.use_holidays = use_holidays
+        self.holidays = frozenset(holidays)
+        self._years: dict[int, tuple[list[float], list[PeriodInfo]]] = {}
+        self._starts: list[float] = []
+        self._infos: list[PeriodInfo] = []
+        self._month_starts: list[float] = []
+        self._first_year = 0
+        self._last_year = -1
+        self._end = 0.0
+
+    def is_business_day(self, local_date: date) -> bool:
+        if local_date.weekday() >= 5:
+            return False
+        return not (self.use_holidays and local_date in self.holidays)
+
+    def classify(self, now: datetime) -> PeriodInfo:
+        return self.classify_ts(now.timestamp())
+
+    def classify_ts(self, ts: float) -> PeriodInfo:
+        index = self._index(ts)
+        return self._infos[index]
+
+    def next_transition(self, now: datetime) -> datetime:
+        return datetime.fromtimestamp(self.next_transition_ts(now.timestamp()), UTC)
+
+    def next_transition_ts(self, ts: float) -> float:
+        index = self._index(ts) + 1
+        if index == len(self._starts):
+            self._cover_year(self._last_year + 1)
+        return self._starts[index]
+
+    def segments(
+        self, start_ts: float, end_ts: float
+    ) -> Iterator[tuple[float, float, PeriodInfo]]:
+        index = self._index(start_ts)
+        seg_start = start_ts
+        while seg_start < end_ts:
+            if index + 1 == len(self._starts):
+                self._cover_year(self._last_year + 1)
+            seg_end = min(self._starts[index + 1], end_ts)
+            yield seg_start, seg_end, self._infos[index]
+            seg_start = seg_end
+            index += 1
+
+    def cover(self, start_ts: float, end_ts: float) -> None:
+        self._index(start_ts)
+        self._index(end_ts)
+
+    @property
+    def starts(self) -> list[float]:
+        return self._starts
+
+    @property
+    def infos(self) -> list[PeriodInfo]:
+        return self._infos
+
+    @property
+    def month_starts(self) -> list[float]:
+        return self._month_starts
+
+    def _index(self, ts: float) -> int:
+        if not self._starts or ts < self._starts[0] or ts >= self._end:
+            self._cover_year(datetime.fromtimestamp(ts, self.tz).year)
+        return bisect_right(self._starts, ts) - 1
+
+    def _cover_year(self, year: int) -> None:
+        if self._years:
+            first = min(year, self._first_year)
+            last = max(year, self._last_year)
+        else:
+            first = last = year
+
+        starts: list[float] = []
+        infos: list[PeriodInfo] = []
+        for build_year in range(first, last + 1):
+            if build_year not in self._years:
+                self._years[build_year] = self._build_year(build_year)
+            year_starts, year_infos = self._years[build_year]
+            starts.extend(year_starts)
+            infos.extend(year_infos)
+
+        self._starts = starts
+        self._infos = infos
+        self._month_starts = [
+            datetime(build_year, month, 1, tzinfo=self.tz).timestamp()
+            for build_year in range(first, last + 1)
+            for month in range(1, 13)
+        ]
+        self._first_year = first
+        self._last_year = last
+        self._end = datetime(last + 1, 1, 1, tzinfo=self.tz).timestamp()
+
+    def _build_year(self, year: int) -> tuple[list[float], list[PeriodInfo]]:
+        starts: list[float] = []
+        infos: list[PeriodInfo] = []
+        day = date(year, 1, 1)
+        while day.year == year:
+            business_day = self.is_business_day(day)
+            for hour in self._day_boundaries(business_day):
+                local_dt = datetime(day.year, day.month, day.day, hour, tzinfo=self.tz)
+                ts = local_dt.timestamp()
+                if starts and ts <= starts[-1]:
+                    continue
+                starts.append(ts)
+                infos.append(
+                    classify_local(
+                        self.tariff, local_dt, self.punta_start, self.punta_end, business_day
+                    )
+                )
+            day += timedelta(days=1)
+        return starts, infos
+
+    def _day_boundaries(self, business_day: bool) -> tuple[int, ...]:
+        if self.tariff == TARIFF_TRD:
+            if business_day:
+                return (0, self.punta_start, self.punta_end)
+            return (0,)
+        if self.tariff == TARIFF_TRT:
+            if business_day:
+                return (0, 7, self.punta_start, self.punta_end)
+            return (0, 7)
+        return (0,)
+
+
+def classify_local(
+    tariff: str,
+    local_dt: datetime,
+    start_hour: int,
+    end_hour: int,
+    business_day: bool,
+) -> PeriodInfo:
     is_peak = business_day and start_hour <= local_dt.hour < end_hour
 
     if tariff == TARIFF_TRD:
@@ -92,61 +290,454 @@ def classify_period(
     return PeriodInfo(period=period, is_peak=is_peak, is_holiday=not business_day)
 
 
-def trs_cost_for_delta(prev_total_kwh: float, delta_kwh: float, prices: dict[str, Any]) -> float:
-    tiers = prices["tiers"]
-    remaining = delta_kwh
-    cost = 0.0
-    current_total = prev_total_kwh
+def merge_price_table(base: Mapping[str, Any], override: Any) -> dict[str, Any]:
+    """Return base with the tariffs and prices given in override replaced.
 
-    for tier in tiers:
-        price = tier["price"]
-        limit = tier["limit"]
-        if remaining <= 0:
-            break
+    Tariffs and keys left out of override keep their base values, so an
+    override can change a single rate. TRS tiers are replaced as a whole.
+    """
+    if not isinstance(override, dict):
+        raise ValueError("price table must be an object")
+    merged = {tariff: dict(prices) for tariff, prices in base.items()}
+    for tariff, prices in override.items():
+        if isinstance(prices, dict) and isinstance(merged.get(tariff), dict):
+            merged[tariff].update(prices)
+        else:
+            merged[tariff] = prices
+    return merged
 
-        if limit is None:
-            cost += remaining * price
-            remaining = 0
-            break
 
-        tier_span = max(0.0, limit - current_total)
-        if tier_span <= 0:
-            current_total = limit
+def validate_price_table(price_table: Any) -> None:
+    if not isinstance(price_table, dict):
+        raise ValueError("price table must be an object")
+
+    for tariff, rate_keys in PRICE_TABLE_RATE_KEYS.items():
+        prices = price_table.get(tariff)
+        if not isinstance(prices, dict):
+            raise ValueError(f"missing {tariff} prices")
+        for key in (*rate_keys, "fixed_charge_month", "power_charge_per_kw"):
+            if not _is_price(prices.get(key)):
+                raise ValueError(f"{tariff}.{key} must be a non-negative number")
+
+    tiers = price_table[TARIFF_TRS].get("tiers")
+    if not isinstance(tiers, list) or not tiers:
+        raise ValueError("TRS.tiers must be a non-empty list")
+    previous_limit = 0.0
+    for index, tier in enumerate(tiers):
+        if not isinstance(tier, dict) or not _is_price(tier.get("price")):
+            raise ValueError(f"TRS.tiers[{index}].price must be a non-negative number")
+        if "limit" not in tier:
+            raise ValueError(f"TRS.tiers[{index}].limit is missing; use null for the last tier")
+        limit = tier["limit"]
+        if limit is None:
+            if index != len(tiers) - 1:
+                raise ValueError("only the last TRS tier may have no limit")
             continue
+        if not _is_number(limit) or limit <= previous_limit:
+            raise ValueError(f"TRS.tiers[{index}].limit must be increasing")
+        previous_limit = limit
+    if tiers[-1].get("limit") is not None:
+        raise ValueError("the last TRS tier must have no limit")
+
+
+class PriceTableRegistry:
+    """Price tables keyed by the local date they take effect on.
+
+    The base table applies before the first dated one, so every date has a
+    table. Lookups bisect the effective dates; the range of the last hit is
+    kept, since consecutive readings almost always fall in the same table.
+    """
+
+    __slots__ = ("dates", "tables", "_hit")
+
+    def __init__(
+        self,
+        base: Mapping[str, Any],
+        dated: Iterable[tuple[date, Mapping[str, Any]]] = (),
+    ) -> None:
+        ordered = sorted(dated, key=lambda item: item[0])
+        self.dates = [date.min, *(day for day, _table in ordered)]
+        self.tables = [base, *(table for _day, table in ordered)]
+        self._hit = self._range(0)
+
+    def at(self, day: date) -> Mapping[str, Any]:
+        start, end, table = self._hit
+        if start <= day < end:
+            return table
+        self._hit = self._range(bisect_right(self.dates, day) - 1)
+        return self._hit[2]
+
+    def _range(self, index: int) -> tuple[date, date, Mapping[str, Any]]:
+        end = self.dates[index + 1] if index + 1 < len(self.dates) else date.max
+        return self.dates[index], end, self.tables[index]
+
+
+def parse_price_tables(raw: Any) -> list[tuple[date, dict[str, Any]]]:
+    """Parse a mapping of effective date to price table.
+
+    Dates are ISO strings, or dates as YAML loads them. Raises ValueError if
+    a date or a table is invalid.
+    """
+    if not isinstance(raw, dict) or not raw:
+        raise ValueError("expected an object of effective dates")
+    tables = []
+    for key, price_table in raw.items():
+        try:
+            day = key if isinstance(key, date) else date.fromisoformat(key)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key}: expected an ISO date") from None
+        try:
+            validate_price_table(price_table)
+        except ValueError as err:
+            raise ValueError(f"{day.isoformat()}: {err}") from None
+        tables.append((day, price_table))
+    return tables
+
+
+def load_price_tables(path: str) -> list[tuple[date, dict[str, Any]]]:
+    """Read dated price tables from a JSON or YAML file.
 
-        take = min(remaining, tier_span)
-        cost += take * price
-        remaining -= take
-        current_total += take
+    Does blocking I/O. Raises OSError if the file cannot be read and
+    ValueError if it is invalid.
+    """
+    with open(path, encoding="utf-8") as handle:
+        text = handle.read()
+    if path.endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise ValueError("reading YAML needs PyYAML installed")
+        try:
+            raw = yaml.safe_load(text)
+        except yaml.YAMLError as err:
+            raise ValueError(str(err)) from None
+    else:
+        raw = json.loads(text)
+    return parse_price_tables(raw)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_price(value: Any) -> bool:
+    return _is_number(value) and value >= 0
+
+
+class TierSchedule:
+    """TRS block tiers with cumulative bounds and costs precomputed.
+
+    bounds[i] is the month total tier i starts at and cum_costs[i] the cost
+    of the month up to it, so the cost of any total, and of any range as
+    the difference of two totals, is one bisect. The kWh right at a limit
+    is billed at the next tier.
+    """
+
+    __slots__ = ("bounds", "rates", "cum_costs")
+
+    def __init__(self, tiers: Sequence[Mapping[str, Any]]) -> None:
+        self.bounds = [0.0]
+        self.rates: list[float] = []
+        self.cum_costs = [0.0]
+        for tier in tiers:
+            self.rates.append(tier["price"])
+            if tier["limit"] is None:
+                break
+            self.cum_costs.append(
+                self.cum_costs[-1] + (tier["limit"] - self.bounds[-1]) * tier["price"]
+            )
+            self.bounds.append(float(tier["limit"]))
+        else:
+            # Without an open-ended tier, the last price applies above its limit.
+            self.bounds.pop()
+            self.cum_costs.pop()
+
+    def index(self, total_kwh: float) -> int:
+        return max(bisect_right(self.bounds, total_kwh) - 1, 0)
+
+    def limit(self, index: int) -> float | None:
+        """Return the month total where tier index ends, None for the last."""
+        return self.bounds[index + 1] if index + 1 < len(self.bounds) else None
+
+    def cost(self, total_kwh: float) -> float:
+        tier = self.index(total_kwh)
+        return self.cum_costs[tier] + (total_kwh - self.bounds[tier]) * self.rates[tier]
+
+    def cost_for_delta(self, prev_total_kwh: float, delta_kwh: float) -> float:
+        if delta_kwh <= 0:
+            return 0.0
+        return self.cost(prev_total_kwh + delta_kwh) - self.cost(prev_total_kwh)
+
+    def marginal_price(self, total_kwh: float) -> float:
+        return self.rates[self.index(total_kwh)]
+
+    def breakdown(self, total_kwh: float) -> dict[str, float]:
+        current = self.index(total_kwh)
+        breakdown: dict[str, float] = {}
+        for tier, rate in enumerate(self.rates):
+            if tier < current:
+                kwh = self.bounds[tier + 1] - self.bounds[tier]
+            elif tier == current:
+                kwh = max(total_kwh - self.bounds[tier], 0.0)
+            else:
+                kwh = 0.0
+            breakdown[f"kwh_tier{tier + 1}"] = kwh
+            breakdown[f"cost_tier{tier + 1}"] = kwh * rate
+        return breakdown
+
+
+_TIER_SCHEDULES: dict[int, tuple[Mapping[str, Any], TierSchedule]] = {}
+
+
+def tier_schedule(prices: Mapping[str, Any]) -> TierSchedule:
+    """Return the tiers of a TRS price table, compiled once per table."""
+    cached = _TIER_SCHEDULES.get(id(prices))
+    if cached is not None and cached[0] is prices:
+        return cached[1]
+    if len(_TIER_SCHEDULES) >= 64:
+        _TIER_SCHEDULES.clear()
+    schedule = TierSchedule(prices["tiers"])
+    # The table is kept alongside so its id cannot be reused while cached.
+    _TIER_SCHEDULES[id(prices)] = (prices, schedule)
+    return schedule
+
+
+@dataclass(frozen=True, slots=True)
+class TariffPrices:
+    """Prices of one tariff, compiled from a validated price table.
+
+    rates holds the price per kWh of each TRD/TRT period, keyed by period
+    name; tiers is set for TRS only.
+    """
+
+    rates: Mapping[str, float]
+    tiers: TierSchedule | None
+    fixed_charge_month: float
+    power_charge_per_kw: float
+
+
+def compile_price_table(price_table: Any) -> dict[str, TariffPrices]:
+    """Validate a price table and compile the prices of every tariff.
+
+    Raises ValueError if the table is invalid, so a compiled table can be
+    used in the accumulation path without further checks.
+    """
+    validate_price_table(price_table)
+    compiled = {}
+    for tariff, rate_keys in PRICE_TABLE_RATE_KEYS.items():
+        prices = price_table[tariff]
+        compiled[tariff] = TariffPrices(
+            rates={key.removesuffix("_kwh"): float(prices[key]) for key in rate_keys},
+            tiers=TierSchedule(prices["tiers"]) if tariff == TARIFF_TRS else None,
+            fixed_charge_month=float(prices["fixed_charge_month"]),
+            power_charge_per_kw=float(prices["power_charge_per_kw"]),
+        )
+    return compiled
 
-    if remaining > 0:
-        cost += remaining * tiers[-1]["price"]
 
-    return cost
+def trs_cost_for_delta(prev_total_kwh: float, delta_kwh: float, prices: dict[str, Any]) -> float:
+    return tier_schedule(prices).cost_for_delta(prev_total_kwh, delta_kwh)
 
 
 def trs_tier_breakdown(total_kwh: float, prices: dict[str, Any]) -> dict[str, float]:
-    tier1 = min(total_kwh, 100.0)
-    tier2 = min(max(total_kwh - 100.0, 0.0), 500.0)
-    tier3 = max(total_kwh - 600.0, 0.0)
-    price1 = prices["tiers"][0]["price"]
-    price2 = prices["tiers"][1]["price"]
-    price3 = prices["tiers"][2]["price"]
-
-    return {
-        "kwh_tier1": tier1,
-        "kwh_tier2": tier2,
-        "kwh_tier3": tier3,
-        "cost_tier1": tier1 * price1,
-        "cost_tier2": tier2 * price2,
-        "cost_tier3": tier3 * price3,
-    }
+    return tier_schedule(prices).breakdown(total_kwh)
 
 
 def trs_marginal_price(total_kwh: float, prices: dict[str, Any]) -> float:
-    if total_kwh <= 100.0:
-        return prices["tiers"][0]["price"]
-    if total_kwh <= 600.0:
-        return prices["tiers"][1]["price"]
-    return prices["tiers"][2]["price"]
+    return tier_schedule(prices).marginal_price(total_kwh)
+
+
+PERIODS: tuple[str, ...] = ("tiers", "offpeak", "peak", "valley", "flat")
+PERIOD_CODES: dict[str, int] = {period: code for code, period in enumerate(PERIODS)}
+
+
+@dataclass
+class BatchResult:
+    period_codes: Sequence[int]
+    costs: Sequence[float]
+    breakdown: dict[str, float]
+    kwh: float
+    cost: float
+
+
+def classify_batch(
+    timeline: PeriodTimeline,
+    timestamps: Sequence[float],
+    use_numpy: bool | None = None,
+) -> tuple[Sequence[int], Sequence[int]]:
+    """Return the period code and month of many UTC timestamps in one pass.
+
+    Months are indices into timeline.month_starts. The timestamps may be in
+    any order.
+    """
+    if not len(timestamps):
+        return [], []
+    if _use_numpy(use_numpy):
+        ts = np.asarray(timestamps, dtype=np.float64)
+        timeline.cover(float(ts.min()), float(ts.max()))
+        info_codes = np.array([PERIOD_CODES[info.period] for info in timeline.infos])
+        codes = info_codes[np.searchsorted(np.asarray(timeline.starts), ts, side="right") - 1]
+        months = np.searchsorted(np.asarray(timeline.month_starts), ts, side="right") - 1
+        return codes, months
+
+    timeline.cover(min(timestamps), max(timestamps))
+    starts = timeline.starts
+    month_starts = timeline.month_starts
+    info_codes = [PERIOD_CODES[info.period] for info in timeline.infos]
+    codes = [info_codes[bisect_right(starts, ts) - 1] for ts in timestamps]
+    months = [bisect_right(month_starts, ts) - 1 for ts in timestamps]
+    return codes, months
+
+
+def batch_costs(
+    timeline: PeriodTimeline,
+    timestamps: Sequence[float],
+    kwh: Sequence[float],
+    prices: TariffPrices,
+    start_kwh: float = 0.0,
+    use_numpy: bool | None = None,
+) -> BatchResult:
+    """Classify and cost many readings in one pass.
+
+    timestamps are UTC epoch seconds in ascending order and kwh the energy
+    consumed at each of them, costed with the compiled prices of the
+    timeline's tariff. TRS tiers accumulate from start_kwh and reset at
+    every local month start. NumPy is used when available; the pure Python
+    path performs the same floating point operations in the same order, so
+    both return identical results.
+    """
+    if len(timestamps) != len(kwh):
+        raise ValueError("timestamps and kwh must have the same length")
+    if not len(timestamps):
+        return BatchResult([], [], {}, 0.0, 0.0)
+
+    use_numpy = _use_numpy(use_numpy)
+    codes, months = classify_batch(timeline, timestamps, use_numpy)
+    if use_numpy:
+        return _batch_costs_numpy(codes, months, kwh, prices, start_kwh)
+    return _batch_costs_python(codes, months, kwh, prices, start_kwh)
+
+
+def _use_numpy(use_numpy: bool | None) -> bool:
+    if use_numpy is None:
+        return np is not None
+    if use_numpy and np is None:
+        raise ValueError("use_numpy=True needs numpy installed")
+    return use_numpy
+
+
+def _batch_costs_numpy(
+    codes: Any,
+    month: Any,
+    kwh: Sequence[float],
+    prices: TariffPrices,
+    start_kwh: float,
+) -> BatchResult:
+    energy = np.asarray(kwh, dtype=np.float64)
+    breakdown: dict[str, float] = {}
+
+    if prices.tiers is not None:
+        tiers = prices.tiers
+        bounds, rates, cum_costs = tiers.bounds, tiers.rates, tiers.cum_costs
+        cum = np.cumsum(energy)
+        before_cum = cum - energy
+        first = np.flatnonzero(np.r_[True, month[1:] != month[:-1]])
+        base = np.repeat(before_cum[first], np.diff(np.r_[first, len(energy)]))
+        offset = np.where(month == month[0], start_kwh, 0.0)
+        before = before_cum - base + offset
+        after = before + energy
+
+        np_bounds = np.asarray(bounds)
+        np_rates = np.asarray(rates)
+        np_cum_costs = np.asarray(cum_costs)
+
+        def cumulative_cost(total):
+            tier = np.searchsorted(np_bounds, total, side="right") - 1
+            return np_cum_costs[tier] + (total - np_bounds[tier]) * np_rates[tier]
+
+        costs = cumulative_cost(after) - cumulative_cost(before)
+        for tier, rate in enumerate(rates):
+            lower = bounds[tier]
+            upper = bounds[tier + 1] if tier + 1 < len(bounds) else np.inf
+            tier_kwh = np.clip(after, lower, upper) - np.clip(before, lower, upper)
+            total = fsum(tier_kwh.tolist())
+            breakdown[f"kwh_tier{tier + 1}"] = total
+            breakdown[f"cost_tier{tier + 1}"] = total * rate
+    else:
+        code_rates = np.array(
+            [prices.rates.get(period, 0.0) for period in PERIODS], dtype=np.float64
+        )
+        costs = energy * code_rates[codes]
+        kwh_by_code = np.bincount(codes, weights=energy, minlength=len(PERIODS))
+        cost_by_code = np.bincount(codes, weights=costs, minlength=len(PERIODS))
+        for code in np.unique(codes):
+            period = PERIODS[code]
+            breakdown[f"kwh_{period}"] = float(kwh_by_code[code])
+            breakdown[f"cost_{period}"] = float(cost_by_code[code])
+
+    return BatchResult(
+        period_codes=codes,
+        costs=costs,
+        breakdown=breakdown,
+        kwh=fsum(energy.tolist()),
+        cost=fsum(costs.tolist()),
+    )
+
+
+def _batch_costs_python(
+    codes: list[int],
+    months: list[int],
+    kwh: Sequence[float],
+    prices: TariffPrices,
+    start_kwh: float,
+) -> BatchResult:
+    breakdown: dict[str, float] = {}
+    costs: list[float] = []
+
+    if prices.tiers is not None:
+        tiers = prices.tiers
+        bounds, rates = tiers.bounds, tiers.rates
+        tier_kwh: list[list[float]] = [[] for _ in rates]
+
+        cum = 0.0
+        base = 0.0
+        first_month = current_month = months[0]
+        for month, energy in zip(months, kwh):
+            cum = cum + energy
+            before_cum = cum - energy
+            if month != current_month:
+                current_month = month
+                base = before_cum
+            offset = start_kwh if month == first_month else 0.0
+            before = before_cum - base + offset
+            after = before + energy
+            costs.append(tiers.cost(after) - tiers.cost(before))
+            for tier in range(len(rates)):
+                lower = bounds[tier]
+                upper = bounds[tier + 1] if tier + 1 < len(bounds) else float("inf")
+                tier_kwh[tier].append(
+                    min(max(after, lower), upper) - min(max(before, lower), upper)
+                )
+        for tier, rate in enumerate(rates):
+            total = fsum(tier_kwh[tier])
+            breakdown[f"kwh_tier{tier + 1}"] = total
+            breakdown[f"cost_tier{tier + 1}"] = total * rate
+    else:
+        code_rates = [prices.rates.get(period, 0.0) for period in PERIODS]
+        kwh_by_code = [0.0] * len(PERIODS)
+        cost_by_code = [0.0] * len(PERIODS)
+        for code, energy in zip(codes, kwh):
+            cost = energy * code_rates[code]
+            costs.append(cost)
+            kwh_by_code[code] += energy
+            cost_by_code[code] += cost
+        for code in sorted(set(codes)):
+            period = PERIODS[code]
+            breakdown[f"kwh_{period}"] = kwh_by_code[code]
+            breakdown[f"cost_{period}"] = cost_by_code[code]
 
+    return BatchResult(
+        period_codes=codes,
+        costs=costs,
+        breakdown=breakdown,
+        kwh=fsum(kwh),
+        cost=fsum(costs),
+    )
@@ -0,0 +1 @@
+"""Tests for UTE Tariff."""
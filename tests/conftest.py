@@ -0,0 +1,37 @@
+"""Shared fixtures for the UTE Tariff tests."""
+from __future__ import annotations
+
+import json
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from custom_components.ute_tariff.const import (
+    CONF_PRICE_TABLE_OVERRIDE,
+    CONF_PUNTA_WINDOW,
+    CONF_TARIFF,
+)
+from custom_components.ute_tariff.options import TariffOptions, compile_options
+
+TZ = ZoneInfo("America/Montevideo")
+
+
+def local_ts(*args: int) -> float:
+    """Return the timestamp of a Montevideo local time."""
+    return datetime(*args, tzinfo=TZ).timestamp()
+
+
+@pytest.fixture
+def make_options() -> Callable[..., TariffOptions]:
+    def make(
+        tariff: str, price_table: dict[str, Any] | None = None, **opts: Any
+    ) -> TariffOptions:
+        opts.setdefault(CONF_PUNTA_WINDOW, "18-22")
+        if price_table is not None:
+            opts[CONF_PRICE_TABLE_OVERRIDE] = json.dumps(price_table)
+        return compile_options({CONF_TARIFF: tariff}, {CONF_TARIFF: tariff, **opts})
+
+    return make
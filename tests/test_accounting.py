@@ -0,0 +1,131 @@
+"""Tests for the UTE Tariff energy attribution."""
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from custom_components.ute_tariff.accounting import (
+    apply_batch,
+    apply_interval,
+    apply_pieces,
+    bill_total,
+    empty_buckets,
+    split_interval,
+)
+from custom_components.ute_tariff.const import (
+    CONF_CONTRACTED_POWER_KW,
+    CONF_INCLUDE_FIXED,
+    CONF_INCLUDE_POWER,
+    CONF_INCLUDE_VAT,
+    CONF_VAT_RATE,
+)
+from custom_components.ute_tariff.tariffs import DEFAULT_PRICE_TABLE, TierSchedule
+
+from .conftest import TZ, local_ts
+
+TIERS = TierSchedule(DEFAULT_PRICE_TABLE["TRS"]["tiers"])
+
+
+def test_split_interval_is_pro_rata_over_periods(make_options):
+    options = make_options("TRD")
+    pieces = split_interval(options, 3.0, local_ts(2026, 3, 2, 17), local_ts(2026, 3, 2, 20))
+
+    assert [(local_dt.hour, kwh, info.period) for local_dt, kwh, info in pieces] == [
+        (17, pytest.approx(1.0), "offpeak"),
+        (18, pytest.approx(2.0), "peak"),
+    ]
+    assert all(local_dt.tzinfo is TZ for local_dt, _kwh, _info in pieces)
+
+
+def test_split_interval_splits_at_midnight(make_options):
+    options = make_options("TRS")
+    pieces = split_interval(options, 4.0, local_ts(2026, 3, 31, 23), local_ts(2026, 4, 1, 2))
+
+    assert [(local_dt.date(), kwh) for local_dt, kwh, _info in pieces] == [
+        (date(2026, 3, 31), pytest.approx(4.0 / 3)),
+        (date(2026, 4, 1), pytest.approx(8.0 / 3)),
+    ]
+    assert sum(kwh for _dt, kwh, _info in pieces) == pytest.approx(4.0)
+
+
+def test_split_interval_without_span(make_options):
+    options = make_options("TRD")
+    ts = local_ts(2026, 3, 2, 19)
+    [(local_dt, kwh, info)] = split_interval(options, 0.5, ts, ts)
+    assert (local_dt.timestamp(), kwh, info.period) == (ts, 0.5, "peak")
+
+
+def test_month_reset_keeps_the_closed_month(make_options):
+    options = make_options("TRS")
+    state = empty_buckets()
+    apply_interval(state, options, 120.0, local_ts(2026, 1, 30), local_ts(2026, 1, 31))
+
+    assert apply_interval(state, options, 10.0, local_ts(2026, 2, 1, 1), local_ts(2026, 2, 1, 2))
+    assert state["kwh_month"] == pytest.approx(10.0)
+    assert state["cost_month"] == pytest.approx(TIERS.cost(10))
+    assert state["previous_month"]["month"] == "2026-01-01"
+    assert state["previous_month"]["kwh_month"] == pytest.approx(120.0)
+
+
+def test_late_pieces_are_costed_in_the_closed_month(make_options):
+    options = make_options("TRS")
+    state = empty_buckets()
+    apply_interval(state, options, 90.0, local_ts(2026, 1, 30), local_ts(2026, 1, 31))
+    apply_interval(state, options, 1.0, local_ts(2026, 2, 1, 1), local_ts(2026, 2, 1, 2))
+
+    costs: list[float] = []
+    pieces = split_interval(options, 20.0, local_ts(2026, 1, 31, 10), local_ts(2026, 1, 31, 11))
+    apply_pieces(state, options, pieces, costs=costs)
+
+    assert costs == [pytest.approx(TIERS.cost_for_delta(90.0, 20.0))]
+    assert state["previous_month"]["kwh_month"] == pytest.approx(110.0)
+    assert state["kwh_month"] == pytest.approx(1.0)
+    assert state["kwh_today"] == pytest.approx(1.0)
+
+    # Two months back is no longer kept.
+    older = split_interval(options, 5.0, local_ts(2025, 12, 31, 10), local_ts(2025, 12, 31, 11))
+    costs.clear()
+    apply_pieces(state, options, older, costs=costs)
+    assert costs == [0.0]
+    assert state["previous_month"]["kwh_month"] == pytest.approx(110.0)
+
+
+@pytest.mark.parametrize("tariff", ["TRS", "TRD", "TRT"])
+def test_apply_batch_matches_apply_pieces(make_options, tariff):
+    options = make_options(tariff)
+    start = local_ts(2026, 1, 30, 20)
+    intervals = [
+        (start + index * 5400, start + (index + 1) * 5400, 4.0 + index % 5)
+        for index in range(60)
+    ]
+
+    one_by_one = empty_buckets()
+    costs: list[float] = []
+    for start_ts, end_ts, kwh in intervals:
+        apply_pieces(one_by_one, options, split_interval(options, kwh, start_ts, end_ts), costs=costs)
+    batched = empty_buckets()
+    pieces = apply_batch(batched, options, intervals)
+
+    assert [piece[4] for piece in pieces] == pytest.approx(costs)
+    for key in ("kwh_month", "cost_month", "kwh_today", "cost_today", "last_reset_day"):
+        assert batched[key] == pytest.approx(one_by_one[key])
+    assert batched["breakdown"] == pytest.approx(one_by_one["breakdown"])
+    assert batched["previous_month"]["cost_month"] == pytest.approx(
+        one_by_one["previous_month"]["cost_month"]
+    )
+
+
+def test_bill_total_adds_charges_and_vat(make_options):
+    options = make_options(
+        "TRD",
+        **{
+            CONF_INCLUDE_FIXED: True,
+            CONF_INCLUDE_POWER: True,
+            CONF_CONTRACTED_POWER_KW: 5.0,
+            CONF_INCLUDE_VAT: True,
+            CONF_VAT_RATE: 0.22,
+        },
+    )
+    day = date(2026, 3, 2)
+    assert bill_total(options, 1000.0, day) == pytest.approx(1220.0 + 488.0 + 5 * 83.2)
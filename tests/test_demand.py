@@ -0,0 +1,78 @@
+"""Tests for the UTE Tariff rolling demand."""
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from custom_components.ute_tariff.demand import DemandWindow, empty_demand, record_demand
+
+from .conftest import TZ
+
+START = 1_800_000_000.0
+
+
+# At a slot boundary the newest slot has just started, so the window spans
+# the 89 older slots and its first slot has expired.
+SPAN = 890.0
+
+
+def test_demand_is_the_window_average():
+    window = DemandWindow(window_seconds=900, slot_seconds=10)
+    window.add(START, START + 900, 1.5)
+
+    assert window.demand_kw(START + 900) == pytest.approx(6.0)
+
+
+def test_energy_expires_with_the_window():
+    window = DemandWindow(window_seconds=900, slot_seconds=10)
+    window.add(START, START + 300, 1.0)
+    assert window.demand_kw(START + 900) == pytest.approx(1.0 * 290 / 300 * 3600 / SPAN)
+
+    assert window.demand_kw(START + 1200) == pytest.approx(0.0)
+    window.add(START + 5000, START + 5000, 0.25)
+    assert window.demand_kw(START + 5000) == pytest.approx(0.25 * 3600 / SPAN)
+
+
+def test_old_energy_is_ignored():
+    window = DemandWindow(window_seconds=900, slot_seconds=10)
+    window.demand_kw(START + 3600)
+    window.add(START, START + 60, 5.0)
+    assert window.demand_kw(START + 3600) == 0.0
+
+
+def test_peek_does_not_advance_the_window():
+    window = DemandWindow(window_seconds=900, slot_seconds=10)
+    window.add(START, START + 600, 2.0)
+    window.demand_kw(START + 600)
+    energy, total, last_slot = list(window.energy), window.total, window.last_slot
+
+    peeked = window.peek_kw(START + 1200, START + 1200, 0.0)
+
+    assert (list(window.energy), window.total, window.last_slot) == (energy, total, last_slot)
+    assert peeked == pytest.approx(window.demand_kw(START + 1200))
+
+
+def test_peek_adds_the_held_sample():
+    window = DemandWindow(window_seconds=900, slot_seconds=10)
+    window.add(START, START + 900, 0.75)
+
+    held = window.peek_kw(START + 900, START + 450, 2.0)
+
+    assert held == pytest.approx((0.75 * 89 / 90 * 3600 + 2.0 * 450) / SPAN)
+
+
+def test_record_demand_keeps_month_maxima():
+    state = empty_demand()
+    record_demand(state, 3.0, "peak", datetime(2026, 3, 2, 19, tzinfo=TZ))
+    record_demand(state, 2.0, "offpeak", datetime(2026, 3, 3, 1, tzinfo=TZ))
+    record_demand(state, 1.0, "peak", datetime(2026, 3, 3, 19, tzinfo=TZ))
+
+    assert state["max_kw"] == 3.0
+    assert state["max_at"] == "2026-03-02T19:00:00-03:00"
+    assert state["periods"] == {"peak": 3.0, "offpeak": 2.0}
+
+    record_demand(state, 0.5, "offpeak", datetime(2026, 4, 1, 0, 5, tzinfo=TZ))
+    assert state["month"] == "2026-04-01"
+    assert state["max_kw"] == 0.5
+    assert state["periods"] == {"offpeak": 0.5}
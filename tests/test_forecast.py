@@ -0,0 +1,95 @@
+"""Tests for the UTE Tariff month-end forecast."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from custom_components.ute_tariff.const import PROFILE_WEEKS
+from custom_components.ute_tariff.forecast import (
+    empty_profile,
+    hourly_rate,
+    profile_key,
+    project_month,
+    update_profile,
+)
+from custom_components.ute_tariff.tariffs import DEFAULT_PRICE_TABLE, TierSchedule
+
+from .conftest import TZ
+
+TIERS = TierSchedule(DEFAULT_PRICE_TABLE["TRS"]["tiers"])
+
+
+def test_linear_extrapolation_without_a_full_day(make_options):
+    options = make_options("TRS")
+    profile = empty_profile(profile_key(options))
+    now = datetime(2026, 4, 11, 0, tzinfo=TZ)
+    state = {"kwh_month": 100.0, "cost_month": TIERS.cost(100)}
+
+    kwh, cost = project_month(profile, state, options, now)
+
+    assert kwh == pytest.approx(300.0)
+    assert cost == pytest.approx(TIERS.cost(300))
+
+
+def test_linear_extrapolation_scales_trd_cost(make_options):
+    options = make_options("TRD")
+    profile = empty_profile(profile_key(options))
+    now = datetime(2026, 4, 16, 0, tzinfo=TZ)
+
+    kwh, cost = project_month(profile, {"kwh_month": 50.0, "cost_month": 400.0}, options, now)
+
+    assert (kwh, cost) == (pytest.approx(100.0), pytest.approx(800.0))
+
+
+def test_profile_projects_the_remaining_days(make_options):
+    options = make_options("TRD")
+    profile = empty_profile(profile_key(options))
+    day = datetime(2026, 4, 1, 12, tzinfo=TZ)
+    # The first day seen is partial and is not folded into the profile.
+    for offset in range(29):
+        local_dt = day + timedelta(days=offset)
+        update_profile(profile, local_dt, "offpeak", 8.0)
+        update_profile(profile, local_dt, "peak", 2.0)
+    assert sum(profile["days"]) == 27
+    assert profile["kwh"][local_dt.weekday()]["peak"] == pytest.approx(6.0)
+
+    state = {"kwh_month": 290.0, "cost_month": 1000.0}
+    day_cost = 8.0 * 4.771 + 2.0 * 12.034
+
+    # Today has drawn its average already, so only April 30 is left.
+    kwh, cost = project_month(profile, state, options, datetime(2026, 4, 29, 18, tzinfo=TZ))
+    assert kwh == pytest.approx(300.0)
+    assert cost == pytest.approx(1000.0 + day_cost)
+
+    # A day with no readings yet counts in full.
+    kwh, cost = project_month(profile, state, options, datetime(2026, 4, 30, 1, tzinfo=TZ))
+    assert kwh == pytest.approx(300.0)
+    assert cost == pytest.approx(1000.0 + day_cost)
+
+
+def test_profile_decays_after_profile_weeks(make_options):
+    profile = empty_profile(profile_key(make_options("TRD")))
+    day = datetime(2026, 1, 5, 12, tzinfo=TZ)
+    for week in range(PROFILE_WEEKS + 3):
+        update_profile(profile, day + timedelta(weeks=week), "offpeak", 10.0)
+
+    weekday = day.weekday()
+    assert profile["days"][weekday] < PROFILE_WEEKS + 1
+    assert profile["kwh"][weekday]["offpeak"] / profile["days"][weekday] == pytest.approx(10.0)
+
+
+def test_late_pieces_do_not_rewind_the_profile(make_options):
+    profile = empty_profile(profile_key(make_options("TRD")))
+    update_profile(profile, datetime(2026, 4, 2, 12, tzinfo=TZ), "offpeak", 1.0)
+    update_profile(profile, datetime(2026, 4, 1, 12, tzinfo=TZ), "offpeak", 5.0)
+
+    assert profile["day"] == "2026-04-02"
+    assert profile["today"] == {"offpeak": 1.0}
+
+
+def test_hourly_rate():
+    now = datetime(2026, 4, 30, 12, tzinfo=TZ)
+    assert hourly_rate(100.0, 112.0, now) == pytest.approx(1.0)
+    assert hourly_rate(120.0, 112.0, now) == 0.0
+    assert hourly_rate(0.0, 0.0, datetime(2026, 5, 1, tzinfo=TZ) - timedelta(microseconds=1)) == 0.0
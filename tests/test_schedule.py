@@ -0,0 +1,119 @@
+"""Tests for the UTE Tariff price schedule and cheapest window."""
+from __future__ import annotations
+
+import pytest
+
+from custom_components.ute_tariff.schedule import cheapest_window, price_schedule, schedule_rows
+
+from .conftest import local_ts
+
+HOUR = 3600.0
+FALLING_TIERS = {
+    "TRS": {"tiers": [{"limit": 100.0, "price": 9.0}, {"limit": None, "price": 5.0}]}
+}
+
+
+def test_trd_schedule_follows_the_periods(make_options):
+    options = make_options("TRD")
+    start = local_ts(2026, 3, 2, 12)
+
+    intervals = price_schedule(options, start, start + 24 * HOUR, 0.0, 0.0)
+
+    assert intervals == [
+        (start, local_ts(2026, 3, 2, 18), "offpeak", 4.771),
+        (local_ts(2026, 3, 2, 18), local_ts(2026, 3, 2, 22), "peak", 12.034),
+        (local_ts(2026, 3, 2, 22), start + 24 * HOUR, "offpeak", 4.771),
+    ]
+
+
+def test_trs_schedule_crosses_tiers_and_resets(make_options):
+    options = make_options("TRS")
+    start = local_ts(2026, 3, 31, 0)
+
+    intervals = price_schedule(options, start, local_ts(2026, 4, 1, 12), 90.0, 2.0)
+
+    assert intervals == [
+        (start, start + 5 * HOUR, "tiers", 6.744),
+        (start + 5 * HOUR, local_ts(2026, 4, 1), "tiers", 8.452),
+        (local_ts(2026, 4, 1), local_ts(2026, 4, 1, 12), "tiers", 6.744),
+    ]
+
+
+def test_schedule_rows_are_clipped(make_options):
+    options = make_options("TRD")
+    start = local_ts(2026, 3, 2, 12)
+    intervals = tuple(price_schedule(options, start, start + 24 * HOUR, 0.0, 0.0))
+
+    rows = schedule_rows(intervals, options, local_ts(2026, 3, 2, 20), local_ts(2026, 3, 2, 23))
+
+    assert rows == [
+        {"start": "2026-03-02T20:00:00-03:00", "end": "2026-03-02T22:00:00-03:00", "period": "peak", "price": 12.034},
+        {"start": "2026-03-02T22:00:00-03:00", "end": "2026-03-02T23:00:00-03:00", "period": "offpeak", "price": 4.771},
+    ]
+
+
+def test_trd_cheapest_window_avoids_the_peak(make_options):
+    options = make_options("TRD")
+    start = local_ts(2026, 3, 2, 17)
+
+    best_start, best_cost, now_cost = cheapest_window(
+        options, start, local_ts(2026, 3, 3, 1), 2 * HOUR, 3.0, 0.0, 0.0
+    )
+
+    assert best_start == local_ts(2026, 3, 2, 22)
+    assert best_cost == pytest.approx(3.0 * 4.771)
+    assert now_cost == pytest.approx(1.5 * 4.771 + 1.5 * 12.034)
+
+
+def test_ties_go_to_the_earliest_start(make_options):
+    options = make_options("TRD")
+    start = local_ts(2026, 3, 2, 9)
+
+    best_start, best_cost, now_cost = cheapest_window(
+        options, start, local_ts(2026, 3, 2, 17), HOUR, 1.0, 0.0, 0.0
+    )
+
+    assert best_start == start
+    assert best_cost == now_cost
+
+
+@pytest.mark.parametrize("duration", [0.0, 3 * HOUR])
+def test_load_that_does_not_fit(make_options, duration):
+    options = make_options("TRD")
+    start = local_ts(2026, 3, 2, 9)
+    assert cheapest_window(options, start, start + 2 * HOUR, duration, 1.0, 0.0, 0.0) is None
+
+
+def test_trs_cheapest_window_waits_for_the_month_reset(make_options):
+    options = make_options("TRS")
+    start = local_ts(2026, 4, 30, 12)
+
+    best_start, best_cost, now_cost = cheapest_window(
+        options, start, local_ts(2026, 5, 1, 6), HOUR, 40.0, 550.0, 1.0
+    )
+
+    assert best_start == local_ts(2026, 5, 1)
+    assert best_cost == pytest.approx(40.0 * 6.744)
+    assert now_cost == pytest.approx(40.0 * 8.452)
+
+
+@pytest.mark.parametrize("kwh_month", [0.0, 50.0, 80.0, 120.0])
+@pytest.mark.parametrize("rate", [0.0, 0.5, 3.0])
+def test_trs_cheapest_window_matches_brute_force(make_options, kwh_month, rate):
+    options = make_options("TRS", FALLING_TIERS)
+    tiers = options.prices(options.price_tables.dates[0]).tiers
+    start = local_ts(2026, 3, 10, 8)
+    deadline = start + 48 * HOUR
+    energy = 30.0
+
+    best_start, best_cost, now_cost = cheapest_window(
+        options, start, deadline, HOUR, energy, kwh_month, rate
+    )
+
+    grid = [
+        tiers.cost_for_delta(kwh_month + rate * step / 60, energy)
+        for step in range(47 * 60 + 1)
+    ]
+    assert now_cost == pytest.approx(grid[0])
+    assert best_cost == pytest.approx(min(grid))
+    assert best_start <= start + grid.index(min(grid)) * 60
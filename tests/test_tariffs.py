@@ -0,0 +1,150 @@
+"""Tests for the UTE Tariff price tables and timeline."""
+from __future__ import annotations
+
+import copy
+import random
+
+import pytest
+
+from custom_components.ute_tariff import tariffs
+from custom_components.ute_tariff.tariffs import (
+    DEFAULT_PRICE_TABLE,
+    PERIODS,
+    TierSchedule,
+    batch_costs,
+    compile_price_table,
+    merge_price_table,
+    validate_price_table,
+)
+
+from .conftest import local_ts
+
+TIERS = TierSchedule(DEFAULT_PRICE_TABLE["TRS"]["tiers"])
+
+
+def test_tier_costs_at_limits():
+    assert TIERS.cost(100) == pytest.approx(100 * 6.744)
+    assert TIERS.cost(600) == pytest.approx(100 * 6.744 + 500 * 8.452)
+    assert TIERS.cost(700) == pytest.approx(100 * 6.744 + 500 * 8.452 + 100 * 10.539)
+    assert TIERS.cost_for_delta(90, 20) == pytest.approx(10 * 6.744 + 10 * 8.452)
+    assert TIERS.marginal_price(100) == 8.452
+    assert TIERS.breakdown(150) == pytest.approx(
+        {
+            "kwh_tier1": 100.0,
+            "cost_tier1": 674.4,
+            "kwh_tier2": 50.0,
+            "cost_tier2": 422.6,
+            "kwh_tier3": 0.0,
+            "cost_tier3": 0.0,
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "tiers",
+    [
+        [{"limit": 100.0, "price": 1.0}, {"price": 2.0}],
+        [{"limit": 100.0, "price": 1.0}, {"limit": 50.0, "price": 2.0}, {"limit": None, "price": 3.0}],
+        [{"limit": 100.0, "price": 1.0}, {"limit": 200.0, "price": 2.0}],
+    ],
+    ids=["missing-limit", "decreasing-limit", "bounded-last-tier"],
+)
+def test_invalid_tiers_are_rejected(tiers):
+    table = copy.deepcopy(DEFAULT_PRICE_TABLE)
+    table["TRS"]["tiers"] = tiers
+    with pytest.raises(ValueError):
+        validate_price_table(table)
+    with pytest.raises(ValueError):
+        compile_price_table(table)
+
+
+def test_falling_tier_prices_are_accepted():
+    table = merge_price_table(
+        DEFAULT_PRICE_TABLE,
+        {"TRS": {"tiers": [{"limit": 100.0, "price": 9.0}, {"limit": None, "price": 5.0}]}},
+    )
+    assert compile_price_table(table)["TRS"].tiers.rates == [9.0, 5.0]
+
+
+def test_merge_keeps_defaults_for_missing_keys():
+    merged = merge_price_table(DEFAULT_PRICE_TABLE, {"TRD": {"peak_kwh": 12.5}})
+    assert merged["TRD"]["peak_kwh"] == 12.5
+    assert merged["TRD"]["offpeak_kwh"] == DEFAULT_PRICE_TABLE["TRD"]["offpeak_kwh"]
+    assert merged["TRS"] == DEFAULT_PRICE_TABLE["TRS"]
+    assert DEFAULT_PRICE_TABLE["TRD"]["peak_kwh"] == 12.034
+    with pytest.raises(ValueError):
+        merge_price_table(DEFAULT_PRICE_TABLE, [])
+
+
+def test_trd_and_trt_periods(make_options):
+    trd = make_options("TRD").timeline
+    trt = make_options("TRT").timeline
+    # Monday 2026-03-02 and Sunday 2026-03-01.
+    assert trd.classify_ts(local_ts(2026, 3, 2, 18, 0)).period == "peak"
+    assert trd.classify_ts(local_ts(2026, 3, 2, 22, 0)).period == "offpeak"
+    assert trd.classify_ts(local_ts(2026, 3, 1, 19, 0)).period == "offpeak"
+    assert trt.classify_ts(local_ts(2026, 3, 2, 6, 59)).period == "valley"
+    assert trt.classify_ts(local_ts(2026, 3, 2, 12, 0)).period == "flat"
+    assert trt.classify_ts(local_ts(2026, 3, 2, 21, 0)).period == "peak"
+    assert trt.classify_ts(local_ts(2026, 3, 1, 21, 0)).period == "flat"
+
+
+def test_segments_split_at_transitions_and_midnight(make_options):
+    timeline = make_options("TRD").timeline
+    start = local_ts(2026, 3, 2, 17, 0)
+    end = local_ts(2026, 3, 3, 1, 0)
+    segments = [(seg_start, seg_end, info.period) for seg_start, seg_end, info in timeline.segments(start, end)]
+    assert segments == [
+        (start, local_ts(2026, 3, 2, 18, 0), "offpeak"),
+        (local_ts(2026, 3, 2, 18, 0), local_ts(2026, 3, 2, 22, 0), "peak"),
+        (local_ts(2026, 3, 2, 22, 0), local_ts(2026, 3, 3, 0, 0), "offpeak"),
+        (local_ts(2026, 3, 3, 0, 0), end, "offpeak"),
+    ]
+
+
+def _readings(count):
+    rng = random.Random(7)
+    start = local_ts(2026, 1, 28)
+    timestamps = [start + index * 900 + rng.uniform(0, 600) for index in range(count)]
+    kwh = [rng.uniform(0, 2.5) for _ in range(count)]
+    return timestamps, kwh
+
+
+@pytest.mark.parametrize("tariff", ["TRS", "TRD", "TRT"])
+def test_batch_costs_numpy_matches_python(make_options, tariff):
+    pytest.importorskip("numpy")
+    options = make_options(tariff)
+    prices = options.prices(options.price_tables.dates[0])
+    timestamps, kwh = _readings(2000)
+
+    fast = batch_costs(options.timeline, timestamps, kwh, prices, 40.0, use_numpy=True)
+    slow = batch_costs(options.timeline, timestamps, kwh, prices, 40.0, use_numpy=False)
+
+    assert list(fast.period_codes) == list(slow.period_codes)
+    assert list(fast.costs) == list(slow.costs)
+    assert fast.breakdown == slow.breakdown
+    assert (fast.kwh, fast.cost) == (slow.kwh, slow.cost)
+
+
+def test_batch_costs_reset_trs_tiers_each_month(make_options):
+    options = make_options("TRS")
+    prices = options.prices(options.price_tables.dates[0])
+    timestamps = [local_ts(2026, 1, 31, 12), local_ts(2026, 2, 1, 12)]
+
+    result = batch_costs(options.timeline, timestamps, [150.0, 50.0], prices, use_numpy=False)
+
+    assert [PERIODS[code] for code in result.period_codes] == ["tiers", "tiers"]
+    assert result.costs == pytest.approx([TIERS.cost(150), TIERS.cost(50)])
+
+
+def test_batch_costs_without_numpy(make_options, monkeypatch):
+    options = make_options("TRD")
+    prices = options.prices(options.price_tables.dates[0])
+    monkeypatch.setattr(tariffs, "np", None)
+
+    with pytest.raises(ValueError):
+        batch_costs(options.timeline, [local_ts(2026, 3, 2, 19)], [1.0], prices, use_numpy=True)
+    result = batch_costs(options.timeline, [local_ts(2026, 3, 2, 19)], [1.0], prices)
+    assert result.cost == pytest.approx(12.034)
+    with pytest.raises(ValueError):
+        batch_costs(options.timeline, [0.0, 1.0], [1.0], prices)